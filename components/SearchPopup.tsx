@@ -9,11 +9,19 @@ interface SearchPopupProps {
     embeddingModel: string;
     embRegion: string;
     vectorStore: string;
+    searchMode?: string;
+    reranker?: string;
+    fetchK?: number;
+    efSearch?: number;
   };
   onSave: (newSearchSettings: {
     embeddingModel: string;
     embRegion: string;
     vectorStore: string;
+    searchMode?: string;
+    reranker?: string;
+    fetchK?: number;
+    efSearch?: number;
   }) => void;
 }
 
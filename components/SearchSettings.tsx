@@ -6,11 +6,19 @@ interface SearchSettingsProps {
     embeddingModel: string;
     embRegion: string;
     vectorStore: string;
+    searchMode?: string;
+    reranker?: string;
+    fetchK?: number;
+    efSearch?: number;
   };
   onSave: (newSearchSettings: {
     embeddingModel: string;
     embRegion: string;
     vectorStore: string;
+    searchMode?: string;
+    reranker?: string;
+    fetchK?: number;
+    efSearch?: number;
   }) => void;
 }
 
@@ -18,13 +26,22 @@ export default function SearchSettings({ searchSettings, onSave }: SearchSetting
   const [tempEmbeddingModel, setTempEmbeddingModel] = useState(searchSettings.embeddingModel);
   const [tempEmbRegion, setTempEmbRegion] = useState(searchSettings.embRegion);
   const [tempVectorStore, setTempVectorStore] = useState(searchSettings.vectorStore);
+  const [tempSearchMode, setTempSearchMode] = useState(searchSettings.searchMode || 'mmr');
+  const [tempReranker, setTempReranker] = useState(searchSettings.reranker || 'cohere');
+  const [tempFetchK, setTempFetchK] = useState(searchSettings.fetchK || 20);
+  // Empty means the index default (index.knn.algo_param.ef_search)
+  const [tempEfSearch, setTempEfSearch] = useState<number | ''>(searchSettings.efSearch || '');
   const [successMessage, setSuccessMessage] = useState<string | null>(null);
 
   const handleApplySettings = () => {
     onSave({
       embeddingModel: tempEmbeddingModel,
       embRegion: tempEmbRegion,
-      vectorStore: tempVectorStore
+      vectorStore: tempVectorStore,
+      searchMode: tempSearchMode,
+      reranker: tempReranker,
+      fetchK: tempFetchK,
+      efSearch: tempVectorStore !== 'Chroma' && tempEfSearch ? tempEfSearch : undefined
     });
     setSuccessMessage('Settings applied successfully!');
     setTimeout(() => setSuccessMessage(null), 3000);
@@ -34,6 +51,10 @@ export default function SearchSettings({ searchSettings, onSave }: SearchSetting
     setTempEmbeddingModel('amazon.titan-embed-text-v2:0');
     setTempEmbRegion('us-east-1');
     setTempVectorStore('Chroma');
+    setTempSearchMode('mmr');
+    setTempReranker('cohere');
+    setTempFetchK(20);
+    setTempEfSearch('');
     setSuccessMessage('Settings reset to default!');
     setTimeout(() => setSuccessMessage(null), 3000);
   };
@@ -46,6 +67,7 @@ export default function SearchSettings({ searchSettings, onSave }: SearchSetting
           <option value="amazon.titan-embed-text-v2:0">Amazon Titan Embed Text V2</option>
           <option value="cohere.embed-english-v3">Cohere Embed English V3</option>
           <option value="cohere.embed-multilingual-v3">Cohere Embed Multilingual V3</option>
+          <option value="local:sentence-transformers/all-MiniLM-L6-v2">Local MiniLM L6 V2 (CPU)</option>
         </select>
         <select className={styles.marginTop} value={tempEmbRegion} onChange={(e) => setTempEmbRegion(e.target.value)}>
           <option value="us-east-1">North Virginia</option>
@@ -58,9 +80,32 @@ export default function SearchSettings({ searchSettings, onSave }: SearchSetting
         <h4>Vector Store</h4>
         <select value={tempVectorStore} onChange={(e) => setTempVectorStore(e.target.value)}>
           <option value="OpenSearch">OpenSearch</option>
+          <option value="OpenSearchNeural">OpenSearch (Server-side Embedding)</option>
           <option value="Chroma">Chroma</option>
         </select>
       </div>
+      <div className={styles.inputGroup}>
+        <h4>Search Mode</h4>
+        <select value={tempSearchMode} onChange={(e) => setTempSearchMode(e.target.value)}>
+          <option value="mmr">Vector (MMR)</option>
+          <option value="hybrid">Hybrid (BM25 + Vector)</option>
+          <option value="hybrid_mmr">Hybrid + MMR</option>
+        </select>
+      </div>
+      <div className={styles.inputGroup}>
+        <h4>Reranker</h4>
+        <select value={tempReranker} onChange={(e) => setTempReranker(e.target.value)}>
+          <option value="cohere">Cohere (requires API key)</option>
+          <option value="local">Local Cross-Encoder (CPU)</option>
+        </select>
+      </div>
+      <div className={styles.inputGroup}>
+        <h4>Candidates (fetch_k)</h4>
+        <input type="number" min={5} max={200} value={tempFetchK} onChange={(e) => setTempFetchK(Number(e.target.value))} />
+        {tempVectorStore !== 'Chroma' && (
+          <input className={styles.marginTop} type="number" min={tempFetchK} max={2048} placeholder="ef_search (index default)" value={tempEfSearch} onChange={(e) => setTempEfSearch(e.target.value ? Number(e.target.value) : '')} />
+        )}
+      </div>
       <div className={styles.buttonGroup}>
         <button className={styles.applyButton} onClick={handleApplySettings}>Apply</button>
         <button className={styles.setDefaultButton} onClick={handleSetDefaultSettings}>Set Default</button>
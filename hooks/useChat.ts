@@ -1,7 +1,7 @@
 import { useState, useRef, FormEvent, KeyboardEvent } from 'react';
 import usePasteHandler from './usePasteHandler';
 import useFileHandler from './useFileHandler';
-import { sendMessageToApi, searchApi, websearchApi } from '../utils/api';
+import { sendMessageToApi, searchStreamApi, websearchApi } from '../utils/api';
 import useMessageHandler from './useMessageHandler';
 
 export interface Message {
@@ -65,8 +65,20 @@ export default function useChat(settings, searchSettings) {
       const assistantMessageId = newMessageId + 1;
 
       if (settings.chatMode === 'RAG') {
-        ragResult = await searchApi(text, settings.chatMode, searchSettings, settings.cohereRerankerApiKey || '');
-        addMessage({ id: assistantMessageId, text: 'Done!', isUser: false });
+        addMessage({ id: assistantMessageId, text: 'Searching...', isUser: false });
+        // Show sources as soon as the backend has them; the chat request starts once the last ranked parent
+        // has arrived instead of waiting for the backend's final "done" event
+        ragResult = await searchStreamApi(text, settings.chatMode, searchSettings, settings.cohereRerankerApiKey || '', (event, data) => {
+          if (event === 'children') {
+            updateMessage(assistantMessageId, `Found ${data.documents.length} matching chunks...`);
+          } else if (event === 'reranked') {
+            updateMessage(assistantMessageId, `Loading ${data.parent_ids.length} source documents...`);
+          } else if (event === 'parents') {
+            const sources = data.documents.map((doc: any) => doc.source).join(', ');
+            updateMessage(assistantMessageId, `Sources: ${sources}`);
+          }
+        });
+        updateMessage(assistantMessageId, 'Done!');
       } else if (settings.chatMode === 'Web Search') {
         websearchResult = await websearchApi(text, settings.chatMode, settings.tavilySearchApiKey);
         addMessage({ id: assistantMessageId, text: 'Done!', isUser: false });
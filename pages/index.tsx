@@ -31,7 +31,10 @@ export const getServerSideProps = async () => {
   const initialSearchSettings = {
     embeddingModel: 'amazon.titan-embed-text-v2:0',
     embRegion: 'us-east-1',
-    vectorStore: 'Chroma'
+    vectorStore: 'Chroma',
+    searchMode: 'mmr',
+    reranker: 'cohere',
+    fetchK: 20
   };
   return {
     props: {
@@ -1,9 +1,14 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form, BackgroundTasks
+from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from prometheus_client import REGISTRY, CONTENT_TYPE_LATEST, generate_latest
 from pydantic import BaseModel
-import subprocess
+import asyncio
+import json
+import re
+import time
 import os
-import shutil
 import sys
 from typing import List
 import uvicorn
@@ -12,7 +17,55 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# The helper scripts import each other as top-level modules (e.g. `from libs.opensearch import ...`)
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from retriever import RetrievalEngine
+from search import get_index_name
+from concurrency import create_limiter
+from initialize import describe_index, check_generation
+from lifecycle import IndexLifecycle
+from websearch import WebSearchClient, merge_results
+from jobs import JobManager
+from uploads import save_upload, remove_upload
+from libs.chroma_engine import close_engines, engine_stats
+from libs.metrics import REQUEST_SECONDS, PROFILING_ENABLED, PROFILE_HEADER, stats_collector, current_trace, current_profile, server_timing
+
 app = FastAPI()
+retrieval_engine = RetrievalEngine()
+
+# Blocking Bedrock/OpenSearch calls run on bounded per-endpoint pools instead of the event loop
+search_limiter = create_limiter("search", default_concurrency=8, default_queue=32)
+initialize_limiter = create_limiter("initialize", default_concurrency=1, default_queue=2)
+# Tavily calls are async on the event loop, bounded by the client's connection pool
+web_search_client = WebSearchClient()
+
+def on_job_attempt_finished(job):
+    # Newly ingested chunks must be visible to the next search
+    retrieval_engine.invalidate_index(job['vector_store'], get_index_name(job['embedding_model'], job['vector_store']))
+
+# The job store is opened when the app starts
+job_manager = JobManager(on_attempt_finished=on_job_attempt_finished)
+
+def on_index_operation_finished(operation):
+    # Deletes and swaps change what the index name serves; a new generation serves nothing yet
+    if operation['action'] != 'create':
+        retrieval_engine.evict(operation['embedding_model'], operation['region'], operation['vector_store'])
+
+# Index create/delete/swap run in the background on the initialize pool, one at a time by default
+index_lifecycle = IndexLifecycle(initialize_limiter, on_finished=on_index_operation_finished)
+
+def backend_stats():
+    return {
+        "limiters": {limiter.name: limiter.stats() for limiter in (search_limiter, initialize_limiter)},
+        "caches": {**retrieval_engine.cache_stats(), "websearch": web_search_client.cache.stats()},
+        "clients": {"websearch": web_search_client.stats()},
+        "chroma": engine_stats(),
+    }
+
+stats_collector.stats_fn = backend_stats
 
 class FilePaths(BaseModel):
     file_paths: List[str]
@@ -25,99 +78,241 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def instrument(request: Request, call_next):
+    started = time.perf_counter()
+    trace = []
+    current_trace.set(trace)
+    profile = None
+    if PROFILING_ENABLED and request.headers.get(PROFILE_HEADER):
+        profile = {"name": re.sub(r'[^A-Za-z0-9]+', '-', request.url.path).strip('-') or "root"}
+        current_profile.set(profile)
+
+    response = await call_next(request)
+
+    # Label by route template so path parameters (job ids) don't explode the series count
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    REQUEST_SECONDS.labels(request.method, route, response.status_code).observe(time.perf_counter() - started)
+    if trace:
+        response.headers["Server-Timing"] = server_timing(trace)
+    if profile and profile.get("path"):
+        response.headers["X-Profile-Path"] = profile["path"]
+    return response
+
 @app.post("/upload")
 async def upload(files: List[UploadFile] = File(...)):
     try:
-        file_paths = []
-        for file in files:
-            file_location = f"/tmp/{file.filename}"
-            with open(file_location, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            file_paths.append(file_location)
-            logging.info(f"Uploaded file: {file_location}")
-
-        return {"file_paths": file_paths}
+        results = await asyncio.gather(*(save_upload(file) for file in files), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            # All-or-nothing: don't leave the files that did make it behind
+            for result in results:
+                if not isinstance(result, BaseException):
+                    remove_upload(result["path"])
+            raise errors[0]
+        return {"file_paths": [item["path"] for item in results], "files": results}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error during file upload: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/process")
 async def process(
-    background_tasks: BackgroundTasks,
     file_paths: str = Form(...),
     embedding_model: str = Form(...),
     region: str = Form(...),
-    vector_store: str = Form(...)
+    vector_store: str = Form(...),
+    index_name: str = Form(default="")
 ):
+    # index_name is a generation from /indexes/create when reindexing blue/green; empty means the live index
+    if index_name:
+        try:
+            check_generation(get_index_name(embedding_model, vector_store), index_name)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     try:
         file_paths = file_paths.split(',')
         logging.info(f"Processing files: {file_paths}")
-        logging.info(f"Running subprocess for embedding_model: {embedding_model}, region: {region}, vector_store: {vector_store}")
-        
-        # Add the task to background tasks
-        background_tasks.add_task(run_subprocess, file_paths, embedding_model, region, vector_store)
+        logging.info(f"Queueing ingestion job for embedding_model: {embedding_model}, region: {region}, vector_store: {vector_store}, index_name: {index_name or 'live'}")
+
+        job = job_manager.submit(file_paths, embedding_model, region, vector_store, index_name or None)
 
-        return {"message": "Processing started"}
+        return {"message": "Processing started", "job_id": job['id']}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def run_subprocess(file_paths: List[str], embedding_model: str, region: str, vector_store: str):
-    try:
-        result = subprocess.run(
-            [sys.executable, 'py-backend/app/process.py', embedding_model, region, vector_store, *file_paths],
-            capture_output=True,
-            text=True,
-            timeout=6000
-        )
-        logging.info("Subprocess completed")
-        logging.info(f"Subprocess stdout: {result.stdout}")
-        logging.info(f"Subprocess stderr: {result.stderr}")
+@app.get("/jobs")
+async def list_jobs(limit: int = 50):
+    return {"jobs": job_manager.store.list(limit)}
 
-        for path in file_paths:
-            os.remove(path)
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
 
-    except Exception as e:
-        logging.error(f"Error in subprocess: {e}")
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
 
 @app.post("/initialize")
 async def initialize(embedding_model: str = Form(...), region: str = Form(...), vector_store: str = Form(...)):
     try:
-        result = subprocess.run(
-            [sys.executable, 'py-backend/app/initialize.py', embedding_model, region, vector_store],
-            capture_output=True,
-            text=True
-        )
-        return {"output": result.stdout, "error": result.stderr}
+        operation = index_lifecycle.submit("delete", embedding_model, region, vector_store)
+        # Waits for the deletion, so files processed right after can't land in the index being dropped
+        operation = await index_lifecycle.wait(operation['id'])
+        if operation['status'] == 'failed':
+            return {"output": "", "operation_id": operation['id'], "error": operation['error']}
+        return {"output": "Index Deleted.", "operation_id": operation['id'], "error": ""}
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logging.exception(f"Error during initialize: {e}")
+        return {"output": "", "error": str(e)}
+
+@app.get("/indexes")
+async def get_indexes(embedding_model: str, region: str, vector_store: str):
+    # The generations behind the index name and which one is serving searches
+    try:
+        return await initialize_limiter.run(describe_index, embedding_model, region, vector_store)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def submit_index_operation(action, embedding_model, region, vector_store, index_name=None, **params):
+    try:
+        if index_name:
+            check_generation(get_index_name(embedding_model, vector_store), index_name)
+        return {"operation": index_lifecycle.submit(action, embedding_model, region, vector_store, **params)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/indexes/create", status_code=202)
+async def create_index_generation(embedding_model: str = Form(...), region: str = Form(...), vector_store: str = Form(...)):
+    # Blue/green reindex: create a generation, /process into it with index_name, then /indexes/swap
+    return submit_index_operation("create", embedding_model, region, vector_store)
+
+@app.post("/indexes/swap", status_code=202)
+async def swap_index_generation(embedding_model: str = Form(...), region: str = Form(...), vector_store: str = Form(...), index_name: str = Form(...), delete_previous: bool = Form(default=False)):
+    return submit_index_operation("swap", embedding_model, region, vector_store, index_name, target=index_name, delete_previous=delete_previous)
+
+@app.post("/indexes/delete", status_code=202)
+async def delete_index_generation(embedding_model: str = Form(...), region: str = Form(...), vector_store: str = Form(...), index_name: str = Form(default="")):
+    # With index_name, deletes that generation unless it is serving; without, deletes everything like /initialize
+    return submit_index_operation("delete", embedding_model, region, vector_store, index_name, generation=index_name or None)
+
+@app.get("/indexes/operations")
+async def list_index_operations(limit: int = 50):
+    return {"operations": index_lifecycle.list(limit)}
+
+@app.get("/indexes/operations/{operation_id}")
+async def get_index_operation(operation_id: str):
+    operation = index_lifecycle.get(operation_id)
+    if operation is None:
+        raise HTTPException(status_code=404, detail=f"Index operation not found: {operation_id}")
+    return operation
 
 @app.post("/search")
 async def search(text: str = Form(...), chat_mode: str = Form(...), search_settings: str = Form(...), cohere_reranker_api_key: str = Form(default="")):
     print(f"Received: text={text}, chat_mode={chat_mode}, search_settings={search_settings}, cohere_reranker_api_key={cohere_reranker_api_key}")
     try:
-        result = subprocess.run(
-            [sys.executable, 'py-backend/app/search.py', text, chat_mode, search_settings, cohere_reranker_api_key],
-            capture_output=True,
-            text=True
-        )
-        output = result.stdout.strip()
-        return {"output": output, "error": result.stderr.strip()}
+        output = await search_limiter.run(retrieval_engine.search, text, chat_mode, search_settings, cohere_reranker_api_key)
+        return {"output": output, "error": ""}
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logging.exception(f"Error during search: {e}")
+        return {"output": "", "error": str(e)}
+
+@app.post("/search/batch")
+async def search_batch(texts: str = Form(...), chat_mode: str = Form(...), search_settings: str = Form(...), cohere_reranker_api_key: str = Form(default="")):
+    # texts is a JSON array of queries, like search_settings is a JSON object
+    try:
+        queries = json.loads(texts)
+        if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+            raise ValueError("texts must be a JSON array of strings")
+        outputs = await search_limiter.run(retrieval_engine.search_batch, queries, chat_mode, search_settings, cohere_reranker_api_key)
+        return {"outputs": outputs, "error": ""}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.exception(f"Error during batch search: {e}")
+        return {"outputs": [], "error": str(e)}
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/search/stream")
+async def search_stream(text: str = Form(...), chat_mode: str = Form(...), search_settings: str = Form(...), cohere_reranker_api_key: str = Form(default="")):
+    events = search_limiter.stream(retrieval_engine.search_stream, text, chat_mode, search_settings, cohere_reranker_api_key)
+
+    async def body():
+        try:
+            async for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            # Headers are already sent, so failures are reported in-band like /search's "error" field
+            logging.exception(f"Error during streaming search: {e}")
+            yield sse_event("error", {"error": str(e)})
+
+    # Closing the events once the response is done frees the limiter slot even if the body never ran
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}, background=BackgroundTask(events.aclose))
 
 @app.post("/websearch")
-async def search(text: str = Form(...), chat_mode: str = Form(...), tavily_search_key: str = Form(...)):
+async def websearch(text: str = Form(...), chat_mode: str = Form(...), tavily_search_key: str = Form(...), search_settings: str = Form(default=""), cohere_reranker_api_key: str = Form(default="")):
     try:
-        result = subprocess.run(
-            [sys.executable, 'py-backend/app/websearch.py', text, chat_mode, tavily_search_key],
-            capture_output=True,
-            text=True
+        if not search_settings:
+            output = json.dumps(await web_search_client.search(text, tavily_search_key))
+            return {"output": output, "error": ""}
+        # Combined mode: vector-store retrieval and web search run concurrently and come back as one list.
+        # If one side fails the other's results are still returned, with the failure in partial_error
+        rag_output, web_results = await asyncio.gather(
+            search_limiter.run(retrieval_engine.search, text, "RAG", search_settings, cohere_reranker_api_key),
+            web_search_client.search(text, tavily_search_key),
+            return_exceptions=True,
         )
-        output = result.stdout.strip()
-        return {"output": output, "error": result.stderr.strip()}
+        if isinstance(rag_output, BaseException) and isinstance(web_results, BaseException):
+            raise rag_output
+        partial_errors = []
+        if isinstance(rag_output, BaseException):
+            logging.error(f"Document search failed during web search: {rag_output!r}")
+            partial_errors.append(f"Document search failed: {getattr(rag_output, 'detail', None) or rag_output}")
+            rag_output = ""
+        if isinstance(web_results, BaseException):
+            logging.error(f"Web search failed during combined search: {web_results!r}")
+            partial_errors.append(f"Web search failed: {web_results}")
+            web_results = []
+        return {"output": merge_results(rag_output, web_results), "error": "", "partial_error": "; ".join(partial_errors)}
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        logging.exception(f"Error during web search: {e}")
+        return {"output": "", "error": str(e)}
+
+@app.get("/stats")
+async def stats():
+    return backend_stats()
+
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+@app.on_event("startup")
+def startup():
+    job_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    job_manager.stop()
+    for limiter in (search_limiter, initialize_limiter):
+        limiter.shutdown()
+    await web_search_client.aclose()
+    close_engines()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
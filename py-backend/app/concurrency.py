@@ -0,0 +1,172 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterator
+
+from fastapi import HTTPException
+
+from libs.metrics import call_profiled
+
+logger = logging.getLogger(__name__)
+
+class EndpointLimiter:
+    """Runs blocking work for one endpoint on a bounded thread pool.
+
+    At most `max_concurrency` calls run at once and at most `max_queue` more
+    wait for a worker. Anything beyond that is rejected with 429 so a burst of
+    slow requests cannot pile up unbounded work behind the event loop.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int) -> None:
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"{name}-worker")
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _admit(self) -> None:
+        # Only touched from the event loop thread, so no lock is needed
+        if self.in_flight >= self.max_concurrency + self.max_queue:
+            self.rejected += 1
+            logger.warning(f"Rejecting {self.name} request: {self.in_flight} in flight")
+            raise HTTPException(status_code=429, detail=f"Too many concurrent {self.name} requests", headers={"Retry-After": "1"})
+        self.in_flight += 1
+
+    def _release(self, _future=None) -> None:
+        self.in_flight -= 1
+        self.completed += 1
+
+    def _start(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> "asyncio.Future[Any]":
+        loop = asyncio.get_running_loop()
+        # Carry the request's trace and profiling context onto the worker thread
+        context = contextvars.copy_context()
+        work = self.executor.submit(context.run, call_profiled, func, *args, **kwargs)
+        # Released when the worker is really done, not when the caller stops waiting: a cancelled
+        # request whose work already started keeps its slot until the thread is free again
+        work.add_done_callback(lambda _: loop.is_closed() or loop.call_soon_threadsafe(self._release))
+        return asyncio.wrap_future(work, loop=loop)
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> "asyncio.Future[Any]":
+        """Admit and start `func` now, returning a future instead of waiting for it.
+
+        For work that outlives the request that started it; the slot is held
+        until `func` itself finishes.
+        """
+        self._admit()
+        try:
+            return self._start(func, *args, **kwargs)
+        except BaseException:
+            self._release()
+            raise
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        # Cancelling the await only cancels work that is still queued; that releases the slot at once
+        return await self.submit(func, *args, **kwargs)
+
+    def stream(self, func: Callable[..., Iterator[Any]], *args: Any, **kwargs: Any) -> "AdmittedStream":
+        """Run a blocking generator on the pool, handing each item to the event loop as it is produced.
+
+        Admission is checked here rather than on first iteration so a full
+        pool still turns into a 429 before any response has been started.
+        The returned stream owns the slot, so it goes back even if the stream
+        is never iterated.
+        """
+        self._admit()
+        return AdmittedStream(lambda release: self._stream(release, func, *args, **kwargs), self._release)
+
+    async def _stream(self, release: Callable[..., None], func: Callable[..., Iterator[Any]], *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        stopped = threading.Event()
+        context = contextvars.copy_context()
+
+        def produce() -> None:
+            try:
+                for item in func(*args, **kwargs):
+                    loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+                    # The client went away: stop before starting the next stage
+                    if stopped.is_set():
+                        break
+                loop.call_soon_threadsafe(queue.put_nowait, (finished, None))
+            except BaseException as e:
+                loop.call_soon_threadsafe(queue.put_nowait, (finished, e))
+
+        try:
+            future = loop.run_in_executor(self.executor, context.run, call_profiled, produce)
+        except BaseException:
+            release()
+            raise
+        future.add_done_callback(release)
+        try:
+            while True:
+                item, error = await queue.get()
+                if item is finished:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            stopped.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": max(0, self.in_flight - self.max_concurrency),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class AdmittedStream:
+    """Async iterator returned by EndpointLimiter.stream that holds the admitted slot.
+
+    Once iteration starts the producer releases the slot when it finishes.
+    A stream that is closed or dropped before its first item, e.g. because the
+    client disconnected before the response body was sent, releases it here.
+    """
+
+    def __init__(self, start: Callable[[Callable[..., None]], AsyncIterator[Any]], release: Callable[[], None]) -> None:
+        self._release = release
+        self.released = False
+        self.started = False
+        self.loop = asyncio.get_running_loop()
+        self.iterator = start(self.release)
+
+    def release(self, _future=None) -> None:
+        if not self.released:
+            self.released = True
+            self._release()
+
+    def __aiter__(self) -> "AdmittedStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        self.started = True
+        return await self.iterator.__anext__()
+
+    async def aclose(self) -> None:
+        try:
+            await self.iterator.aclose()
+        finally:
+            if not self.started:
+                self.release()
+
+    def __del__(self) -> None:
+        if not self.started and not self.released and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.release)
+
+def create_limiter(name: str, default_concurrency: int, default_queue: int) -> EndpointLimiter:
+    prefix = name.upper()
+    max_concurrency = int(os.environ.get(f"{prefix}_MAX_CONCURRENCY", default_concurrency))
+    max_queue = int(os.environ.get(f"{prefix}_MAX_QUEUE", default_queue))
+    return EndpointLimiter(name, max_concurrency, max_queue)
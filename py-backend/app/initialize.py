@@ -1,29 +1,130 @@
 import sys
-import re
-from libs.opensearch import OpenSearchClient
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import BedrockEmbeddings
+from libs.opensearch import OpenSearchClient, is_opensearch
+from libs.manifest import IngestManifest
+from libs.cache import ParentDocumentCache, PARENT_CACHE_PATH
+from libs.embedding_providers import create_embeddings, embedding_dimension, get_index_name, generation_index_name, base_index_name
+from libs.chroma import CHROMA_PATH, resolve_collection, set_alias, list_collection_names, list_generations
+from libs.chroma_engine import get_engine
 
+# Index lifecycle: every vector store option serves searches and ingestion under
+# get_index_name(). With blue/green reindexing that name is an alias for one
+# generation "<name>-g<n>": create a generation, ingest into it, then swap the
+# alias over to it while searches keep hitting the old one.
 
-CHROMA_PATH = './vectordb/chroma'
+def index_dimension(embedding_model, region):
+    try:
+        return embedding_dimension(embedding_model)
+    except ValueError:
+        # Only models without a known size need a client, to probe it
+        return embedding_dimension(embedding_model, create_embeddings(embedding_model, region))
+
+def check_generation(index_name, generation):
+    if generation == index_name or base_index_name(generation) != index_name:
+        raise ValueError(f"{generation} is not a generation of {index_name}")
+
+def describe_index(embedding_model, region, vector_db_option):
+    index_name = get_index_name(embedding_model, vector_db_option)
+    if is_opensearch(vector_db_option):
+        os_client = OpenSearchClient(index_name, create=False)
+        generations = os_client.get_generations()
+        serving = os_client.get_alias_indexes() or ([index_name] if os_client.is_index_present() else [])
+    elif vector_db_option == "Chroma":
+        generations = {name: False for name in list_generations(get_engine().client, index_name)}
+        serving = [resolve_collection(CHROMA_PATH, index_name)]
+        generations.update({name: True for name in serving if name in generations})
+    else:
+        raise ValueError(f"Unsupported vector_db_option: {vector_db_option}")
+    return {"index": index_name, "serving": serving, "generations": generations}
+
+def create_index(embedding_model, region, vector_db_option):
+    """Create an empty generation for a reindex; it serves nothing until swapped in."""
+    index_name = get_index_name(embedding_model, vector_db_option)
+    generation = generation_index_name(index_name)
+    if is_opensearch(vector_db_option):
+        # Server-side embedded generations get their ingest pipeline on first ingest
+        OpenSearchClient(generation, index_dimension(embedding_model, region)).create_index()
+    elif vector_db_option == "Chroma":
+        get_engine().collection(generation, create=True)
+    else:
+        raise ValueError(f"Unsupported vector_db_option: {vector_db_option}")
+    return {"index": index_name, "created": generation}
+
+def swap_index(embedding_model, region, vector_db_option, target, delete_previous=False, on_swapped=None):
+    """Point the index name at generation `target`; the previous one is kept for rollback unless `delete_previous`."""
+    index_name = get_index_name(embedding_model, vector_db_option)
+    check_generation(index_name, target)
+    if is_opensearch(vector_db_option):
+        previous = OpenSearchClient(index_name, create=False).swap_alias(target)
+        # A concrete index that held the name is dropped by the swap itself
+        deleted = [name for name in previous if name == index_name]
+        previous_generations = [name for name in previous if name != index_name]
+    elif vector_db_option == "Chroma":
+        collections = list_collection_names(get_engine().client)
+        if target not in collections:
+            raise ValueError(f"Collection {target} does not exist")
+        alias = set_alias(CHROMA_PATH, index_name, target)
+        previous = [alias] if alias else [name for name in (index_name,) if name in collections]
+        deleted, previous_generations = [], previous
+    else:
+        raise ValueError(f"Unsupported vector_db_option: {vector_db_option}")
+
+    if on_swapped is not None:
+        # Lets the caller drop handles on the previous generation before it is deleted
+        on_swapped()
+    if delete_previous:
+        for name in previous_generations:
+            if is_opensearch(vector_db_option):
+                deleted += OpenSearchClient(name, create=False).delete_index()
+            else:
+                deleted += get_engine().delete_collections([name])
+
+    # Incremental ingests into the index name now have to diff against what the new generation holds
+    IngestManifest.copy(vector_db_option, target, index_name)
+    for name in deleted:
+        if name != index_name:
+            IngestManifest.delete(vector_db_option, name)
+    invalidate_parents(vector_db_option, index_name)
+    return {"index": index_name, "serving": target, "previous": previous, "deleted": deleted}
+
+def invalidate_parents(vector_db_option, index_name):
+    if PARENT_CACHE_PATH:
+        ParentDocumentCache(0, PARENT_CACHE_PATH).invalidate_index(vector_db_option, index_name)
+
+def delete_index(embedding_model, region, vector_db_option, generation=None):
+    """Delete one generation that is not serving, or with no `generation` the whole index and every generation."""
+    index_name = get_index_name(embedding_model, vector_db_option)
+    if generation is not None and generation != index_name:
+        check_generation(index_name, generation)
+        if generation in describe_index(embedding_model, region, vector_db_option)["serving"]:
+            raise ValueError(f"{generation} is serving {index_name}; swap to another generation first")
+        names = [generation]
+    elif is_opensearch(vector_db_option):
+        names = [index_name, *OpenSearchClient(index_name, create=False).get_generations()]
+    elif vector_db_option == "Chroma":
+        names = [index_name, *list_generations(get_engine().client, index_name)]
+    else:
+        raise ValueError(f"Unsupported vector_db_option: {vector_db_option}")
+
+    # Dropping an index never embeds anything, so no embedding client is created here
+    if is_opensearch(vector_db_option):
+        deleted = [deleted_name for name in names for deleted_name in OpenSearchClient(name, create=False).delete_index()]
+    elif vector_db_option == "Chroma":
+        if index_name in names:
+            set_alias(CHROMA_PATH, index_name, None)
+        deleted = get_engine().delete_collections(names)
+    for name in names:
+        IngestManifest.delete(vector_db_option, name)
+    if index_name in names:
+        invalidate_parents(vector_db_option, index_name)
+    return {"index": index_name, "deleted": deleted}
 
 def main():
     embedding_model = sys.argv[1]
     region = sys.argv[2]
     vector_db_option = sys.argv[3]
 
-    suffix = re.sub(r'[^a-z0-9]', '', embedding_model.lower())
-    index_name = f'docs-{suffix}'
-    
-    embeddings = BedrockEmbeddings(model_id=embedding_model, region_name=region)
-    if vector_db_option == "OpenSearch":
-        os_client = OpenSearchClient(index_name)
-        os_client.delete_index()
-    elif vector_db_option == "Chroma":
-        vector_store = Chroma(collection_name=index_name, embedding_function=embeddings, persist_directory=CHROMA_PATH)
-        vector_store.delete_collection(index_name)
-
-    print(f"Index Deleted.")
+    result = delete_index(embedding_model, region, vector_db_option)
+    print(f"Index Deleted: {', '.join(result['deleted']) or 'nothing to delete'}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,308 @@
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from libs.chroma import CHROMA_PATH
+from libs.chroma_engine import CHROMA_PREFIX, get_engine
+from libs.manifest import MANIFEST_DIR
+from libs.metrics import observe_stage, INGESTED_CHUNKS
+from libs.opensearch import NEURAL_VECTOR_STORE
+
+logger = logging.getLogger(__name__)
+
+JOBS_DB_PATH = os.path.abspath(os.environ.get('JOBS_DB_PATH', './vectordb/jobs.sqlite3'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_DELAY = float(os.environ.get('JOB_RETRY_DELAY_SECONDS', 30))
+JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT_SECONDS', 6000))
+PROCESS_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'process.py')
+PROGRESS_PREFIX = 'PROGRESS '
+SPANS_PREFIX = 'SPANS '
+
+class JobStore:
+    """SQLite-backed ingestion job queue that survives backend restarts."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        path = path or JOBS_DB_PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    file_paths TEXT NOT NULL,
+                    embedding_model TEXT NOT NULL,
+                    region TEXT NOT NULL,
+                    vector_store TEXT NOT NULL,
+                    index_name TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    progress TEXT NOT NULL DEFAULT '{}',
+                    error TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if 'index_name' not in columns:
+                # Queues created before blue/green reindexing
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN index_name TEXT")
+            # Jobs that were running when the backend stopped go back to the queue
+            self._conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+
+    def _row_to_job(self, row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job['file_paths'] = json.loads(job['file_paths'])
+        job['progress'] = json.loads(job['progress'])
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def create(self, file_paths: List[str], embedding_model: str, region: str, vector_store: str, index_name: Optional[str] = None, max_attempts: int = JOB_MAX_ATTEMPTS) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, file_paths, embedding_model, region, vector_store, index_name, max_attempts, available_at, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(file_paths), embedding_model, region, vector_store, index_name, max_attempts, now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' AND available_at <= ? ORDER BY created_at LIMIT 1",
+                (time.time(),)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ?, error = NULL WHERE id = ?",
+                (time.time(), row['id'])
+            )
+            job_id = row['id']
+        return self.get(job_id)
+
+    def update_progress(self, job_id: str, progress: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?", (status, error, time.time(), job_id))
+
+    def retry(self, job_id: str, error: str, delay: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET status = 'queued', error = ?, available_at = ? WHERE id = ?", (error, time.time() + delay, job_id))
+
+    def request_cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status IN ('queued', 'running')", (job_id,))
+            self._conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'", (time.time(), job_id))
+        return self.get(job_id)
+
+class JobManager:
+    """Worker pool that runs queued ingestion jobs through process.py.
+
+    Each job runs in its own subprocess so it can be cancelled or time out
+    without touching the backend. process.py reports progress on stdout as
+    `PROGRESS {...}` lines, which are persisted on the job row, and stage
+    timings as `SPANS [...]` lines, which feed /metrics. Chroma jobs send
+    their records as `CHROMA {...}` lines for the backend's engine to write,
+    so only one process ever writes to the Chroma path. Failed jobs
+    are retried with exponential backoff and keep their input files until
+    they succeed or are cancelled.
+    """
+
+    def __init__(self, store: Optional[JobStore] = None, workers: int = JOB_WORKERS, on_attempt_finished: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
+        self.store = store
+        self.workers = workers
+        self.on_attempt_finished = on_attempt_finished
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+        self._processes: Dict[str, subprocess.Popen] = {}
+
+    def start(self) -> None:
+        # Opened here rather than at import so importing the app never touches the job database
+        if self.store is None:
+            self.store = JobStore()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        for process in list(self._processes.values()):
+            process.terminate()
+
+    def submit(self, file_paths: List[str], embedding_model: str, region: str, vector_store: str, index_name: Optional[str] = None) -> Dict[str, Any]:
+        # index_name targets a blue/green generation; by default jobs write to the index being searched
+        job = self.store.create(file_paths, embedding_model, region, vector_store, index_name)
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.request_cancel(job_id)
+        process = self._processes.get(job_id)
+        if process is not None:
+            process.terminate()
+        if job is not None and job['status'] == 'cancelled':
+            self._remove_files(job)
+        return job
+
+    def _worker(self) -> None:
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+            job = self.store.claim_next()
+            if job is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=1.0)
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                logger.exception(f"Job {job['id']} crashed: {e}")
+                self.store.finish(job['id'], 'failed', str(e))
+
+    def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job['id']
+        logger.info(f"Job {job_id}: attempt {job['attempts']} for {job['file_paths']}")
+        env = {**os.environ, 'PYTHONUNBUFFERED': '1'}
+        if job['index_name']:
+            env['INGEST_INDEX_NAME'] = job['index_name']
+        # State paths are resolved once here, so a job agrees with the backend whatever its working directory
+        env['MANIFEST_DIR'] = MANIFEST_DIR
+        if job['vector_store'] == 'Chroma':
+            env.update(INGEST_CHROMA_PIPE='1', CHROMA_PATH=CHROMA_PATH)
+        elif job['vector_store'] == NEURAL_VECTOR_STORE:
+            # Imported here: the connector module pulls in boto3, which the backend otherwise loads lazily
+            from libs.opensearch_connector import NEURAL_MODELS_PATH
+            env['NEURAL_MODELS_PATH'] = NEURAL_MODELS_PATH
+        # Logs go to their own pipe: written by other threads, they could land inside a long CHROMA line
+        process = subprocess.Popen(
+            [sys.executable, PROCESS_SCRIPT, job['embedding_model'], job['region'], job['vector_store'], *job['file_paths']],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env
+        )
+        self._processes[job_id] = process
+        timer = threading.Timer(JOB_TIMEOUT, process.kill)
+        timer.start()
+
+        started = time.time()
+        output_tail = deque(maxlen=20)
+        logs = threading.Thread(target=self._read_logs, args=(job_id, process.stderr, output_tail), daemon=True)
+        logs.start()
+        progress = {}
+        writes = []
+        try:
+            for line in process.stdout:
+                line = line.rstrip()
+                if line.startswith(PROGRESS_PREFIX):
+                    progress = json.loads(line[len(PROGRESS_PREFIX):])
+                    elapsed = max(time.time() - started, 1e-6)
+                    progress['chunks_per_sec'] = round(progress.get('chunks_indexed', 0) / elapsed, 2)
+                    self.store.update_progress(job_id, progress)
+                elif line.startswith(SPANS_PREFIX):
+                    for stage, seconds in json.loads(line[len(SPANS_PREFIX):]):
+                        observe_stage(stage, seconds)
+                elif line.startswith(CHROMA_PREFIX):
+                    self._write_chroma(json.loads(line[len(CHROMA_PREFIX):]), process, writes)
+                else:
+                    output_tail.append(line)
+                    logger.info(f"Job {job_id}: {line}")
+            returncode = process.wait()
+            logs.join()
+        finally:
+            timer.cancel()
+            self._processes.pop(job_id, None)
+            process.stdin.close()
+        for outcome in ('indexed', 'skipped', 'deleted'):
+            INGESTED_CHUNKS.labels(outcome).inc(progress.get(f'chunks_{outcome}', 0))
+
+        job = self.store.get(job_id)
+        if returncode == 0:
+            self.store.finish(job_id, 'succeeded')
+            self._remove_files(job)
+        elif job['cancel_requested']:
+            self.store.finish(job_id, 'cancelled', 'Cancelled by user')
+            self._remove_files(job)
+        elif self._stopping:
+            # Interrupted by shutdown, not by the job itself: run it again on the next start
+            self.store.retry(job_id, 'Interrupted by backend shutdown', 0)
+        elif job['attempts'] < job['max_attempts']:
+            delay = JOB_RETRY_DELAY * (2 ** (job['attempts'] - 1))
+            logger.warning(f"Job {job_id} failed (attempt {job['attempts']}), retrying in {delay:.0f}s")
+            self.store.retry(job_id, "\n".join(output_tail), delay)
+        else:
+            logger.error(f"Job {job_id} failed after {job['attempts']} attempts, keeping input files")
+            self.store.finish(job_id, 'failed', "\n".join(output_tail) or f"process.py exited with code {returncode}")
+
+        # Any attempt may have written to the index, even one that failed part way
+        if self.on_attempt_finished is not None:
+            self.on_attempt_finished(self.store.get(job_id))
+
+    def _read_logs(self, job_id: str, stream, output_tail: deque) -> None:
+        for line in stream:
+            line = line.rstrip()
+            output_tail.append(line)
+            logger.info(f"Job {job_id}: {line}")
+
+    def _write_chroma(self, message: Dict[str, Any], process: subprocess.Popen, writes: List[Any]) -> None:
+        engine = get_engine()
+        if message['op'] != 'flush':
+            # Blocks while the engine's write queue is full, which in turn stops the job at its next line
+            writes.append(engine.write(message['collection'], message['op'], message['records']))
+            return
+        engine.flush()
+        errors = [str(future.exception()) for future in writes if future.exception() is not None]
+        writes.clear()
+        # One line per reply, whatever the exception message holds
+        reply = f"ERROR {' '.join(errors[0].split())}" if errors else "OK"
+        try:
+            process.stdin.write(f"{reply}\n")
+            process.stdin.flush()
+        except (BrokenPipeError, ValueError):
+            # The job was killed while waiting for the reply
+            pass
+
+    def _remove_files(self, job: Dict[str, Any]) -> None:
+        # Imported here so process.py can import PROGRESS_PREFIX without pulling in FastAPI
+        from uploads import remove_upload
+        for path in job['file_paths']:
+            remove_upload(path)
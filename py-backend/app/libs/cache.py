@@ -0,0 +1,188 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+_MISSING = object()
+
+# Optional SQLite second tier for parent documents, e.g. ./vectordb/parents.sqlite3; empty keeps them in memory only
+PARENT_CACHE_PATH = os.environ.get('PARENT_CACHE_PATH', '')
+
+class TTLCache:
+    """Thread-safe LRU cache with an optional per-entry time-to-live.
+
+    Keeps hit/miss/eviction counters so callers can expose cache efficiency.
+    A `ttl` of None means entries only leave the cache through LRU eviction
+    or explicit invalidation.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+class ParentDocumentCache:
+    """Two-tier cache of parent documents keyed by (vector store, index, parent id).
+
+    The first tier is an in-memory LRU; the optional second tier is a SQLite
+    file that survives restarts and is shared by every worker on the host.
+    Parent ids are content hashes, so a cached parent can never go stale;
+    invalidation on ingest or delete just keeps removed parents from
+    lingering.
+    """
+
+    def __init__(self, maxsize: int, disk_path: Optional[str] = None) -> None:
+        self.memory = TTLCache(maxsize)
+        self.disk_path = disk_path
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.store_fetches = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        if disk_path:
+            if os.path.dirname(disk_path):
+                os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False)
+            with self._lock, self._conn:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS parents (
+                        vector_store TEXT NOT NULL,
+                        index_name TEXT NOT NULL,
+                        parent_id TEXT NOT NULL,
+                        document TEXT NOT NULL,
+                        PRIMARY KEY (vector_store, index_name, parent_id)
+                    )
+                """)
+
+    def get_many(self, vector_db_option: str, index_name: str, parent_ids: Iterable[str]) -> Dict[str, Any]:
+        found = {}
+        missing = []
+        for parent_id in parent_ids:
+            document = self.memory.get((vector_db_option, index_name, parent_id))
+            if document is None:
+                missing.append(parent_id)
+            else:
+                found[parent_id] = document
+        if missing and self._conn is not None:
+            placeholders = ",".join("?" * len(missing))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT parent_id, document FROM parents WHERE vector_store = ? AND index_name = ? AND parent_id IN ({placeholders})",
+                    (vector_db_option, index_name, *missing),
+                ).fetchall()
+                self.disk_hits += len(rows)
+                self.disk_misses += len(missing) - len(rows)
+            for parent_id, document in rows:
+                found[parent_id] = json.loads(document)
+                # Promote disk hits so the next lookup stays in memory
+                self.memory.set((vector_db_option, index_name, parent_id), found[parent_id])
+        return found
+
+    def set_many(self, vector_db_option: str, index_name: str, documents: Dict[str, Any]) -> None:
+        if not documents:
+            return
+        with self._lock:
+            self.store_fetches += len(documents)
+        for parent_id, document in documents.items():
+            self.memory.set((vector_db_option, index_name, parent_id), document)
+        if self._conn is not None:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO parents (vector_store, index_name, parent_id, document) VALUES (?, ?, ?, ?)",
+                    [(vector_db_option, index_name, parent_id, json.dumps(document)) for parent_id, document in documents.items()],
+                )
+
+    def invalidate_index(self, vector_db_option: str, index_name: str) -> int:
+        removed = self.memory.invalidate(lambda key: key[:2] == (vector_db_option, index_name))
+        if self._conn is not None:
+            with self._lock, self._conn:
+                removed += self._conn.execute(
+                    "DELETE FROM parents WHERE vector_store = ? AND index_name = ?", (vector_db_option, index_name)
+                ).rowcount
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        memory = self.memory.stats()
+        with self._lock:
+            disk_lookups = self.disk_hits + self.disk_misses
+            lookups = memory["hits"] + memory["misses"]
+            disk = {
+                "path": self.disk_path,
+                "hits": self.disk_hits,
+                "misses": self.disk_misses,
+                "hit_rate": round(self.disk_hits / disk_lookups, 4) if disk_lookups else 0.0,
+            } if self._conn is not None else None
+            return {
+                "memory": memory,
+                "disk": disk,
+                "store_fetches": self.store_fetches,
+                "hit_rate": round((memory["hits"] + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
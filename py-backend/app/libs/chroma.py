@@ -0,0 +1,142 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from libs.embedding_providers import base_index_name
+
+logger = logging.getLogger(__name__)
+
+# Resolved once at import so the backend and its ingestion subprocesses agree on it whatever their working directory
+CHROMA_PATH = os.path.abspath(os.environ.get('CHROMA_PATH', './vectordb/chroma'))
+# HNSW parameters for new collections. Existing collections keep the ones they were created with.
+CHROMA_HNSW_SPACE = os.environ.get('CHROMA_HNSW_SPACE', 'l2')
+CHROMA_HNSW_M = int(os.environ.get('CHROMA_HNSW_M', 16))
+CHROMA_HNSW_CONSTRUCTION_EF = int(os.environ.get('CHROMA_HNSW_CONSTRUCTION_EF', 100))
+CHROMA_HNSW_SEARCH_EF = int(os.environ.get('CHROMA_HNSW_SEARCH_EF', 100))
+# Vectors buffered before they go into the graph, and writes between saves of the graph to disk
+CHROMA_HNSW_BATCH_SIZE = int(os.environ.get('CHROMA_HNSW_BATCH_SIZE', 100))
+CHROMA_HNSW_SYNC_THRESHOLD = int(os.environ.get('CHROMA_HNSW_SYNC_THRESHOLD', 1000))
+# Compact indexes keep parent chunks out of the searched collection, in "<collection>-parents"
+PARENT_COLLECTION_SUFFIX = '-parents'
+# Chroma needs a vector per record; parents are only ever fetched by id, so one float is enough
+PLACEHOLDER_EMBEDDING = [0.0]
+# Chroma has no aliases, so blue/green swaps go through a {index name: collection} map next to the data
+ALIASES_FILE = 'aliases.json'
+
+def get_client(path: str):
+    """A persistent client with the same settings langchain's Chroma uses, so both share one system per path."""
+    import chromadb
+    from chromadb.config import Settings
+    return chromadb.Client(Settings(is_persistent=True, persist_directory=path))
+
+def hnsw_metadata() -> Dict[str, Any]:
+    # Collection metadata keys, which every Chroma version since 0.4 reads
+    return {
+        "hnsw:space": CHROMA_HNSW_SPACE,
+        "hnsw:M": CHROMA_HNSW_M,
+        "hnsw:construction_ef": CHROMA_HNSW_CONSTRUCTION_EF,
+        "hnsw:search_ef": CHROMA_HNSW_SEARCH_EF,
+        "hnsw:batch_size": CHROMA_HNSW_BATCH_SIZE,
+        "hnsw:sync_threshold": CHROMA_HNSW_SYNC_THRESHOLD,
+    }
+
+def load_aliases(path: str) -> Dict[str, str]:
+    aliases_path = os.path.join(path, ALIASES_FILE)
+    if not os.path.exists(aliases_path):
+        return {}
+    with open(aliases_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_aliases(path: str, aliases: Dict[str, str]) -> None:
+    # Written to a temp file and renamed, so readers see either the old or the new mapping
+    os.makedirs(path, exist_ok=True)
+    aliases_path = os.path.join(path, ALIASES_FILE)
+    with open(f"{aliases_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(aliases, f)
+    os.replace(f"{aliases_path}.tmp", aliases_path)
+
+def resolve_collection(path: str, index_name: str) -> str:
+    return load_aliases(path).get(index_name, index_name)
+
+def set_alias(path: str, index_name: str, collection_name: Optional[str]) -> Optional[str]:
+    """Point `index_name` at a collection (or drop the alias with None), returning the previous target."""
+    aliases = load_aliases(path)
+    previous = aliases.pop(index_name, None)
+    if collection_name is not None:
+        aliases[index_name] = collection_name
+    save_aliases(path, aliases)
+    return previous
+
+def list_collection_names(client) -> List[str]:
+    # Chroma < 0.6 lists collection objects, later versions list names
+    return [getattr(collection, 'name', collection) for collection in client.list_collections()]
+
+def list_generations(client, index_name: str) -> List[str]:
+    return sorted(name for name in list_collection_names(client) if name != index_name and base_index_name(name) == index_name)
+
+def parent_collection_name(collection_name: str) -> str:
+    return f"{collection_name}{PARENT_COLLECTION_SUFFIX}"
+
+def get_parent_collection(vector_store, create: bool = False):
+    """The lookup-only parent collection next to a langchain Chroma store, or None if there is none."""
+    from chromadb.errors import NotFoundError
+    name = parent_collection_name(vector_store._collection.name)
+    engine = getattr(vector_store._collection, 'engine', None)
+    if engine is not None:
+        # Stores opened through a ChromaEngine read and write parents through it too
+        return engine.collection(name, create=create)
+    if create:
+        return vector_store._client.get_or_create_collection(name, embedding_function=None)
+    try:
+        return vector_store._client.get_collection(name, embedding_function=None)
+    except (NotFoundError, ValueError):
+        return None
+
+def add_parent_documents(vector_store, documents: List[Any], ids: List[str]) -> None:
+    get_parent_collection(vector_store, create=True).upsert(
+        ids=ids,
+        documents=[doc.page_content for doc in documents],
+        metadatas=[doc.metadata for doc in documents],
+        embeddings=[PLACEHOLDER_EMBEDDING] * len(ids),
+    )
+
+def get_parent_documents(vector_store, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    collection = get_parent_collection(vector_store)
+    if collection is None:
+        return {}
+    result = collection.get(ids=ids)
+    return {
+        doc_id: {"ids": [doc_id], "documents": [document], "metadatas": [metadata]}
+        for doc_id, document, metadata in zip(result['ids'], result['documents'], result['metadatas'])
+    }
+
+def delete_parent_documents(vector_store, ids: List[str]) -> None:
+    collection = get_parent_collection(vector_store)
+    if collection is not None:
+        collection.delete(ids=ids)
+
+def delete_parent_collection(client, collection_name: str) -> Optional[str]:
+    from chromadb.errors import NotFoundError
+    name = parent_collection_name(collection_name)
+    try:
+        client.delete_collection(name)
+    except (NotFoundError, ValueError):
+        return None
+    logger.info(f"Deleted Chroma parent collection: {name}")
+    return name
+
+def delete_collections(client, names: List[str]) -> List[str]:
+    """Delete collections and their parent collections, returning the names that existed."""
+    from chromadb.errors import NotFoundError
+    deleted = []
+    for name in names:
+        try:
+            client.delete_collection(name)
+        except (NotFoundError, ValueError):
+            pass
+        else:
+            logger.info(f"Deleted Chroma collection: {name}")
+            deleted.append(name)
+        delete_parent_collection(client, name)
+    return deleted
@@ -0,0 +1,352 @@
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from libs.chroma import CHROMA_PATH, PLACEHOLDER_EMBEDDING, get_client, hnsw_metadata, resolve_collection, parent_collection_name, delete_collections
+
+logger = logging.getLogger(__name__)
+
+# Records per call the writer makes to Chroma, and how long it waits for more writes to fill one
+CHROMA_WRITE_BATCH = int(os.environ.get('CHROMA_WRITE_BATCH', 64))
+CHROMA_WRITE_LINGER = float(os.environ.get('CHROMA_WRITE_LINGER_MS', 20)) / 1000
+# Writes waiting for the writer; beyond this, writers block until it catches up
+CHROMA_WRITE_QUEUE = int(os.environ.get('CHROMA_WRITE_QUEUE', 64))
+CHROMA_PREFIX = 'CHROMA '
+WARMUP_ID = '__chroma_engine_warmup__'
+
+_registry_lock = threading.Lock()
+_engines = {}
+
+class ReadWriteLock:
+    """Any number of readers or one writer.
+
+    A waiting writer holds back new readers, so a steady stream of searches
+    cannot hold off a collection being dropped. Not reentrant.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def reading(self):
+        with self._cond:
+            while self._writing or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def writing(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writing or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+class EngineCollection:
+    """A chromadb Collection opened through a ChromaEngine.
+
+    Reads hold the engine's read lock, and writes go through its writer and
+    wait for it, so langchain's Chroma can use it in place of the collection
+    it opened. Anything else is passed through to the collection.
+    """
+
+    def __init__(self, engine: "ChromaEngine", collection) -> None:
+        self.engine = engine
+        self._collection = collection
+
+    @property
+    def name(self) -> str:
+        return self._collection.name
+
+    def query(self, *args, **kwargs):
+        with self.engine.reading():
+            return self._collection.query(*args, **kwargs)
+
+    def get(self, *args, **kwargs):
+        with self.engine.reading():
+            return self._collection.get(*args, **kwargs)
+
+    def count(self) -> int:
+        with self.engine.reading():
+            return self._collection.count()
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None, **_) -> None:
+        records = {"ids": ids, "embeddings": embeddings, "metadatas": metadatas, "documents": documents}
+        self.engine.write(self.name, 'upsert', {key: value for key, value in records.items() if value is not None}).result()
+
+    add = upsert
+
+    def delete(self, ids=None, **_) -> None:
+        if ids:
+            self.engine.write(self.name, 'delete', {"ids": ids}).result()
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+class ChromaEngine:
+    """The backend's one Chroma client for a persistence path.
+
+    Collections are opened once, created with the configured HNSW parameters,
+    and stay in memory for the life of the process. Every write is queued to
+    a single writer thread, which merges consecutive writes to a collection
+    and applies them in calls of up to `write_batch` records. Chroma applies
+    each call atomically, so a search sees a call's records all or none.
+    Writes are applied in the order they were queued, so parents written
+    before their children are visible first. Searches hold the read side of
+    a lock that is only taken exclusively to drop collections.
+    """
+
+    def __init__(self, path: str = CHROMA_PATH, write_batch: int = CHROMA_WRITE_BATCH, linger: float = CHROMA_WRITE_LINGER, queue_size: int = CHROMA_WRITE_QUEUE) -> None:
+        self.path = path
+        self.write_batch = write_batch
+        self.linger = linger
+        self.client = get_client(path)
+        self.batches = 0
+        self.records_written = 0
+        self._lock = ReadWriteLock()
+        self._open_lock = threading.Lock()
+        self._collections: Dict[str, EngineCollection] = {}
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._writer = threading.Thread(target=self._write_loop, name="chroma-writer", daemon=True)
+        self._writer.start()
+
+    def reading(self):
+        return self._lock.reading()
+
+    def collection(self, name: str, create: bool = False) -> Optional[EngineCollection]:
+        """The open collection `name`, or None if it does not exist and `create` is False."""
+        collection = self._collections.get(name)
+        if collection is None:
+            from chromadb.errors import NotFoundError
+            with self._open_lock:
+                collection = self._collections.get(name)
+                if collection is None:
+                    if create:
+                        raw = self.client.get_or_create_collection(name, metadata=hnsw_metadata(), embedding_function=None)
+                    else:
+                        try:
+                            raw = self.client.get_collection(name, embedding_function=None)
+                        except (NotFoundError, ValueError):
+                            return None
+                    # Chroma loads its index for writing on the first write after a read, holding up searches
+                    # for as long as that takes; a read and a no-op delete have it loaded up front instead
+                    raw.count()
+                    raw.delete(ids=[WARMUP_ID])
+                    collection = self._collections[name] = EngineCollection(self, raw)
+        return collection
+
+    def vector_store(self, index_name: str, embed_model):
+        """A langchain Chroma store on the collection `index_name` currently resolves to."""
+        from langchain_community.vectorstores import Chroma
+        collection = self.collection(resolve_collection(self.path, index_name), create=True)
+        vector_store = Chroma(client=self.client, collection_name=collection.name, embedding_function=embed_model)
+        # langchain reads and writes everything through _collection
+        vector_store._collection = collection
+        return vector_store
+
+    def delete_collections(self, names: List[str]) -> List[str]:
+        # Queued writes would otherwise recreate a collection right after it is deleted
+        self.flush()
+        with self._lock.writing(), self._open_lock:
+            for name in names:
+                self._collections.pop(name, None)
+                self._collections.pop(parent_collection_name(name), None)
+            return delete_collections(self.client, names)
+
+    def write(self, name: str, op: str, records: Dict[str, List[Any]]) -> Future:
+        """Queue an 'upsert' or 'delete' of `records` (column lists keyed by field, always with 'ids')."""
+        future = Future()
+        self._queue.put((name, op, records, future))
+        return future
+
+    def flush(self) -> None:
+        """Wait until every write queued before this call has been applied."""
+        future = Future()
+        self._queue.put((None, 'flush', None, future))
+        future.result()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"collections": len(self._collections), "queued_writes": self._queue.qsize(), "batches": self.batches, "records_written": self.records_written}
+
+    def close(self) -> None:
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            records = len(item[2]['ids']) if item[2] else 0
+            deadline = time.monotonic() + self.linger
+            while records < self.write_batch and batch[-1][1] != 'flush':
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                records += len(item[2]['ids']) if item[2] else 0
+            self._apply(batch)
+
+    def _apply(self, batch) -> None:
+        # Consecutive writes of the same kind to the same collection become one call
+        runs = []
+        for name, op, records, future in batch:
+            key = (name, op, tuple(records) if records else None)
+            if op != 'flush' and runs and runs[-1][0] == key:
+                runs[-1][1].append(records)
+                runs[-1][2].append(future)
+            else:
+                runs.append((key, [records], [future]))
+        for (name, op, _), records, futures in runs:
+            try:
+                if op != 'flush':
+                    merged = merge_records(records)
+                    # Chroma blocks searches while a call runs, so no call is longer than write_batch records
+                    for start in range(0, len(merged['ids']), self.write_batch):
+                        self._apply_run(name, op, {field: values[start:start + self.write_batch] for field, values in merged.items()})
+            except Exception as e:
+                logger.exception(f"Chroma {op} of {sum(len(r['ids']) for r in records)} records in {name} failed: {e}")
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future in futures:
+                    future.set_result(None)
+
+    def _apply_run(self, name: str, op: str, records: Dict[str, List[Any]]) -> None:
+        collection = self.collection(name, create=op == 'upsert')
+        if collection is None:
+            return
+        if op == 'upsert':
+            collection._collection.upsert(**records)
+        elif op == 'delete':
+            collection._collection.delete(ids=records['ids'])
+        else:
+            raise ValueError(f"Unsupported Chroma write: {op}")
+        self.batches += 1
+        self.records_written += len(records['ids'])
+
+def merge_records(records_list: List[Dict[str, List[Any]]]) -> Dict[str, List[Any]]:
+    # Chroma rejects an id twice in one call, so the last write of an id wins
+    fields = [key for key in records_list[0] if key != 'ids']
+    rows = {}
+    for records in records_list:
+        for i, _id in enumerate(records['ids']):
+            rows.pop(_id, None)
+            rows[_id] = [records[field][i] for field in fields]
+    return {"ids": list(rows), **{field: [row[j] for row in rows.values()] for j, field in enumerate(fields)}}
+
+def get_engine(path: str = CHROMA_PATH) -> ChromaEngine:
+    engine = _engines.get(path)
+    if engine is None:
+        with _registry_lock:
+            engine = _engines.get(path)
+            if engine is None:
+                engine = _engines[path] = ChromaEngine(path)
+    return engine
+
+def engine_stats() -> Dict[str, Any]:
+    # Only engines already open; stats never start one
+    return {path: engine.stats() for path, engine in list(_engines.items())}
+
+def close_engines() -> None:
+    # Applies writes still queued, so nothing acknowledged is lost on shutdown
+    with _registry_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        engine.close()
+
+class ChromaWriter:
+    """Write-side stand-in for langchain's Chroma used by ingestion, like BulkWriter for OpenSearch.
+
+    `add_documents` embeds straight away and queues the records on the
+    engine's writer without waiting for them. `flush` returns once all of
+    them are in the collection, and raises if any of them failed.
+    """
+
+    def __init__(self, engine: Optional[ChromaEngine], collection_name: str, embed_model) -> None:
+        self.engine = engine
+        self.collection_name = collection_name
+        self.embed_model = embed_model
+        self._futures: List[Future] = []
+
+    def add_documents(self, documents, ids, embed=True):
+        if embed:
+            name, embeddings = self.collection_name, self.embed_model.embed_documents([doc.page_content for doc in documents])
+        else:
+            # Compact indexes keep parents in a lookup-only collection
+            name, embeddings = parent_collection_name(self.collection_name), [PLACEHOLDER_EMBEDDING] * len(documents)
+        self._send(name, 'upsert', {
+            "ids": list(ids),
+            "embeddings": [list(vector) for vector in embeddings],
+            "documents": [doc.page_content for doc in documents],
+            "metadatas": [doc.metadata for doc in documents],
+        })
+        return ids
+
+    def delete(self, ids):
+        for name in (self.collection_name, parent_collection_name(self.collection_name)):
+            self._send(name, 'delete', {"ids": list(ids)})
+
+    def flush(self):
+        self.engine.flush()
+        futures, self._futures = self._futures, []
+        for future in futures:
+            if future.exception() is not None:
+                raise future.exception()
+
+    def _send(self, name, op, records):
+        self._futures.append(self.engine.write(name, op, records))
+
+class ChromaPipeWriter(ChromaWriter):
+    """ChromaWriter for an ingestion job, which writes through the backend's engine.
+
+    Records go out on stdout as `CHROMA {...}` lines, which the job runner
+    in jobs.py hands to the engine. `flush` sends a flush line and waits for
+    the runner's answer on stdin: `OK`, or `ERROR <message>`.
+    """
+
+    def __init__(self, collection_name: str, embed_model, output=None, replies=None) -> None:
+        super().__init__(None, collection_name, embed_model)
+        self.output = output if output is not None else sys.stdout
+        self.replies = replies if replies is not None else sys.stdin
+
+    def flush(self):
+        self.output.write(f"{CHROMA_PREFIX}{json.dumps({'op': 'flush'})}\n")
+        self.output.flush()
+        reply = self.replies.readline().rstrip('\n')
+        if reply != 'OK':
+            raise RuntimeError(f"Backend failed to write to Chroma: {reply[len('ERROR '):] if reply.startswith('ERROR ') else 'no reply'}")
+
+    def _send(self, name, op, records):
+        self.output.write(f"{CHROMA_PREFIX}{json.dumps({'collection': name, 'op': op, 'records': records})}\n")
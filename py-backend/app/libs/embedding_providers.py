@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from libs.local_models import OnnxSentenceEncoder, load_model
+from libs.opensearch import NEURAL_VECTOR_STORE
+
+logger = logging.getLogger(__name__)
+
+LOCAL_EMBED_ONNX_FILE = os.environ.get('LOCAL_EMBED_ONNX_FILE', 'onnx/model.onnx')
+LOCAL_EMBED_MAX_LENGTH = int(os.environ.get('LOCAL_EMBED_MAX_LENGTH', 512))
+LOCAL_EMBED_BATCH_SIZE = int(os.environ.get('LOCAL_EMBED_BATCH_SIZE', 32))
+LOCAL_EMBED_THREADS = int(os.environ.get('LOCAL_EMBED_THREADS', 0))
+FAKE_EMBED_DIMENSION = 1024
+MAX_INDEX_SUFFIX = 48
+# Blue/green reindexing builds a new generation "<index>-g<epoch millis>" and then points the index name at it
+GENERATION_PATTERN = re.compile(r'^(?P<index>.+)-g(?P<generation>\d{13,})$')
+# Bedrock's Cohere embed models take at most this many texts per request
+COHERE_MAX_BATCH = 96
+
+# Output sizes of the Bedrock models offered in the UI; anything else is probed once
+KNOWN_DIMENSIONS = {
+    "amazon.titan-embed-text-v2:0": 1024,
+    "amazon.titan-embed-text-v1": 1536,
+    "cohere.embed-english-v3": 1024,
+    "cohere.embed-multilingual-v3": 1024,
+}
+
+_dimension_lock = threading.Lock()
+_dimensions: Dict[str, int] = {}
+
+class LocalEmbeddings(Embeddings):
+    """Sentence embeddings computed on CPU from an ONNX export (e.g. sentence-transformers models)."""
+
+    batches_queries = True
+
+    def __init__(self, model_name: str, batch_size: int = LOCAL_EMBED_BATCH_SIZE, threads: int = LOCAL_EMBED_THREADS) -> None:
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.encoder = load_model(OnnxSentenceEncoder, model_name, onnx_file=LOCAL_EMBED_ONNX_FILE, max_length=LOCAL_EMBED_MAX_LENGTH, threads=threads)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encoder.encode(texts, batch_size=self.batch_size)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encoder.encode([text])[0]
+
+class DeterministicFakeEmbeddings(Embeddings):
+    """Unit vectors seeded by a hash of the text: same text, same vector, no network."""
+
+    batches_queries = True
+
+    def __init__(self, size: int = FAKE_EMBED_DIMENSION) -> None:
+        self.size = size
+
+    def _embed(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        vector = np.random.default_rng(seed).standard_normal(self.size)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+class CohereBatchEmbeddings(Embeddings):
+    """Sends whole batches to a Bedrock Cohere model, which langchain's client embeds one text per request.
+
+    Request and response handling otherwise match BedrockEmbeddings, so
+    vectors are identical to those of the wrapped client.
+    """
+
+    batches_queries = True
+
+    def __init__(self, embeddings: Embeddings) -> None:
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), COHERE_MAX_BATCH):
+            body = {"input_type": "search_document", **(self.embeddings.model_kwargs or {})}
+            body["texts"] = [text.replace(os.linesep, " ") for text in texts[start:start + COHERE_MAX_BATCH]]
+            response = self.embeddings.client.invoke_model(body=json.dumps(body), modelId=self.embeddings.model_id, accept="application/json", contentType="application/json")
+            vectors.extend(json.loads(response["body"].read())["embeddings"])
+        if self.embeddings.normalize:
+            vectors = [self.embeddings._normalize_vector(vector) for vector in vectors]
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+def create_bedrock_embeddings(model_id: str, region: str) -> Embeddings:
+    from langchain_community.embeddings import BedrockEmbeddings
+    embeddings = BedrockEmbeddings(model_id=model_id, region_name=region)
+    if model_id.startswith("cohere."):
+        return CohereBatchEmbeddings(embeddings)
+    return embeddings
+
+def create_local_embeddings(model_id: str, region: str) -> Embeddings:
+    return LocalEmbeddings(model_id)
+
+def create_fake_embeddings(model_id: str, region: str) -> Embeddings:
+    return DeterministicFakeEmbeddings(int(model_id) if model_id else FAKE_EMBED_DIMENSION)
+
+# embeddingModel values look like "<provider>:<model id>"; plain Bedrock model ids need no prefix
+EMBEDDING_PROVIDERS: Dict[str, Callable[[str, str], Embeddings]] = {
+    "bedrock": create_bedrock_embeddings,
+    "local": create_local_embeddings,
+    "fake": create_fake_embeddings,
+}
+
+def register_provider(name: str, factory: Callable[[str, str], Embeddings]) -> None:
+    EMBEDDING_PROVIDERS[name] = factory
+
+def resolve_provider(embedding_model: str) -> Tuple[str, str]:
+    prefix, _, model_id = embedding_model.partition(':')
+    if prefix in EMBEDDING_PROVIDERS:
+        return prefix, model_id
+    return "bedrock", embedding_model
+
+def create_embeddings(embedding_model: str, region: str) -> Embeddings:
+    provider, model_id = resolve_provider(embedding_model)
+    logger.info(f"Creating {provider} embeddings for model: {model_id or embedding_model}")
+    return EMBEDDING_PROVIDERS[provider](model_id, region)
+
+def embedding_dimension(embedding_model: str, embeddings: Optional[Embeddings] = None) -> int:
+    provider, model_id = resolve_provider(embedding_model)
+    if embedding_model in KNOWN_DIMENSIONS:
+        return KNOWN_DIMENSIONS[embedding_model]
+    if provider == "fake":
+        return int(model_id) if model_id else FAKE_EMBED_DIMENSION
+    with _dimension_lock:
+        if embedding_model not in _dimensions:
+            if embeddings is None:
+                raise ValueError(f"Unknown dimension for embedding model: {embedding_model}")
+            _dimensions[embedding_model] = len(embeddings.embed_query("dimension probe"))
+        return _dimensions[embedding_model]
+
+def get_index_name(embedding_model: str, vector_db_option: Optional[str] = None) -> str:
+    suffix = re.sub(r'[^a-z0-9]', '', embedding_model.lower())
+    # Long local model paths would overflow Chroma's 63 character collection names
+    if len(suffix) > MAX_INDEX_SUFFIX:
+        suffix = suffix[:MAX_INDEX_SUFFIX - 8] + hashlib.sha256(embedding_model.encode('utf-8')).hexdigest()[:8]
+    # Server-side embedded indexes carry an ingest pipeline, so they can't share the client-side index
+    if vector_db_option == NEURAL_VECTOR_STORE:
+        return f'docs-{suffix}-neural'
+    return f'docs-{suffix}'
+
+def generation_index_name(index_name: str, generation: Optional[int] = None) -> str:
+    return f"{index_name}-g{generation or int(time.time() * 1000)}"
+
+def base_index_name(index_name: str) -> str:
+    """The index name a generation serves under; any other name is returned unchanged."""
+    match = GENERATION_PATTERN.match(index_name)
+    return match.group('index') if match else index_name
@@ -0,0 +1,132 @@
+import logging
+import random
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from libs.cache import TTLCache
+from libs.metrics import span
+
+logger = logging.getLogger(__name__)
+
+THROTTLING_MARKERS = ("ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException", "Too many requests", "Rate exceeded")
+
+def normalize_query(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).split()).casefold()
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that memoizes query vectors.
+
+    Keys are (model_id, region, normalized text) so the same cache can be
+    shared by every model and region the backend serves. Document embedding
+    is passed straight through; only the query path repeats.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_id: str, region: str, cache: TTLCache) -> None:
+        self.embeddings = embeddings
+        self.model_id = model_id
+        self.region = region
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = (self.model_id, self.region, normalize_query(text))
+        vector = self.cache.get(key)
+        if vector is None:
+            with span("embed_query", model=self.model_id):
+                vector = self.embeddings.embed_query(text)
+            self.cache.set(key, vector)
+        return vector
+
+    @property
+    def batches_queries(self) -> bool:
+        # Providers that embed a list in one request set this; langchain's Titan client loops one text per call
+        return getattr(self.embeddings, "batches_queries", False)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries, sending every cache miss to the model in one batched call.
+
+        Every provider the backend creates embeds queries and documents the
+        same way, so the document batch call yields the same vectors. Without
+        a batch call the misses are embedded one by one, so callers that can
+        embed in parallel should check `batches_queries` first.
+        """
+        keys = [(self.model_id, self.region, normalize_query(text)) for text in texts]
+        vectors = {key: self.cache.get(key) for key in keys}
+        missing = {key: text for key, text in zip(keys, texts) if vectors[key] is None}
+        if missing:
+            with span("embed_query", model=self.model_id, texts=len(missing)):
+                if self.batches_queries:
+                    embedded = self.embeddings.embed_documents(list(missing.values()))
+                else:
+                    embedded = [self.embeddings.embed_query(text) for text in missing.values()]
+            for key, vector in zip(missing, embedded):
+                self.cache.set(key, vector)
+                vectors[key] = vector
+        return [vectors[key] for key in keys]
+
+def is_throttling_error(error: BaseException) -> bool:
+    # BedrockEmbeddings re-raises botocore errors as ValueError, so walk the chain and match on text
+    while error is not None:
+        response = getattr(error, "response", None)
+        code = response.get("Error", {}).get("Code", "") if isinstance(response, dict) else ""
+        if code in THROTTLING_MARKERS or any(marker in str(error) for marker in THROTTLING_MARKERS):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+class ConcurrentEmbeddings(Embeddings):
+    """Embeddings wrapper that embeds documents in batches on a bounded thread pool.
+
+    `embed_documents` splits the input into `batch_size` slices and runs at
+    most `max_concurrency` of them at once, so the number of in-flight
+    Bedrock calls stays bounded. Throttled batches are retried with jittered
+    exponential backoff. Output order always matches input order.
+    """
+
+    def __init__(self, embeddings: Embeddings, batch_size: int = 16, max_concurrency: int = 4, max_retries: int = 6, base_delay: float = 0.5, max_delay: float = 20.0) -> None:
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttled = 0
+        self.embedded = 0
+        self._counter_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embed-worker")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        vectors = []
+        for batch_vectors in self._executor.map(self._embed_batch, batches):
+            vectors.extend(batch_vectors)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                with span("embed", texts=len(batch)):
+                    vectors = self.embeddings.embed_documents(batch)
+                with self._counter_lock:
+                    self.embedded += len(vectors)
+                return vectors
+            except Exception as e:
+                if attempt == self.max_retries or not is_throttling_error(e):
+                    raise
+                self.throttled += 1
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt)) * random.uniform(0.5, 1.5)
+                logger.warning(f"Embedding batch throttled (attempt {attempt + 1}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
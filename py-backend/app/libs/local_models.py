@@ -0,0 +1,83 @@
+import logging
+import os
+import threading
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ONNX_FILE = 'onnx/model.onnx'
+
+# ONNX sessions are loaded once per process and shared by every request
+_model_lock = threading.Lock()
+_models = {}
+
+class OnnxModel:
+    """Tokenizer plus onnxruntime CPU session for a Hugging Face style ONNX export.
+
+    `model_path` is a local directory or a Hugging Face repo id; either must
+    contain `tokenizer.json` and the ONNX file, so no torch is required.
+    """
+
+    def __init__(self, model_path: str, onnx_file: str = DEFAULT_ONNX_FILE, max_length: int = 512, threads: int = 0) -> None:
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        if not os.path.isdir(model_path):
+            from huggingface_hub import snapshot_download
+            model_path = snapshot_download(model_path, allow_patterns=[onnx_file, 'tokenizer.json'])
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(os.path.join(model_path, onnx_file), options, providers=['CPUExecutionProvider'])
+        self.input_names = {item.name for item in self.session.get_inputs()}
+
+    def run(self, inputs) -> Tuple[np.ndarray, np.ndarray]:
+        encodings = self.tokenizer.encode_batch(list(inputs))
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        output = self.session.run(None, {name: value for name, value in feeds.items() if name in self.input_names})[0]
+        return output, feeds["attention_mask"]
+
+class OnnxCrossEncoder(OnnxModel):
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 16) -> List[float]:
+        scores = []
+        for start in range(0, len(pairs), batch_size):
+            logits, _ = self.run(pairs[start:start + batch_size])
+            # Single-logit heads score relevance directly; two-class heads use the "relevant" column
+            scores.extend(logits[:, -1].tolist())
+        return scores
+
+class OnnxSentenceEncoder(OnnxModel):
+    def encode(self, texts: Sequence[str], batch_size: int = 32) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            hidden, mask = self.run(texts[start:start + batch_size])
+            if hidden.ndim == 3:
+                # Mean-pool token states over the attention mask, as sentence-transformers does
+                weights = mask[..., None].astype(hidden.dtype)
+                hidden = (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+            hidden = hidden / np.maximum(np.linalg.norm(hidden, axis=1, keepdims=True), 1e-12)
+            vectors.extend(hidden.tolist())
+        return vectors
+
+def load_model(model_class, model_path: str, **kwargs):
+    key = (model_class.__name__, model_path)
+    model = _models.get(key)
+    if model is None:
+        with _model_lock:
+            model = _models.get(key)
+            if model is None:
+                logger.info(f"Loading local {model_class.__name__} model: {model_path}")
+                model = model_class(model_path, **kwargs)
+                _models[key] = model
+    return model
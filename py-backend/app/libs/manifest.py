@@ -0,0 +1,105 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Iterable, Optional, Set
+
+# Absolute, and handed to job subprocesses, so the backend and every job read the same manifests
+MANIFEST_DIR = os.path.abspath(os.environ.get('MANIFEST_DIR', './vectordb/manifests'))
+CHECKSUM_SUFFIX = '.sha256'
+CHECKSUM_READ_SIZE = 1024 * 1024
+
+def write_checksum(file_path: str, digest: str) -> None:
+    with open(f"{file_path}{CHECKSUM_SUFFIX}", 'w', encoding='utf-8') as f:
+        f.write(digest)
+
+def read_checksum(file_path: str) -> Optional[str]:
+    # Uploads leave a `<file>.sha256` sidecar so ingestion never has to re-hash the file
+    checksum_path = f"{file_path}{CHECKSUM_SUFFIX}"
+    if not os.path.exists(checksum_path):
+        return None
+    with open(checksum_path, 'r', encoding='utf-8') as f:
+        return f.read().strip() or None
+
+def file_checksum(file_path: str) -> str:
+    checksum = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(CHECKSUM_READ_SIZE):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+@contextmanager
+def locked(path: str):
+    # Serializes writers of one manifest across job processes
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.lock", 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+class IngestManifest:
+    """Per-index record of which chunk ids each source document produced.
+
+    Chunk ids are content hashes, so comparing a fresh ingest against the
+    manifest tells us which chunks are already indexed and which ones
+    disappeared from the document and should be deleted. Jobs on the same
+    index can run side by side, so `save` only writes back the sources this
+    instance changed, merged into whatever is on disk at that moment.
+    """
+
+    def __init__(self, vector_db_option: str, index_name: str, manifest_dir: str = MANIFEST_DIR) -> None:
+        self.path = os.path.join(manifest_dir, vector_db_option.lower(), f"{index_name}.json")
+        self.sources = self._load()
+        self.changed = set()
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('sources', {})
+
+    def chunk_ids(self, source: str) -> Set[str]:
+        return set(self.sources.get(source, {}).get('chunk_ids', []))
+
+    def checksum(self, source: str) -> Optional[str]:
+        return self.sources.get(source, {}).get('sha256')
+
+    def set_checksum(self, source: str, checksum: str) -> None:
+        self.sources.setdefault(source, {"chunk_ids": []})['sha256'] = checksum
+        self.changed.add(source)
+
+    def record(self, source: str, chunk_ids: Iterable[str]) -> None:
+        self.sources[source] = {"chunk_ids": sorted(chunk_ids), "updated_at": int(time.time())}
+        self.changed.add(source)
+
+    def save(self) -> None:
+        with locked(self.path):
+            sources = self._load()
+            sources.update({source: self.sources[source] for source in self.changed if source in self.sources})
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"sources": sources}, f)
+            os.replace(tmp_path, self.path)
+        self.sources = sources
+        self.changed = set()
+
+    @staticmethod
+    def delete(vector_db_option: str, index_name: str, manifest_dir: str = MANIFEST_DIR) -> None:
+        path = os.path.join(manifest_dir, vector_db_option.lower(), f"{index_name}.json")
+        with locked(path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def copy(vector_db_option: str, source_index: str, index_name: str, manifest_dir: str = MANIFEST_DIR) -> None:
+        # An index swapped to an empty generation gets no manifest, so the next ingest starts from scratch
+        source = os.path.join(manifest_dir, vector_db_option.lower(), f"{source_index}.json")
+        if not os.path.exists(source):
+            IngestManifest.delete(vector_db_option, index_name, manifest_dir)
+            return
+        path = os.path.join(manifest_dir, vector_db_option.lower(), f"{index_name}.json")
+        with locked(path):
+            shutil.copyfile(source, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
@@ -0,0 +1,128 @@
+import contextlib
+import contextvars
+import cProfile
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# Per-request profiling is off unless the operator opts in; the header alone is not enough
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILE_HEADER = 'x-profile'
+PROFILE_DIR = os.environ.get('PROFILE_DIR', './profiles')
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram('rag_stage_duration_seconds', 'Time spent in one retrieval or ingestion stage', ['stage'], buckets=LATENCY_BUCKETS)
+REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'HTTP request latency', ['method', 'route', 'status'], buckets=LATENCY_BUCKETS)
+SEARCHES = Counter('rag_searches_total', 'Searches served', ['vector_store', 'search_mode', 'reranker', 'cached'])
+INGESTED_CHUNKS = Counter('rag_ingested_chunks_total', 'Chunks handled by finished ingestion attempts', ['outcome'])
+
+# Spans of the current request, collected for its Server-Timing header
+current_trace: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar('current_trace', default=None)
+# Set by a request that asked for a profile; the worker thread fills in where it was written
+current_profile: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar('current_profile', default=None)
+
+_span_lock = threading.Lock()
+# The ingestion subprocess has no /metrics of its own, so it buffers spans for the job runner
+_forwarded_spans: Optional[List[Tuple[str, float]]] = None
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.append((stage, seconds))
+    if _forwarded_spans is not None:
+        with _span_lock:
+            _forwarded_spans.append((stage, seconds))
+
+@contextlib.contextmanager
+def span(stage: str, **attributes: Any) -> Iterator[None]:
+    """Time a block as one stage; nested spans are each recorded in full."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        observe_stage(stage, seconds)
+        if logger.isEnabledFor(logging.DEBUG):
+            details = "".join(f" {key}={value}" for key, value in attributes.items())
+            logger.debug(f"span stage={stage} ms={seconds * 1000:.2f}{details}")
+
+def forward_spans() -> None:
+    global _forwarded_spans
+    _forwarded_spans = []
+
+def drain_forwarded_spans() -> List[Tuple[str, float]]:
+    global _forwarded_spans
+    if _forwarded_spans is None:
+        return []
+    with _span_lock:
+        spans, _forwarded_spans = _forwarded_spans, []
+    return spans
+
+def server_timing(trace: List[Tuple[str, float]]) -> str:
+    totals: Dict[str, float] = {}
+    for stage, seconds in trace:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in totals.items())
+
+def call_profiled(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run `func`, under cProfile if the current request asked for a profile.
+
+    Called on the worker thread, since cProfile only sees the thread it was
+    enabled on.
+    """
+    profile = current_profile.get()
+    if profile is None:
+        return func(*args, **kwargs)
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{profile['name']}-{uuid.uuid4().hex[:8]}.prof")
+        profiler.dump_stats(path)
+        profile['path'] = path
+        logger.info(f"Wrote profile: {path}")
+
+class StatsCollector:
+    """Exposes the numeric leaves of a /stats style dict as gauges at scrape time.
+
+    `stats_fn` returns {"limiters": {name: {...}}, "caches": {name: {...}}};
+    nested keys are joined into the metric name, e.g.
+    backend_cache_memory_hits{cache="parents"}.
+    """
+
+    def __init__(self, stats_fn: Callable[[], Dict[str, Dict[str, Any]]] = dict) -> None:
+        self.stats_fn = stats_fn
+
+    def collect(self):
+        families: Dict[str, GaugeMetricFamily] = {}
+        for group, entries in self.stats_fn().items():
+            label = group.rstrip('s')
+            for name, values in entries.items():
+                for key, value in flatten_numbers(values):
+                    metric = f"backend_{label}_{key}"
+                    if metric not in families:
+                        families[metric] = GaugeMetricFamily(metric, f"{key} from /stats {group}", labels=[label])
+                    families[metric].add_metric([name], value)
+        return list(families.values())
+
+def flatten_numbers(values: Dict[str, Any], prefix: str = ""):
+    for key, value in values.items():
+        if isinstance(value, dict):
+            yield from flatten_numbers(value, f"{prefix}{key}_")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+# Registered once per process; the app points it at its /stats, so re-importing the app can't register twice
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
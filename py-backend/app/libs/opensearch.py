@@ -1,53 +1,423 @@
-from opensearchpy import OpenSearch, RequestsHttpConnection
-from langchain_community.vectorstores import OpenSearchVectorSearch
+from langchain_core.documents import Document
+from libs.ranking import mmr_select
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import copy
+import logging
 import os
+import threading
 import yaml
 
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH = os.environ.get('OPENSEARCH_CONFIG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), "opensearch.yml"))
+DEFAULT_POOL_MAXSIZE = 32
+# Vector store option whose embeddings are computed inside OpenSearch by an ML connector
+NEURAL_VECTOR_STORE = "OpenSearchNeural"
+OPENSEARCH_STORES = ("OpenSearch", NEURAL_VECTOR_STORE)
+DEFAULT_TIMEOUT = 30
+# Bulk ingest defaults; override in an `opensearch-bulk` section of opensearch.yml or with OPENSEARCH_BULK_* env vars
+DEFAULT_BULK_CONFIG = {
+    "chunk_docs": 500,
+    "chunk_bytes": 10 * 1024 * 1024,
+    "workers": 4,
+    "disable_refresh": True,
+    "force_merge_segments": 0,
+    "force_merge_timeout": 3600,
+}
+# Vector encoding for newly created indexes: "none" (float32), "fp16", "int8" or "pq".
+# "pq" needs a model trained with the k-NN _train API; existing indexes keep their mapping.
+VECTOR_QUANTIZATIONS = ("none", "fp16", "int8", "pq")
+VECTOR_QUANTIZATION = os.environ.get('OPENSEARCH_VECTOR_QUANTIZATION', 'none')
+PQ_MODEL_ID = os.environ.get('OPENSEARCH_PQ_MODEL_ID', '')
+HYBRID_SEARCH_PIPELINE = os.environ.get('OPENSEARCH_HYBRID_PIPELINE', 'hybrid-rrf')
+# Reciprocal rank fusion of the BM25 and k-NN sub-queries (needs OpenSearch 2.19+);
+# override with a `hybrid-search-pipeline` section in opensearch.yml, e.g. a normalization-processor
+DEFAULT_HYBRID_PIPELINE = {
+    "description": "Fuse BM25 and k-NN rankings with reciprocal rank fusion",
+    "phase_results_processors": [
+        {"score-ranker-processor": {"combination": {"technique": "rrf", "rank_constant": 60}}}
+    ],
+}
+
+# Process-wide registry: the config is parsed once, each endpoint gets one pooled
+# client, and index existence is remembered so it is checked once per index
+_registry_lock = threading.Lock()
+_index_lock = threading.Lock()
+_config = None
+_connections = {}
+_known_indexes = set()
+_known_pipelines = set()
+
+def load_config():
+    global _config
+    if _config is None:
+        with _registry_lock:
+            if _config is None:
+                with open(CONFIG_PATH, 'r', encoding='utf-8') as file:
+                    _config = yaml.safe_load(file)
+    return _config
+
+def get_connection(endpoint, auth, pool_config=None):
+    connection = _connections.get(endpoint)
+    if connection is None:
+        with _registry_lock:
+            connection = _connections.get(endpoint)
+            if connection is None:
+                # Imported on first use so processes that never talk to OpenSearch don't pay for the client
+                from opensearchpy import OpenSearch, RequestsHttpConnection
+                pool_config = pool_config or {}
+                url = urlparse(endpoint if "://" in endpoint else f"https://{endpoint}")
+                use_ssl = url.scheme == "https"
+                connection = OpenSearch(
+                    hosts=[{'host': url.hostname, 'port': url.port or (443 if use_ssl else 80)}],
+                    http_auth=auth,
+                    use_ssl=use_ssl,
+                    verify_certs=use_ssl,
+                    connection_class=RequestsHttpConnection,
+                    pool_maxsize=int(os.environ.get('OPENSEARCH_POOL_MAXSIZE', pool_config.get('pool_maxsize', DEFAULT_POOL_MAXSIZE))),
+                    timeout=int(pool_config.get('timeout', DEFAULT_TIMEOUT)),
+                )
+                _connections[endpoint] = connection
+    return connection
+
+def get_bulk_config(config=None):
+    bulk_config = {**DEFAULT_BULK_CONFIG, **((config or {}).get('opensearch-bulk') or {})}
+    for key, default in DEFAULT_BULK_CONFIG.items():
+        value = os.environ.get(f'OPENSEARCH_BULK_{key.upper()}')
+        if value is not None:
+            bulk_config[key] = value.lower() in ('1', 'true', 'yes') if isinstance(default, bool) else int(value)
+    return bulk_config
+
+def reset_registry():
+    global _config
+    with _registry_lock:
+        _config = None
+        _connections.clear()
+        _known_indexes.clear()
+        _known_pipelines.clear()
+
+def ensure_search_pipeline(conn, name=HYBRID_SEARCH_PIPELINE):
+    key = (id(conn), name)
+    if key in _known_pipelines:
+        return
+    with _index_lock:
+        if key in _known_pipelines:
+            return
+        body = load_config().get('hybrid-search-pipeline') or DEFAULT_HYBRID_PIPELINE
+        conn.transport.perform_request("PUT", f"/_search/pipeline/{name}", body=body)
+        _known_pipelines.add(key)
+
+def quantize_vector_field(vector_field, quantization, pq_model_id=None):
+    if quantization not in VECTOR_QUANTIZATIONS:
+        raise ValueError(f"Unsupported vector quantization: {quantization}")
+    if quantization == "none":
+        return vector_field
+    if quantization == "pq":
+        if not pq_model_id:
+            raise ValueError("PQ quantization needs OPENSEARCH_PQ_MODEL_ID, a model trained with the k-NN _train API")
+        # Dimension, engine and encoder all come from the trained model
+        return {"type": "knn_vector", "model_id": pq_model_id}
+    method = copy.deepcopy(vector_field.get('method', {}))
+    parameters = method.setdefault('parameters', {})
+    if quantization == "fp16":
+        method['engine'] = 'faiss'
+        parameters['encoder'] = {"name": "sq", "parameters": {"type": "fp16"}}
+    else:
+        # Lucene quantizes float input to int8 itself (OpenSearch 2.16+); faiss would need byte vectors from us
+        method['engine'] = 'lucene'
+        parameters['encoder'] = {"name": "sq"}
+    return {**vector_field, "method": method}
+
+def is_opensearch(vector_db_option):
+    return vector_db_option in OPENSEARCH_STORES
+
+def first_index(response):
+    # Per-index responses are keyed by the concrete index, which differs from the name asked for when it is an alias
+    return next(iter(response.values()), {}) if response else {}
+
 class OpenSearchClient:
-    def __init__(self, index_name) -> None:
-        self.config = self.init_config()
+    def __init__(self, index_name, dimension=None, create=True) -> None:
+        self.init_config()
         self.conn = self.connect_opensearch()
-        
+
         self.index_name = index_name
-        self.create_index()
+        self.dimension = dimension
+        self.ingest_pipeline = None
+        if create:
+            self.create_index()
 
     def init_config(self):
-        file_dir = os.path.dirname(os.path.abspath(__file__))
-        config_path = os.path.join(file_dir, "opensearch.yml")
-        with open(config_path, 'r', encoding='utf-8') as file:
-            config = yaml.safe_load(file)
-        
+        config = load_config()
+
         self.config = config
         self.auth = (config['opensearch-auth']['user_id'], config['opensearch-auth']['user_password'])
         self.endpoint = config['opensearch-auth']['domain_endpoint']
         self.mapping = {"settings": config['settings'], "mappings": config['mappings-rag']}
 
     def connect_opensearch(self):
-        connection = OpenSearch(
-            hosts=[{'host': self.endpoint.replace("https://", ""), 'port': 443}],
-            http_auth=self.auth, 
-            use_ssl=True,
-            verify_certs=True,
-            connection_class=RequestsHttpConnection
-        ) 
-        return connection
-    
+        return get_connection(self.endpoint, self.auth, self.config.get('opensearch-pool'))
+
     def is_index_present(self):
-        return self.conn.indices.exists(self.index_name)
-    
+        return self.conn.indices.exists(index=self.index_name)
+
     def create_index(self):
-        if not self.is_index_present():
-            self.conn.indices.create(self.index_name, body=self.mapping)
+        key = (self.endpoint, self.index_name)
+        if key in _known_indexes:
+            return
+        with _index_lock:
+            if key in _known_indexes:
+                return
+            if not self.is_index_present():
+                self.conn.indices.create(index=self.index_name, body=self.index_mapping())
+            else:
+                self.check_dimension()
+                if self.ingest_pipeline:
+                    # e.g. a generation created ahead of its first ingest
+                    self.conn.indices.put_settings(index=self.index_name, body={"index": {"default_pipeline": self.ingest_pipeline}})
+            _known_indexes.add(key)
+
+    def index_mapping(self):
+        # The vector size follows the embedding model instead of the value hard-coded in opensearch.yml
+        mapping = copy.deepcopy(self.mapping)
+        vector_field = mapping['mappings'].get('properties', {}).get('vector_field')
+        if self.dimension and vector_field is not None:
+            vector_field['dimension'] = self.dimension
+        if vector_field is not None:
+            mapping['mappings']['properties']['vector_field'] = quantize_vector_field(vector_field, VECTOR_QUANTIZATION, PQ_MODEL_ID)
+        if self.ingest_pipeline:
+            mapping['settings'] = {**mapping['settings'], "index.default_pipeline": self.ingest_pipeline}
+        return mapping
+
+    def check_dimension(self):
+        if not self.dimension:
+            return
+        mapping = first_index(self.conn.indices.get_mapping(index=self.index_name))
+        existing = mapping.get('mappings', {}).get('properties', {}).get('vector_field', {}).get('dimension')
+        if existing and existing != self.dimension:
+            raise ValueError(f"Index {self.index_name} stores {existing}-dimensional vectors but the embedding model produces {self.dimension}; initialize the index first")
 
     def delete_index(self):
-        if self.is_index_present():
-            self.conn.indices.delete(self.index_name)
+        """Delete the index, or for an alias the indexes behind it, and return their names."""
+        with _index_lock:
+            _known_indexes.discard((self.endpoint, self.index_name))
+            names = self.get_alias_indexes() or ([self.index_name] if self.is_index_present() else [])
+            for name in names:
+                self.conn.indices.delete(index=name)
+        return names
+
+    def get_alias_indexes(self):
+        """Indexes this name points at when it is an alias; empty for a concrete or missing index."""
+        if not self.conn.indices.exists_alias(name=self.index_name):
+            return []
+        return sorted(self.conn.indices.get_alias(name=self.index_name))
+
+    def get_generations(self):
+        """{"<name>-g<n>" index: whether this name currently points at it}, oldest first."""
+        indexes = self.conn.indices.get_alias(index=f"{self.index_name}-g*")
+        return {name: self.index_name in (info.get('aliases') or {}) for name, info in sorted(indexes.items())}
+
+    def swap_alias(self, target):
+        """Atomically point this name at `target` and return the indexes it pointed at before.
+
+        One `_aliases` request removes the old targets and adds the new one, so
+        searches move from one generation to the next without a gap. A concrete
+        index still holding the name (created before blue/green) is dropped in
+        the same request, since an alias can't share a name with an index.
+        """
+        if not self.conn.indices.exists(index=target):
+            raise ValueError(f"Index {target} does not exist")
+        previous = self.get_alias_indexes()
+        actions = [{"remove": {"index": name, "alias": self.index_name}} for name in previous if name != target]
+        actions.append({"add": {"index": target, "alias": self.index_name}})
+        replaced = []
+        if not previous and self.is_index_present():
+            actions.append({"remove_index": {"index": self.index_name}})
+            replaced = [self.index_name]
+        with _index_lock:
+            self.conn.indices.update_aliases(body={"actions": actions})
+            _known_indexes.discard((self.endpoint, self.index_name))
+        return [name for name in previous if name != target] + replaced
 
     def get_vector_store(self, embed_model):
+        from langchain_community.vectorstores import OpenSearchVectorSearch
         vector_store = OpenSearchVectorSearch(
             index_name=self.index_name,
             opensearch_url=self.endpoint,
             embedding_function=embed_model,
             http_auth=self.auth,
         )
+        # Route the vector store through the shared pooled client instead of its own connection
+        vector_store.client = self.conn
         return vector_store
+
+    @property
+    def ingest_pipeline_name(self):
+        return f"{self.index_name}-embedding"
+
+    def create_ingest_pipeline(self, model_id, children_only=False):
+        # Documents indexed without a vector get one from the remote model on the way in
+        processor = {"model_id": model_id, "field_map": {"text": "vector_field"}}
+        if children_only:
+            # Compact indexes only search child chunks, so parents are stored as plain documents
+            processor["if"] = "ctx.metadata?.doc_level == 'child'"
+        body = {
+            "description": f"Embed text for {self.index_name} with model {model_id}",
+            "processors": [{"text_embedding": processor}],
+        }
+        self.conn.transport.perform_request("PUT", f"/_ingest/pipeline/{self.ingest_pipeline_name}", body=body)
+        self.ingest_pipeline = self.ingest_pipeline_name
+
+    def get_ingest_model_id(self):
+        # Behind an alias the pipeline is named after the generation the alias points at
+        settings = self.conn.indices.get_settings(index=self.index_name, name='index.default_pipeline')
+        pipeline_name = first_index(settings).get('settings', {}).get('index', {}).get('default_pipeline') or self.ingest_pipeline_name
+        pipelines = self.conn.transport.perform_request("GET", f"/_ingest/pipeline/{pipeline_name}")
+        for processor in pipelines.get(pipeline_name, {}).get('processors', []):
+            if 'text_embedding' in processor:
+                return processor['text_embedding']['model_id']
+        raise ValueError(f"Index {self.index_name} has no embedding pipeline; ingest documents with server-side embedding first")
+
+    def get_neural_store(self):
+        return NeuralVectorStore(self.conn, self.index_name, self.get_ingest_model_id())
+
+    def get_bulk_writer(self, embed_model):
+        return BulkWriter(self.conn, self.index_name, embed_model, get_bulk_config(self.config))
+
+    def get_refresh_interval(self):
+        settings = self.conn.indices.get_settings(index=self.index_name, name='index.refresh_interval')
+        return first_index(settings).get('settings', {}).get('index', {}).get('refresh_interval')
+
+    def set_refresh_interval(self, interval):
+        self.conn.indices.put_settings(index=self.index_name, body={"index": {"refresh_interval": interval}})
+
+    @contextmanager
+    def bulk_ingest(self):
+        """Turn off periodic refresh while a large ingest runs, then restore it.
+
+        Searches keep seeing the last refreshed state instead of paying for a
+        segment refresh every second mid-ingest. A leftover "-1" (from an
+        ingest that died, or one still running) is restored to the index
+        default rather than kept.
+        """
+        bulk_config = get_bulk_config(self.config)
+        previous = None
+        if bulk_config['disable_refresh']:
+            previous = self.get_refresh_interval()
+            if previous == "-1":
+                previous = None
+            self.set_refresh_interval("-1")
+        try:
+            yield
+        finally:
+            if bulk_config['disable_refresh']:
+                self.set_refresh_interval(previous)
+            self.conn.indices.refresh(index=self.index_name)
+        if bulk_config['force_merge_segments']:
+            logger.info(f"Force-merging {self.index_name} to {bulk_config['force_merge_segments']} segments")
+            self.conn.indices.forcemerge(index=self.index_name, max_num_segments=bulk_config['force_merge_segments'], request_timeout=bulk_config['force_merge_timeout'])
+
+class BulkWriter:
+    """Write-side stand-in for OpenSearchVectorSearch used by ingestion.
+
+    `add_documents` embeds immediately but buffers the index actions, which
+    go out through parallel_bulk once enough have piled up to keep every
+    worker busy. Unlike the LangChain path, no bulk call is followed by a
+    refresh; `bulk_ingest()` refreshes once at the end.
+    """
+
+    def __init__(self, conn, index_name, embed_model, bulk_config=None):
+        self.conn = conn
+        self.index_name = index_name
+        self.embed_model = embed_model
+        self.bulk_config = bulk_config or get_bulk_config()
+        self.pending = []
+        self.indexed = 0
+        self.deleted = 0
+
+    def add_documents(self, documents, ids, embed=True):
+        # Without an embedding model only text is sent and the index's ingest pipeline embeds it;
+        # with embed=False the documents are stored without a vector at all
+        vectors = self.embed_model.embed_documents([doc.page_content for doc in documents]) if self.embed_model and embed else [None] * len(documents)
+        for _id, doc, vector in zip(ids, documents, vectors):
+            action = {
+                "_op_type": "index",
+                "_index": self.index_name,
+                "_id": _id,
+                "text": doc.page_content,
+                "metadata": doc.metadata,
+            }
+            if vector is not None:
+                action["vector_field"] = vector
+            self.pending.append(action)
+        if len(self.pending) >= self.bulk_config['chunk_docs'] * self.bulk_config['workers']:
+            self.flush()
+        return ids
+
+    def delete(self, ids):
+        self.flush()
+        self._bulk([{"_op_type": "delete", "_index": self.index_name, "_id": _id} for _id in ids], ignore_status=(404,))
+        self.deleted += len(ids)
+
+    def flush(self):
+        if self.pending:
+            actions, self.pending = self.pending, []
+            self._bulk(actions)
+            self.indexed += len(actions)
+
+    def _bulk(self, actions, ignore_status=()):
+        from opensearchpy import helpers
+        # parallel_bulk is lazy and raises BulkIndexError on the first failed item
+        for _ in helpers.parallel_bulk(
+            self.conn, actions,
+            thread_count=self.bulk_config['workers'],
+            chunk_size=self.bulk_config['chunk_docs'],
+            max_chunk_bytes=self.bulk_config['chunk_bytes'],
+            ignore_status=ignore_status,
+        ):
+            pass
+
+class NeuralVectorStore:
+    """Search-side view of an index whose vectors come from an OpenSearch ingest pipeline.
+
+    Queries are sent as `neural` queries carrying only the text, so the
+    backend never calls the embedding model itself. Exposes the subset of
+    OpenSearchVectorSearch that search.py uses, including `.client`.
+    """
+
+    def __init__(self, conn, index_name, model_id):
+        self.client = conn
+        self.index_name = index_name
+        self.model_id = model_id
+
+    def neural_query(self, text, k, filter=None, ef_search=None):
+        query = {"query_text": text, "model_id": self.model_id, "k": k}
+        if filter:
+            query["filter"] = filter
+        if ef_search:
+            query["method_parameters"] = {"ef_search": ef_search}
+        return {"neural": {"vector_field": query}}
+
+    def _search(self, text, k, filter, include_vectors=False, ef_search=None):
+        body = {
+            "size": k,
+            "_source": {"excludes": [] if include_vectors else ["vector_field"]},
+            "query": self.neural_query(text, k, filter, ef_search),
+        }
+        return self.client.search(index=self.index_name, body=body)['hits']['hits']
+
+    @staticmethod
+    def to_document(hit):
+        return Document(page_content=hit['_source']['text'], metadata=hit['_source'].get('metadata', {}), id=hit['_id'])
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [self.to_document(hit) for hit in self._search(query, k, filter)]
+
+    def max_marginal_relevance_search(self, query, k=4, fetch_k=20, lambda_mult=0.5, filter=None, ef_search=None, **kwargs):
+        hits = self._search(query, fetch_k, filter, include_vectors=True, ef_search=ef_search)
+        if not hits:
+            return []
+        # No query vector on this side, so the neural ranking itself is the relevance signal
+        relevance = [1 - rank / len(hits) for rank in range(len(hits))]
+        selected = mmr_select(None, [hit['_source']['vector_field'] for hit in hits], k, lambda_mult, relevance=relevance)
+        return [self.to_document(hits[i]) for i in selected]
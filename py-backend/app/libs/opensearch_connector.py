@@ -1,10 +1,20 @@
 import json
+import os
 import requests
 import boto3
 from requests_aws4auth import AWS4Auth
 import time
 import re
 
+from libs.manifest import locked
+
+# Connector/model ids per (endpoint, embedding model, region), so setup registers each model once
+NEURAL_MODELS_PATH = os.path.abspath(os.environ.get('NEURAL_MODELS_PATH', './vectordb/neural_models.json'))
+MODEL_TASK_TIMEOUT = 60
+
+def ml_url(host, path):
+    return f"{host.rstrip('/')}/{path}"
+
 def create_aws_auth(region):
     service = 'es'
     session = boto3.Session()
@@ -55,10 +65,10 @@ def titan_text_pre_process_function():
       first = first.replace("\\\"", "\\\\\\\"");
     }
     if (first.contains("\\\\t")) {
-      first is first.replace("\\\\t", "\\\\\\\\\\\\t");
+      first = first.replace("\\\\t", "\\\\\\\\\\\\t");
     }
-    if (first contains('\n')) {
-      first is first.replace('\n', '\\\\n');
+    if (first.contains('\n')) {
+      first = first.replace('\n', '\\\\n');
     }
     builder.append(first);
     builder.append("\\\"");
@@ -113,7 +123,7 @@ def register_model(connector_id, host, awsauth, model_name):
     return register_model_with_group(connector_id, host, awsauth, model_group_id, model_name)
 
 def register_model_group(connector_id, host, awsauth, model_name):
-    url = host + '_plugins/_ml/model_groups/_register'
+    url = ml_url(host, '_plugins/_ml/model_groups/_register')
     payload = {"name": f"{model_name}", "description": f"Bedrock Model for connector {connector_id}"}
     response = requests.post(url, auth=awsauth, json=payload, headers={"Content-Type": "application/json"})
     print("Response for registering model group:", response.text)
@@ -127,7 +137,7 @@ def register_model_group(connector_id, host, awsauth, model_name):
     return ""
 
 def register_model_with_group(connector_id, host, awsauth, model_group_id, model_name):
-    url = host + '_plugins/_ml/models/_register?deploy=true'
+    url = ml_url(host, '_plugins/_ml/models/_register?deploy=true')
     payload = {
         "name": f"{model_name}",
         "function_name": "remote",
@@ -147,14 +157,18 @@ def register_model_with_group(connector_id, host, awsauth, model_group_id, model
     return ""
 
 def get_model_from_task(task_id, host, awsauth):
-    url = host + "_plugins/_ml/tasks/" + task_id
-    response = requests.get(url, auth=awsauth, headers={"Content-Type": "application/json"})
-    print("Response for getting model from task:", response.text)
-
-    if response.status_code == 200:
-        return response.json().get("model_id")
-
-    return ""
+    url = ml_url(host, "_plugins/_ml/tasks/" + task_id)
+    # The model id only appears once the register task completes
+    deadline = time.monotonic() + MODEL_TASK_TIMEOUT
+    while True:
+        response = requests.get(url, auth=awsauth, headers={"Content-Type": "application/json"})
+        print("Response for getting model from task:", response.text)
+        if response.status_code != 200:
+            return ""
+        task = response.json()
+        if task.get("model_id") or task.get("state") == "FAILED" or time.monotonic() > deadline:
+            return task.get("model_id") or ""
+        time.sleep(1)
 
 def get_aos_role_arn():
     try:
@@ -182,30 +196,6 @@ def get_aos_role_arn():
         print(f"Error: {e}")
         raise Exception("Failed to retrieve IAM role ARN")
 
-# Usage example
-if __name__ == "__main__":
-    try:
-        role_arn = get_aos_role_arn()
-        print(f"IAM Role ARN: {role_arn}")
-    except Exception as e:
-        print(f"Error: {e}")
-
-# Usage example
-if __name__ == "__main__":
-    try:
-        role_arn = get_aos_role_arn()
-        print(f"IAM Role ARN: {role_arn}")
-    except Exception as e:
-        print(f"Error: {e}")
-
-# Usage example
-if __name__ == "__main__":
-    try:
-        role_arn = get_aos_role_arn()
-        print(f"IAM Role ARN: {role_arn}")
-    except Exception as e:
-        print(f"Error: {e}")
-
 def create_connector(os_client, region, embmodel):
     aos_role_arn = get_aos_role_arn()
     awsauth = create_aws_auth(region)
@@ -213,7 +203,7 @@ def create_connector(os_client, region, embmodel):
     model_parameter = get_parameters(embmodel, region)
     connector_payload = create_connector_payload(aos_role_arn, model_action, model_parameter)
 
-    connector_response = requests.post(f"{os_client.endpoint}_plugins/_ml/connectors/_create", auth=awsauth, json=connector_payload, headers={"Content-Type": "application/json"})
+    connector_response = requests.post(ml_url(os_client.endpoint, "_plugins/_ml/connectors/_create"), auth=awsauth, json=connector_payload, headers={"Content-Type": "application/json"})
     print(f"Connector creation response: {connector_response.text}")
 
     if connector_response.status_code == 200:
@@ -222,3 +212,55 @@ def create_connector(os_client, region, embmodel):
         return {"connector_id": connector_id, "model_id": model_id}
     else:
         raise Exception("Failed to create connector")
+
+def load_neural_models():
+    if not os.path.exists(NEURAL_MODELS_PATH):
+        return {}
+    with open(NEURAL_MODELS_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_neural_model(key, record):
+    # Jobs register models concurrently: merge into the file as it is now, under the same lock manifests use
+    with locked(NEURAL_MODELS_PATH):
+        models = load_neural_models()
+        models[key] = record
+        tmp_path = f"{NEURAL_MODELS_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(models, f, indent=2)
+        os.replace(tmp_path, NEURAL_MODELS_PATH)
+
+def is_model_deployed(os_client, model_id):
+    try:
+        model = os_client.conn.transport.perform_request("GET", f"/_plugins/_ml/models/{model_id}")
+    except Exception as e:
+        print(f"Model {model_id} lookup failed: {e}")
+        return False
+    if model.get("model_state") != "DEPLOYED":
+        os_client.conn.transport.perform_request("POST", f"/_plugins/_ml/models/{model_id}/_deploy")
+    return True
+
+def get_or_create_model(os_client, region, embmodel):
+    """Return the remote model id for `embmodel`, registering a connector only the first time."""
+    key = f"{os_client.endpoint}|{embmodel}|{region}"
+    record = load_neural_models().get(key)
+    if record and record.get("model_id") and is_model_deployed(os_client, record["model_id"]):
+        return record["model_id"]
+
+    # Registration holds the lock so two jobs starting together don't both create a connector
+    with locked(f"{NEURAL_MODELS_PATH}.register"):
+        record = load_neural_models().get(key)
+        if record and record.get("model_id") and is_model_deployed(os_client, record["model_id"]):
+            return record["model_id"]
+        record = create_connector(os_client, region, embmodel)
+        if not record.get("model_id"):
+            raise Exception(f"Failed to register model for connector {record.get('connector_id')}")
+        save_neural_model(key, {**record, "created_at": int(time.time())})
+    return record["model_id"]
+
+# Usage example
+if __name__ == "__main__":
+    try:
+        role_arn = get_aos_role_arn()
+        print(f"IAM Role ARN: {role_arn}")
+    except Exception as e:
+        print(f"Error: {e}")
@@ -0,0 +1,70 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], rank_constant: int = 60) -> List[Hashable]:
+    """Fuse several ranked id lists; ids ranked high in any list float to the top."""
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (rank_constant + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+def bm25_rank(query: str, texts: Sequence[str], k1: float = 1.5, b: float = 0.75) -> List[int]:
+    """Rank `texts` by Okapi BM25 against `query`, using the texts themselves as the corpus.
+
+    Used where the store has no inverted index (Chroma), so lexical scoring
+    can only be applied to the candidate pool the vector search returned.
+    """
+    query_terms = set(TOKEN_PATTERN.findall(query.lower()))
+    documents = [Counter(TOKEN_PATTERN.findall(text.lower())) for text in texts]
+    if not documents or not query_terms:
+        return list(range(len(texts)))
+
+    lengths = np.array([sum(doc.values()) for doc in documents], dtype=float)
+    avg_length = lengths.mean() or 1.0
+    scores = np.zeros(len(documents))
+    for term in query_terms:
+        frequencies = np.array([doc.get(term, 0) for doc in documents], dtype=float)
+        document_frequency = np.count_nonzero(frequencies)
+        if not document_frequency:
+            continue
+        idf = math.log(1 + (len(documents) - document_frequency + 0.5) / (document_frequency + 0.5))
+        scores += idf * frequencies * (k1 + 1) / (frequencies + k1 * (1 - b + b * lengths / avg_length))
+    return [int(i) for i in np.argsort(-scores, kind='stable')]
+
+def mmr_select(query_vector: Optional[Sequence[float]], candidate_vectors: Sequence[Sequence[float]], k: int, lambda_mult: float = 0.5, relevance: Optional[Sequence[float]] = None) -> List[int]:
+    """Maximal marginal relevance over candidate vectors, vectorized with NumPy.
+
+    Each step scores every remaining candidate at once against the query and
+    against its most similar already-selected candidate, so the cost is k
+    matrix-vector products instead of a Python loop over candidate pairs.
+    `relevance` replaces query similarity when the candidates were already
+    ranked by something else, e.g. a fused hybrid ranking.
+    """
+    candidates = np.asarray(candidate_vectors, dtype=np.float32)
+    if candidates.size == 0 or k <= 0:
+        return []
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    if relevance is None:
+        query = np.asarray(query_vector, dtype=np.float32)
+        query_similarity = candidates @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    else:
+        query_similarity = np.asarray(relevance, dtype=np.float32)
+    max_selected_similarity = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    selected: List[int] = []
+    for _ in range(min(k, len(candidates))):
+        redundancy = np.where(np.isfinite(max_selected_similarity), max_selected_similarity, 0.0)
+        scores = lambda_mult * query_similarity - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_selected_similarity = np.maximum(max_selected_similarity, candidates @ candidates[best])
+    return selected
@@ -0,0 +1,83 @@
+import hashlib
+import logging
+import os
+from typing import List
+
+from langchain_core.documents import Document
+
+from libs.cache import TTLCache
+from libs.embeddings import normalize_query
+from libs.local_models import OnnxCrossEncoder, load_model
+
+logger = logging.getLogger(__name__)
+
+RERANK_TOP_N = int(os.environ.get('RERANK_TOP_N', 3))
+COHERE_RERANK_MODEL = os.environ.get('COHERE_RERANK_MODEL', 'rerank-multilingual-v3.0')
+# A local directory or a Hugging Face repo id that ships an ONNX export and tokenizer.json
+LOCAL_RERANKER_MODEL = os.environ.get('LOCAL_RERANKER_MODEL', 'cross-encoder/ms-marco-MiniLM-L-6-v2')
+LOCAL_RERANKER_ONNX_FILE = os.environ.get('LOCAL_RERANKER_ONNX_FILE', 'onnx/model.onnx')
+LOCAL_RERANKER_MAX_LENGTH = int(os.environ.get('LOCAL_RERANKER_MAX_LENGTH', 512))
+LOCAL_RERANKER_BATCH_SIZE = int(os.environ.get('LOCAL_RERANKER_BATCH_SIZE', 16))
+LOCAL_RERANKER_THREADS = int(os.environ.get('LOCAL_RERANKER_THREADS', 0))
+RERANK_SCORE_CACHE_SIZE = int(os.environ.get('RERANK_SCORE_CACHE_SIZE', 50000))
+
+rerank_score_cache = TTLCache(RERANK_SCORE_CACHE_SIZE)
+
+def document_key(doc: Document) -> str:
+    # Chunk ids are content hashes already; fall back to hashing the text when the store didn't return one
+    return doc.id or hashlib.sha256(doc.page_content.encode('utf-8')).hexdigest()[:32]
+
+def load_cross_encoder(model_name: str = LOCAL_RERANKER_MODEL) -> OnnxCrossEncoder:
+    return load_model(OnnxCrossEncoder, model_name, onnx_file=LOCAL_RERANKER_ONNX_FILE, max_length=LOCAL_RERANKER_MAX_LENGTH, threads=LOCAL_RERANKER_THREADS)
+
+class CohereReranker:
+    name = "cohere"
+
+    def __init__(self, api_key: str, model: str = COHERE_RERANK_MODEL, top_n: int = RERANK_TOP_N) -> None:
+        # langchain_cohere is slow to import and only needed once a request carries an API key
+        from langchain_cohere import CohereRerank
+        self.client = CohereRerank(cohere_api_key=api_key, model=model, top_n=top_n)
+
+    def rerank(self, query: str, documents: List[Document]) -> List[Document]:
+        return list(self.client.compress_documents(query=query, documents=documents))
+
+class CrossEncoderReranker:
+    """Local drop-in for CohereRerank that batch-scores (query, chunk) pairs on CPU.
+
+    Scores are cached per (model, normalized query, chunk id), so repeated or
+    overlapping queries only run the model on chunks it hasn't seen. `model`
+    can be any object with a `predict(pairs, batch_size)` method.
+    """
+
+    name = "local"
+
+    def __init__(self, model_name: str = LOCAL_RERANKER_MODEL, top_n: int = RERANK_TOP_N, batch_size: int = LOCAL_RERANKER_BATCH_SIZE, model=None, cache: TTLCache = rerank_score_cache) -> None:
+        self.model_name = model_name
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.model = model
+        self.cache = cache
+
+    def score(self, query: str, documents: List[Document]) -> List[float]:
+        normalized = normalize_query(query)
+        keys = [(self.model_name, normalized, document_key(doc)) for doc in documents]
+        scores = [self.cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            model = self.model or load_cross_encoder(self.model_name)
+            fresh = model.predict([(query, documents[i].page_content) for i in missing], batch_size=self.batch_size)
+            for i, score in zip(missing, fresh):
+                scores[i] = float(score)
+                self.cache.set(keys[i], scores[i])
+        return scores
+
+    def rerank(self, query: str, documents: List[Document]) -> List[Document]:
+        if not documents:
+            return []
+        scores = self.score(query, documents)
+        ranked = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)[:self.top_n]
+        # Mirror CohereRerank: return copies carrying the score in metadata
+        return [
+            Document(page_content=documents[i].page_content, metadata={**documents[i].metadata, "relevance_score": scores[i]}, id=documents[i].id)
+            for i in ranked
+        ]
@@ -0,0 +1,89 @@
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from concurrency import EndpointLimiter
+from initialize import create_index, delete_index, swap_index
+
+logger = logging.getLogger(__name__)
+
+INDEX_OPERATION_HISTORY = int(os.environ.get('INDEX_OPERATION_HISTORY', 100))
+INDEX_ACTIONS = {"create": create_index, "delete": delete_index, "swap": swap_index}
+
+class IndexLifecycle:
+    """Runs index create/delete/swap operations in the background.
+
+    `submit` returns the operation record straight away and the work runs on
+    the limiter's pool (one operation at a time by default), so a slow index
+    deletion never holds a request open and two operations never race on the
+    same alias. Records live in memory for the last INDEX_OPERATION_HISTORY
+    operations; the indexes themselves are the durable state.
+    """
+
+    def __init__(self, limiter: EndpointLimiter, on_finished: Optional[Callable[[Dict[str, Any]], None]] = None, history: int = INDEX_OPERATION_HISTORY) -> None:
+        self.limiter = limiter
+        self.on_finished = on_finished
+        self.history = history
+        self._operations: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._futures = {}
+
+    def submit(self, action: str, embedding_model: str, region: str, vector_store: str, **params: Any) -> Dict[str, Any]:
+        if action not in INDEX_ACTIONS:
+            raise ValueError(f"Unsupported index action: {action}")
+        operation = {
+            "id": uuid.uuid4().hex,
+            "action": action,
+            "status": "queued",
+            "embedding_model": embedding_model,
+            "region": region,
+            "vector_store": vector_store,
+            "params": params,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        if action == "swap":
+            # Searches must stop using the previous generation before it can be deleted
+            params = {**params, "on_swapped": lambda: self._notify(operation)}
+        future = self.limiter.submit(self._run, operation, INDEX_ACTIONS[action], params)
+        self._operations[operation["id"]] = operation
+        self._futures[operation["id"]] = future
+        future.add_done_callback(lambda _: self._futures.pop(operation["id"], None))
+        while len(self._operations) > self.history:
+            self._operations.popitem(last=False)
+        return operation
+
+    def _run(self, operation: Dict[str, Any], func: Callable[..., Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        operation.update(status="running", started_at=time.time())
+        logger.info(f"Index operation {operation['id']}: {operation['action']} on {operation['vector_store']} for {operation['embedding_model']}")
+        try:
+            result = func(operation["embedding_model"], operation["region"], operation["vector_store"], **params)
+            operation.update(status="succeeded", result=result)
+        except Exception as e:
+            logger.exception(f"Index operation {operation['id']} failed: {e}")
+            operation.update(status="failed", error=str(e))
+        operation["finished_at"] = time.time()
+        # Every action may have changed what the index name serves, even one that failed part way
+        self._notify(operation)
+        return operation
+
+    def _notify(self, operation: Dict[str, Any]) -> None:
+        if self.on_finished is not None:
+            self.on_finished(operation)
+
+    async def wait(self, operation_id: str) -> Optional[Dict[str, Any]]:
+        future = self._futures.get(operation_id)
+        if future is not None:
+            await future
+        return self.get(operation_id)
+
+    def get(self, operation_id: str) -> Optional[Dict[str, Any]]:
+        return self._operations.get(operation_id)
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        return list(reversed(self._operations.values()))[:limit]
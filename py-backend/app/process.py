@@ -1,63 +1,332 @@
-from langchain_community.document_loaders import PyPDFLoader
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from libs.opensearch import OpenSearchClient
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import BedrockEmbeddings
-import re
+from libs.opensearch import OpenSearchClient, BulkWriter, NEURAL_VECTOR_STORE
+from libs.chroma import add_parent_documents, delete_parent_documents, resolve_collection, CHROMA_PATH
+from libs.chroma_engine import ChromaWriter, ChromaPipeWriter, get_engine
+from libs.embeddings import ConcurrentEmbeddings
+from libs.embedding_providers import create_embeddings, embedding_dimension, get_index_name, base_index_name
+from libs.manifest import IngestManifest, file_checksum, read_checksum
+from libs.metrics import span, observe_stage, forward_spans, drain_forwarded_spans
+from jobs import PROGRESS_PREFIX, SPANS_PREFIX
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import queue
 import sys
+import threading
+import time
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-CHROMA_PATH = './vectordb/chroma'
+EMBED_BATCH_SIZE = int(os.environ.get('EMBED_BATCH_SIZE', 16))
+EMBED_CONCURRENCY = int(os.environ.get('EMBED_CONCURRENCY', 4))
+INGEST_WINDOW_SIZE = int(os.environ.get('INGEST_WINDOW_SIZE', 32))
+PAGE_PREFETCH = int(os.environ.get('PAGE_PREFETCH', 8))
+# Multi-file ingests parse and split page windows on worker processes; 0 means one per CPU
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', 0))
+PARSE_WINDOW_PAGES = int(os.environ.get('PARSE_WINDOW_PAGES', 16))
+PARENT_CHUNK_SIZE = int(os.environ.get('PARENT_CHUNK_SIZE', 2000))
+PARENT_CHUNK_OVERLAP = int(os.environ.get('PARENT_CHUNK_OVERLAP', 200))
+CHILD_CHUNK_SIZE = int(os.environ.get('CHILD_CHUNK_SIZE', 400))
+CHILD_CHUNK_OVERLAP = int(os.environ.get('CHILD_CHUNK_OVERLAP', 40))
+# Search only ever queries child chunks; compact indexes store parents for lookup without embedding them
+COMPACT_INDEX = os.environ.get('COMPACT_INDEX', '').lower() in ('1', 'true', 'yes')
 
-def load_document(file_path):
-    logger.info(f"Loading file: {file_path}")
-    loader = PyPDFLoader(file_path)
-    pages = loader.load()
-    return pages
+_END_OF_PAGES = object()
 
-def split_pages(pages, vector_store):
-    logger.info("Splitting documents")
+class IngestProgress:
+    """Counts ingestion work and reports it on stdout for the job runner in jobs.py."""
+
+    def __init__(self, embed_model=None, interval=1.0):
+        self.embed_model = embed_model
+        self.interval = interval
+        self.pages_parsed = 0
+        self.chunks_indexed = 0
+        self.chunks_skipped = 0
+        self.chunks_deleted = 0
+        self._last_report = 0.0
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        progress = {
+            "pages_parsed": self.pages_parsed,
+            "chunks_embedded": getattr(self.embed_model, 'embedded', self.chunks_indexed),
+            "chunks_indexed": self.chunks_indexed,
+            "chunks_skipped": self.chunks_skipped,
+            "chunks_deleted": self.chunks_deleted,
+        }
+        spans = drain_forwarded_spans()
+        if spans:
+            print(f"{SPANS_PREFIX}{json.dumps(spans)}", flush=True)
+        print(f"{PROGRESS_PREFIX}{json.dumps(progress)}", flush=True)
+
+def count_pages(file_path):
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+def load_document(file_path, start=0, stop=None):
+    """Yield pages start..stop of a PDF, extracting text the way PyPDFLoader does.
+
+    Pages are only extracted when reached, so a window of a large file costs
+    no more than the window itself. `source` is the file name alone: it is
+    the document's identity in the manifest and chunk ids, and the upload
+    directory around it is temporary.
+    """
+    from pypdf import PdfReader
+    logger.info(f"Loading file: {file_path} (pages {start}-{stop if stop is not None else 'end'})")
+    reader = PdfReader(file_path)
+    total_pages = len(reader.pages)
+    metadata = {"source": os.path.basename(file_path), "total_pages": total_pages}
+    for page_number in range(start, min(stop if stop is not None else total_pages, total_pages)):
+        text = reader.pages[page_number].extract_text(extraction_mode="plain").strip()
+        yield Document(page_content=text, metadata={**metadata, "page": page_number, "page_label": reader.page_labels[page_number]})
+
+def iter_pages(file_paths):
+    # Parse ahead on a background thread, holding at most PAGE_PREFETCH pages in memory,
+    # so PDF parsing overlaps with embedding and indexing across file boundaries
+    pages = queue.Queue(maxsize=PAGE_PREFETCH)
+
+    def produce():
+        try:
+            for file_path in file_paths:
+                document = load_document(file_path)
+                while True:
+                    with span("parse"):
+                        page = next(document, None)
+                    if page is None:
+                        break
+                    pages.put(page)
+        except Exception as e:
+            pages.put(e)
+        finally:
+            pages.put(_END_OF_PAGES)
+
+    threading.Thread(target=produce, name="pdf-loader", daemon=True).start()
+    while True:
+        item = pages.get()
+        if item is _END_OF_PAGES:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+def chunk_id(*parts):
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode('utf-8')).hexdigest()[:32]
+
+def assign_chunk_ids(chunks, *scope):
+    # Ids hash the chunk text within its scope (source + page, or parent id); repeated
+    # text in the same scope gets an occurrence counter so ids stay unique and stable
+    occurrences = {}
+    ids = []
+    for doc in chunks:
+        digest = hashlib.sha256(doc.page_content.encode('utf-8')).hexdigest()
+        occurrence = occurrences.get(digest, 0)
+        occurrences[digest] = occurrence + 1
+        ids.append(chunk_id(*scope, digest, occurrence))
+    return ids
+
+def get_source_key(doc):
+    return os.path.basename(doc.metadata.get('source', ''))
+
+def create_splitters():
     parent_splitter = RecursiveCharacterTextSplitter(
-        chunk_size = 2000,
-        chunk_overlap = 200,
+        chunk_size = PARENT_CHUNK_SIZE,
+        chunk_overlap = PARENT_CHUNK_OVERLAP,
         is_separator_regex=['\n\n', '\n']
     )
     child_splitter = RecursiveCharacterTextSplitter(
-        chunk_size = 400,
-        chunk_overlap = 40,
+        chunk_size = CHILD_CHUNK_SIZE,
+        chunk_overlap = CHILD_CHUNK_OVERLAP,
         is_separator_regex=['\n\n', '\n']
     ) 
-    
-    parent_chunks = parent_splitter.split_documents(pages)
-    for i, doc in enumerate(parent_chunks):
+    return parent_splitter, child_splitter
+
+def split_page(page, parent_splitter, child_splitter):
+    """Split one page into (parent_id, parent, [(child_id, child), ...]) entries.
+
+    Ids only depend on the source, page number and text, so a page splits the
+    same way in any process.
+    """
+    source = get_source_key(page)
+    parent_chunks = parent_splitter.split_documents([page])
+    for doc in parent_chunks:
         doc.metadata['doc_level'] = "parent"
-    
-    parent_chunk_ids = vector_store.add_documents(documents=parent_chunks)
-    #logger.info("parent_chunk_ids:", parent_chunk_ids)
-    
-    child_chunks = []
-    for i, doc in enumerate(parent_chunks):
-        _id = parent_chunk_ids[i]
+    parents = []
+    for parent_id, doc in zip(assign_chunk_ids(parent_chunks, source, page.metadata.get('page'), "parent"), parent_chunks):
         sub_docs = child_splitter.split_documents([doc])
         for _doc in sub_docs:
             _doc.metadata['doc_level'] = "child"
-            _doc.metadata['parent_doc_id'] = _id
-        child_chunks.extend(sub_docs)
-    child_chunk_ids = vector_store.add_documents(documents=child_chunks)
-    #logger.info("child_chunk_ids:", child_chunk_ids)
+            _doc.metadata['parent_doc_id'] = parent_id
+        parents.append((parent_id, doc, list(zip(assign_chunk_ids(sub_docs, parent_id, "child"), sub_docs))))
+    return source, parents
 
-    ids = parent_chunk_ids + child_chunk_ids
-    return ids
+def iter_split_pages(pages):
+    parent_splitter, child_splitter = create_splitters()
+    for page in pages:
+        with span("split"):
+            yield split_page(page, parent_splitter, child_splitter)
 
-def process_document(file_path, vector_store):
-    pages = load_document(file_path)
-    ids = split_pages(pages, vector_store)
-    num_chunks = len(ids)
+def split_window(file_path, start, stop):
+    # Runs in a parse worker: the stage spans travel back with the result
+    parent_splitter, child_splitter = create_splitters()
+    split_pages = []
+    document = load_document(file_path, start, stop)
+    while True:
+        with span("parse"):
+            page = next(document, None)
+        if page is None:
+            break
+        with span("split"):
+            split_pages.append(split_page(page, parent_splitter, child_splitter))
+    return split_pages, drain_forwarded_spans()
+
+def iter_windows(file_paths, window):
+    for file_path in file_paths:
+        num_pages = count_pages(file_path)
+        for start in range(0, num_pages, window):
+            yield file_path, start, min(start + window, num_pages)
+
+def iter_split_files(file_paths, workers, window=None):
+    """Parse and split page windows on a process pool, yielding pages in upload order.
+
+    At most two windows per worker are in flight, so peak memory depends on
+    the window size rather than on how large the files are.
+    """
+    windows = iter_windows(file_paths, window or PARSE_WINDOW_PAGES)
+    with ProcessPoolExecutor(max_workers=workers, initializer=forward_spans) as pool:
+        pending = deque(pool.submit(split_window, *args) for args in itertools.islice(windows, workers * 2))
+        while pending:
+            split_pages, spans = pending.popleft().result()
+            next_window = next(windows, None)
+            if next_window is not None:
+                pending.append(pool.submit(split_window, *next_window))
+            for stage, seconds in spans:
+                observe_stage(stage, seconds)
+            yield from split_pages
+
+def index_parents(vector_store, documents, ids):
+    if not COMPACT_INDEX:
+        vector_store.add_documents(documents=documents, ids=ids)
+    elif isinstance(vector_store, (BulkWriter, ChromaWriter)):
+        vector_store.add_documents(documents, ids, embed=False)
+    else:
+        add_parent_documents(vector_store, documents, ids)
+
+def flush_window(window, vector_store, known_ids, seen_ids):
+    new_parents = [(_id, doc) for _id, doc, _ in window if _id not in known_ids]
+    if new_parents:
+        with span("index", chunks=len(new_parents)):
+            index_parents(vector_store, [doc for _, doc in new_parents], [_id for _id, _ in new_parents])
+    
+    child_chunks = []
+    child_chunk_ids = []
+    for _id, _, children in window:
+        seen_ids.add(_id)
+        for child_id, _doc in children:
+            seen_ids.add(child_id)
+            if child_id not in known_ids:
+                child_chunks.append(_doc)
+                child_chunk_ids.append(child_id)
+    if child_chunks:
+        with span("index", chunks=len(child_chunks)):
+            vector_store.add_documents(documents=child_chunks, ids=child_chunk_ids)
+
+    return len(new_parents) + len(child_chunks)
+
+def finish_source(source, vector_store, manifest, known_ids, seen_ids):
+    with span("index"):
+        removed_ids = known_ids - seen_ids
+        if removed_ids:
+            vector_store.delete(ids=sorted(removed_ids))
+            if not isinstance(vector_store, (BulkWriter, ChromaWriter)) and hasattr(vector_store, '_collection'):
+                # langchain's Chroma, used directly by the benchmarks
+                delete_parent_documents(vector_store, sorted(removed_ids))
+        if isinstance(vector_store, (BulkWriter, ChromaWriter)):
+            # Buffered chunks must be in the index before the manifest says they are
+            vector_store.flush()
+    if manifest is not None:
+        manifest.record(source, seen_ids)
+    logger.info(f"{source}: {len(seen_ids)} chunks, {len(seen_ids & known_ids)} unchanged, {len(removed_ids)} removed")
+    return len(removed_ids)
+
+def split_pages(pages, vector_store, manifest=None, progress=None):
+    logger.info("Splitting documents")
+    return index_split_pages(iter_split_pages(pages), vector_store, manifest, progress)
+
+def index_split_pages(split_pages, vector_store, manifest=None, progress=None):
+    # Split pages are indexed in order and flushed every INGEST_WINDOW_SIZE parents,
+    # so memory stays bounded by the window rather than the document
+    progress = progress or IngestProgress()
+    num_chunks = 0
+    num_indexed = 0
+    source = None
+    known_ids, seen_ids = set(), set()
+    window = []
+    for page_source, parents in split_pages:
+        if page_source != source:
+            if window:
+                num_indexed += flush_window(window, vector_store, known_ids, seen_ids)
+                window = []
+            if source is not None:
+                progress.chunks_deleted += finish_source(source, vector_store, manifest, known_ids, seen_ids)
+                num_chunks += len(seen_ids)
+            source = page_source
+            known_ids = manifest.chunk_ids(source) if manifest is not None else set()
+            seen_ids = set()
+
+        window.extend(parents)
+        progress.pages_parsed += 1
+        if len(window) >= INGEST_WINDOW_SIZE:
+            num_indexed += flush_window(window, vector_store, known_ids, seen_ids)
+            window = []
+            progress.chunks_indexed = num_indexed
+            progress.chunks_skipped = num_chunks + len(seen_ids) - num_indexed
+            progress.report()
+    if window:
+        num_indexed += flush_window(window, vector_store, known_ids, seen_ids)
+    if source is not None:
+        progress.chunks_deleted += finish_source(source, vector_store, manifest, known_ids, seen_ids)
+        num_chunks += len(seen_ids)
+    progress.chunks_indexed = num_indexed
+    progress.chunks_skipped = num_chunks - num_indexed
+    progress.report(force=True)
+
+    logger.info(f"Embedded and indexed {num_indexed} new chunks, skipped {num_chunks - num_indexed} unchanged")
+    return num_chunks
+
+def process_documents(file_paths, vector_store, manifest=None, progress=None):
+    # Documents are identified by file name; a file whose checksum matches the manifest is skipped
+    # without being parsed. Uploads carry theirs in a sidecar, anything else is hashed here once
+    checksums = {file_path: read_checksum(file_path) or file_checksum(file_path) for file_path in file_paths}
+    if manifest is not None:
+        unchanged = [path for path, checksum in checksums.items() if manifest.checksum(os.path.basename(path)) == checksum]
+        for file_path in unchanged:
+            logger.info(f"Skipping unchanged file: {file_path}")
+        file_paths = [path for path in file_paths if path not in unchanged]
+
+    workers = min(PARSE_WORKERS or os.cpu_count() or 1, len(file_paths))
+    if workers > 1:
+        logger.info(f"Parsing {len(file_paths)} files on {workers} worker processes")
+        split = iter_split_files(file_paths, workers)
+    else:
+        split = iter_split_pages(iter_pages(file_paths))
+    num_chunks = index_split_pages(split, vector_store, manifest, progress)
+    if manifest is not None:
+        for file_path in file_paths:
+            manifest.set_checksum(os.path.basename(file_path), checksums[file_path])
+        manifest.save()
     logger.info(f"Processing {num_chunks} Chunks completed.")
+    return num_chunks
 
 def main():
     model = sys.argv[1]
@@ -68,23 +337,59 @@ def main():
     logger.info(f"Model: {model}, Region: {region}, Vector Store: {vector_db_option}")
     logger.info(f"File paths: {file_paths}")
 
-    suffix = re.sub(r'[^a-z0-9]', '', model.lower())
-    index_name = f'docs-{suffix}'
-
-    embed_model = BedrockEmbeddings(model_id=model, region_name=region)
-    if vector_db_option == "OpenSearch":
-        logger.info(f"Using OpenSearch for index: {index_name}")
-        os_client = OpenSearchClient(index_name)
-        vector_store = os_client.get_vector_store(embed_model)
-    elif vector_db_option == "Chroma":
-        logger.info(f"Using Chroma for collection: {index_name}")
-        vector_store = Chroma(collection_name=index_name, embedding_function=embed_model, persist_directory=CHROMA_PATH)
-    else:
-        logger.error("Invalid Vector Store.")
+    index_name = get_index_name(model, vector_db_option)
+    # Blue/green reindexing writes into a generation of the index instead of the one being searched
+    target_index = os.environ.get('INGEST_INDEX_NAME')
+    if target_index:
+        if base_index_name(target_index) != index_name:
+            logger.error(f"{target_index} is not a generation of {index_name}")
+            sys.exit(1)
+        index_name = target_index
+    # Stage timings go to the job runner alongside progress, which records them in /metrics
+    forward_spans()
+
+    embed_model = ConcurrentEmbeddings(
+        create_embeddings(model, region),
+        batch_size=EMBED_BATCH_SIZE,
+        max_concurrency=EMBED_CONCURRENCY
+    )
+    # The embedding pool's threads must be shut down however the ingest ends
+    try:
+        if vector_db_option == "OpenSearch":
+            logger.info(f"Using OpenSearch for index: {index_name}")
+            os_client = OpenSearchClient(index_name, embedding_dimension(model, embed_model))
+            vector_store = os_client.get_bulk_writer(embed_model)
+            ingest_context = os_client.bulk_ingest()
+            progress = IngestProgress(embed_model)
+        elif vector_db_option == NEURAL_VECTOR_STORE:
+            # Only text is sent; the index's ingest pipeline calls the Bedrock connector for vectors
+            from libs.opensearch_connector import get_or_create_model
+            logger.info(f"Using OpenSearch server-side embedding for index: {index_name}")
+            os_client = OpenSearchClient(index_name, embedding_dimension(model), create=False)
+            os_client.create_ingest_pipeline(get_or_create_model(os_client, region, model), children_only=COMPACT_INDEX)
+            os_client.create_index()
+            vector_store = os_client.get_bulk_writer(None)
+            ingest_context = os_client.bulk_ingest()
+            progress = IngestProgress()
+        elif vector_db_option == "Chroma":
+            logger.info(f"Using Chroma for collection: {index_name}")
+            collection_name = resolve_collection(CHROMA_PATH, index_name)
+            if os.environ.get('INGEST_CHROMA_PIPE'):
+                # Run as a job: the backend's engine owns the collection and applies the writes
+                vector_store = ChromaPipeWriter(collection_name, embed_model)
+            else:
+                vector_store = ChromaWriter(get_engine(), collection_name, embed_model)
+            ingest_context = contextlib.nullcontext()
+            progress = IngestProgress(embed_model)
+        else:
+            logger.error("Invalid Vector Store.")
+            sys.exit(1)
+
+        with ingest_context:
+            process_documents(file_paths, vector_store, IngestManifest(vector_db_option, index_name), progress)
+    finally:
+        embed_model.close()
 
-    for file_path in file_paths:
-        process_document(file_path, vector_store)
-        
     logger.info("Process Completed.")
 
 if __name__ == "__main__":
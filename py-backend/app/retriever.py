@@ -0,0 +1,237 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple
+
+from libs.cache import TTLCache, ParentDocumentCache, PARENT_CACHE_PATH
+from libs.embeddings import CachedEmbeddings, normalize_query
+from libs.embedding_providers import create_embeddings, embedding_dimension
+from libs.rerankers import rerank_score_cache
+from libs.metrics import SEARCHES
+from libs.opensearch import NEURAL_VECTOR_STORE
+from search import get_vector_store, get_similar_documents_by_RAG, iter_similar_documents_by_RAG, get_ranked_child_documents, iter_parent_documents, parent_ids_in_order, format_child_document, format_document, process_documents, get_index_name, parse_search_settings, parse_search_options, parse_search_params, SEARCH_K
+
+logger = logging.getLogger(__name__)
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get('QUERY_EMBEDDING_CACHE_SIZE', 4096))
+QUERY_EMBEDDING_CACHE_TTL = float(os.environ.get('QUERY_EMBEDDING_CACHE_TTL_SECONDS', 24 * 3600))
+# The result cache is opt-in: a size of 0 disables it
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 0))
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL_SECONDS', 300))
+PARENT_CACHE_SIZE = int(os.environ.get('PARENT_CACHE_SIZE', 4096))
+MAX_BATCH_QUERIES = int(os.environ.get('MAX_BATCH_QUERIES', 32))
+# Per-query searches of one batch run on this many threads, shared by all batches
+BATCH_SEARCH_CONCURRENCY = int(os.environ.get('BATCH_SEARCH_CONCURRENCY', 8))
+
+class RetrievalEngine:
+    """Long-lived retrieval service that keeps embedding clients and vector stores warm.
+
+    Clients are cached per (embedding model, region) and vector stores per
+    (embedding model, region, vector store) so repeated queries skip the
+    config parsing, index checks and client construction done by search.py.
+    Query embeddings and parent documents are memoized, and formatted results
+    can optionally be cached until the index they came from is re-ingested or
+    deleted.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._embed_models: Dict[Tuple[str, str], CachedEmbeddings] = {}
+        self._vector_stores: Dict[Tuple[str, str, str], Tuple[Any, Any]] = {}
+        self.query_embedding_cache = TTLCache(QUERY_EMBEDDING_CACHE_SIZE, QUERY_EMBEDDING_CACHE_TTL)
+        self.result_cache = TTLCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+        self.parent_cache = ParentDocumentCache(PARENT_CACHE_SIZE, PARENT_CACHE_PATH or None)
+        self._batch_executor = ThreadPoolExecutor(max_workers=BATCH_SEARCH_CONCURRENCY, thread_name_prefix="batch-search")
+
+    def get_embed_model(self, model: str, region: str) -> CachedEmbeddings:
+        key = (model, region)
+        embed_model = self._embed_models.get(key)
+        if embed_model is None:
+            with self._lock:
+                embed_model = self._embed_models.get(key)
+                if embed_model is None:
+                    logger.info(f"Creating embedding client for model: {model}, region: {region}")
+                    embeddings = create_embeddings(model, region)
+                    embed_model = CachedEmbeddings(embeddings, model, region, self.query_embedding_cache)
+                    self._embed_models[key] = embed_model
+        return embed_model
+
+    def get_vector_store(self, model: str, region: str, vector_db_option: str) -> Tuple[Any, Any]:
+        key = (model, region, vector_db_option)
+        entry = self._vector_stores.get(key)
+        if entry is None:
+            embed_model = self.get_embed_model(model, region)
+            with self._lock:
+                entry = self._vector_stores.get(key)
+                if entry is None:
+                    index_name = get_index_name(model, vector_db_option)
+                    logger.info(f"Opening vector store: {vector_db_option}, index: {index_name}")
+                    entry = get_vector_store(vector_db_option, index_name, embed_model, embedding_dimension(model, embed_model))
+                    self._vector_stores[key] = entry
+        return entry
+
+    def evict(self, model: str, region: str, vector_db_option: str) -> None:
+        with self._lock:
+            self._vector_stores.pop((model, region, vector_db_option), None)
+        self.invalidate_index(vector_db_option, get_index_name(model, vector_db_option))
+
+    def invalidate_index(self, vector_db_option: str, index_name: str) -> None:
+        removed = self.result_cache.invalidate(lambda key: key[:2] == (vector_db_option, index_name))
+        removed_parents = self.parent_cache.invalidate_index(vector_db_option, index_name)
+        if removed or removed_parents:
+            logger.info(f"Invalidated {removed} cached results and {removed_parents} cached parents for {vector_db_option} index: {index_name}")
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {
+            "query_embeddings": self.query_embedding_cache.stats(),
+            "results": self.result_cache.stats(),
+            "rerank_scores": rerank_score_cache.stats(),
+            "parents": self.parent_cache.stats(),
+        }
+
+    def _resolve(self, text: str, search_settings: str, reranker_api: str) -> Dict[str, Any]:
+        region, model, vector_db_option = parse_search_settings(search_settings)
+        search_mode, reranker_name = parse_search_options(search_settings)
+        fetch_k, ef_search = parse_search_params(search_settings)
+        index_name = get_index_name(model, vector_db_option)
+        embed_model = self.get_embed_model(model, region)
+        vector_store, filter = self.get_vector_store(model, region, vector_db_option)
+
+        # Cohere without an API key means no reranking at all
+        reranked_by = reranker_name if reranker_name == "local" or reranker_api else None
+        return {
+            "vector_db_option": vector_db_option,
+            "index_name": index_name,
+            "embed_model": embed_model,
+            "vector_store": vector_store,
+            "filter": filter,
+            "search_mode": search_mode,
+            "reranker_name": reranker_name,
+            "fetch_k": fetch_k,
+            "ef_search": ef_search,
+            "reranked_by": reranked_by,
+            "labels": (vector_db_option, search_mode, reranked_by or "none"),
+            "result_key": (vector_db_option, index_name, normalize_query(text), SEARCH_K, fetch_k, ef_search, json.dumps(filter, sort_keys=True), search_mode, reranked_by),
+        }
+
+    def search(self, text: str, chat_mode: str, search_settings: str, reranker_api: str) -> str:
+        if chat_mode != "RAG":
+            return "Invalid Chat Mode."
+
+        query = self._resolve(text, search_settings, reranker_api)
+        output = self.result_cache.get(query["result_key"])
+        SEARCHES.labels(*query["labels"], str(output is not None).lower()).inc()
+        if output is None:
+            docs = get_similar_documents_by_RAG(text, query["vector_db_option"], query["index_name"], query["embed_model"], reranker_api, vector_store=query["vector_store"], filter=query["filter"], search_mode=query["search_mode"], reranker_name=query["reranker_name"], parent_cache=self.parent_cache, fetch_k=query["fetch_k"], ef_search=query["ef_search"])
+            output = process_documents(docs, query["vector_db_option"])
+            self.result_cache.set(query["result_key"], output)
+        return output
+
+    def search_batch(self, texts: List[str], chat_mode: str, search_settings: str, reranker_api: str) -> List[str]:
+        """search() for several queries with the same settings, one output per query in order.
+
+        Uncached queries are embedded in one batched call, searched and
+        reranked concurrently, and their parents fetched together so a parent
+        shared by several queries is only read once. Repeated queries in the
+        batch are searched once.
+        """
+        if chat_mode != "RAG":
+            raise ValueError("Invalid Chat Mode.")
+        if not texts:
+            return []
+        if len(texts) > MAX_BATCH_QUERIES:
+            raise ValueError(f"Too many queries in one batch: {len(texts)} (max {MAX_BATCH_QUERIES})")
+
+        queries = [self._resolve(text, search_settings, reranker_api) for text in texts]
+        first = queries[0]
+        vector_db_option, index_name = first["vector_db_option"], first["index_name"]
+        outputs: Dict[Tuple, str] = {}
+        pending: Dict[Tuple, str] = {}
+        for text, query in zip(texts, queries):
+            key = query["result_key"]
+            if key in outputs or key in pending:
+                continue
+            output = self.result_cache.get(key)
+            SEARCHES.labels(*query["labels"], str(output is not None).lower()).inc()
+            if output is None:
+                pending[key] = text
+            else:
+                outputs[key] = output
+
+        if pending:
+            # Warms the query embedding cache, which the vector store's own embed_query then hits. Providers
+            # without a batch call are left to embed each query inside its own search, which run in parallel
+            if vector_db_option != NEURAL_VECTOR_STORE and self.query_embedding_cache.maxsize > 0 and first["embed_model"].batches_queries:
+                first["embed_model"].embed_queries(list(pending.values()))
+
+            def search_one(text: str) -> List[Any]:
+                return get_ranked_child_documents(text, vector_db_option, index_name, first["embed_model"], reranker_api, vector_store=first["vector_store"], filter=first["filter"], search_mode=first["search_mode"], reranker_name=first["reranker_name"], fetch_k=first["fetch_k"], ef_search=first["ef_search"])
+
+            # Each task runs in its own copy of the request context so its spans still reach the trace
+            futures = [self._batch_executor.submit(contextvars.copy_context().run, search_one, text) for text in pending.values()]
+            parent_ids = {key: parent_ids_in_order(future.result()) for key, future in zip(pending, futures)}
+
+            all_parent_ids = list(dict.fromkeys(parent_id for ids in parent_ids.values() for parent_id in ids))
+            parents = {}
+            for batch in iter_parent_documents(all_parent_ids, vector_db_option, index_name, first["vector_store"], self.parent_cache):
+                parents.update(batch)
+            for key, ids in parent_ids.items():
+                output = process_documents([parents[parent_id] for parent_id in ids if parent_id in parents], vector_db_option)
+                self.result_cache.set(key, output)
+                outputs[key] = output
+
+        return [outputs[query["result_key"]] for query in queries]
+
+    def search_stream(self, text: str, chat_mode: str, search_settings: str, reranker_api: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Same retrieval as search(), yielded as (event, data) pairs as each stage finishes.
+
+        Emits "children", "reranked" and one or more "parents" events, each with
+        the stage's elapsed_ms, then "done" carrying the full output (identical to
+        search()) and every stage timing.
+        """
+        if chat_mode != "RAG":
+            raise ValueError("Invalid Chat Mode.")
+
+        started = time.perf_counter()
+        query = self._resolve(text, search_settings, reranker_api)
+        vector_db_option = query["vector_db_option"]
+        timings = {"setup": elapsed_ms(started)}
+
+        output = self.result_cache.get(query["result_key"])
+        SEARCHES.labels(*query["labels"], str(output is not None).lower()).inc()
+        if output is not None:
+            yield "done", {"output": output, "cached": True, "timings": timings, "total_ms": elapsed_ms(started)}
+            return
+
+        parent_ids: List[str] = []
+        parents: Dict[str, Any] = {}
+        stage_started = time.perf_counter()
+        stages = iter_similar_documents_by_RAG(text, vector_db_option, query["index_name"], query["embed_model"], reranker_api, query["vector_store"], query["filter"], query["search_mode"], query["reranker_name"], self.parent_cache, query["fetch_k"], query["ef_search"])
+        for stage, value in stages:
+            stage_ms = elapsed_ms(stage_started)
+            timings[stage] = timings.get(stage, 0.0) + stage_ms
+            if stage == "children":
+                yield stage, {"documents": [format_child_document(doc) for doc in value], "elapsed_ms": stage_ms}
+            elif stage == "reranked":
+                parent_ids = parent_ids_in_order(value)
+                yield stage, {"reranked_by": query["reranked_by"], "ids": [doc.id for doc in value], "parent_ids": parent_ids, "elapsed_ms": stage_ms}
+            else:
+                parents.update(value)
+                # "rank" is the parent's final position, so the client can place it before the rest arrive
+                documents = [
+                    {"rank": rank, **format_document(value[parent_id], vector_db_option)}
+                    for rank, parent_id in enumerate(parent_ids) if parent_id in value
+                ]
+                yield stage, {"documents": documents, "elapsed_ms": stage_ms}
+            stage_started = time.perf_counter()
+
+        output = process_documents([parents[parent_id] for parent_id in parent_ids if parent_id in parents], vector_db_option)
+        self.result_cache.set(query["result_key"], output)
+        yield "done", {"output": output, "cached": False, "timings": timings, "total_ms": elapsed_ms(started)}
+
+def elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
@@ -1,16 +1,29 @@
 import json
 import sys
-import re
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 
-from libs.opensearch import OpenSearchClient
-from langchain_community.embeddings import BedrockEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain_cohere import CohereRerank
+from libs.opensearch import OpenSearchClient, NeuralVectorStore, ensure_search_pipeline, is_opensearch, HYBRID_SEARCH_PIPELINE, NEURAL_VECTOR_STORE
+from libs.ranking import reciprocal_rank_fusion, bm25_rank, mmr_select
+from libs.embedding_providers import create_embeddings, embedding_dimension, get_index_name
+from langchain_core.embeddings import Embeddings
+from langchain_core.documents import Document
+from libs.rerankers import CohereReranker, CrossEncoderReranker
+from libs.metrics import span
+from libs.chroma import get_parent_documents, CHROMA_PATH
+from libs.chroma_engine import get_engine
 
 # Constants
-CHROMA_PATH = './vectordb/chroma'
+SEARCH_K = 5
+SEARCH_FETCH_K = 20
+# Upper bounds for the per-query "fetchK" and "efSearch" search settings
+MAX_FETCH_K = int(os.environ.get('MAX_FETCH_K', 200))
+MAX_EF_SEARCH = int(os.environ.get('MAX_EF_SEARCH', 2048))
+SEARCH_MODES = ("mmr", "hybrid", "hybrid_mmr")
+DEFAULT_SEARCH_MODE = os.environ.get('DEFAULT_SEARCH_MODE', 'mmr')
+# "cohere" only reranks when an API key is sent; "local" always reranks on CPU
+RERANKERS = ("cohere", "local")
+DEFAULT_RERANKER = os.environ.get('DEFAULT_RERANKER', 'cohere')
 
 # Document formatting functions
 def format_opensearch_document(doc: Dict[str, Any]) -> Dict[str, str]:
@@ -30,8 +43,18 @@ def format_chroma_document(doc: Dict[str, Any]) -> Dict[str, str]:
         "source": f"Page {page_no} of {source}"
     }
 
+def format_child_document(doc: Document) -> Dict[str, Any]:
+    formatted = {
+        "id": doc.id,
+        "content": doc.page_content,
+        "source": f"Page {doc.metadata.get('page')} of {doc.metadata.get('source')}"
+    }
+    if "relevance_score" in doc.metadata:
+        formatted["score"] = doc.metadata["relevance_score"]
+    return formatted
+
 def format_document(doc: Dict[str, Any], vector_db_option: str) -> Dict[str, str]:
-    if vector_db_option == "OpenSearch":
+    if is_opensearch(vector_db_option):
         return format_opensearch_document(doc)
     elif vector_db_option == "Chroma":
         return format_chroma_document(doc)
@@ -43,55 +66,219 @@ def process_documents(docs: List[Dict[str, Any]], vector_db_option: str) -> str:
     return json.dumps(formatted_docs, ensure_ascii=False, indent=2)
 
 # RAG-related functions
-def get_vector_store(vector_db_option: str, index_name: str, embed_model: BedrockEmbeddings):
+def get_vector_store(vector_db_option: str, index_name: str, embed_model: Embeddings, dimension: int = None):
     if vector_db_option == "OpenSearch":
-        os_client = OpenSearchClient(index_name)
+        os_client = OpenSearchClient(index_name, dimension)
         return os_client.get_vector_store(embed_model), {"term": {"metadata.doc_level": "child"}}
+    elif vector_db_option == NEURAL_VECTOR_STORE:
+        # The index and its embedding pipeline are set up by ingestion; searching never creates them
+        os_client = OpenSearchClient(index_name, dimension, create=False)
+        return os_client.get_neural_store(), {"term": {"metadata.doc_level": "child"}}
     elif vector_db_option == "Chroma":
         if os.path.exists(CHROMA_PATH):
-            return Chroma(persist_directory=CHROMA_PATH, collection_name=index_name, embedding_function=embed_model), {"doc_level": "child"}
+            # Opened through the process's engine, which keeps it in memory and owns every write to it.
+            # The index name may be an alias for a blue/green generation.
+            return get_engine().vector_store(index_name, embed_model), {"doc_level": "child"}
     raise ValueError(f"Unsupported vector_db_option: {vector_db_option}")
 
-def get_similar_documents_by_RAG(text: str, vector_db_option: str, index_name: str, embed_model: BedrockEmbeddings, reranker_api: str) -> List[Dict[str, Any]]:
-    reranker = CohereRerank(cohere_api_key=reranker_api, model='rerank-multilingual-v3.0') if reranker_api else None
+def knn_query(vector: List[float], k: int, filter, ef_search: Optional[int] = None) -> Dict[str, Any]:
+    query = {"vector": vector, "k": k, "filter": filter}
+    if ef_search:
+        query["method_parameters"] = {"ef_search": ef_search}
+    return {"knn": {"vector_field": query}}
+
+def knn_mmr_search(text: str, index_name: str, embed_model: Embeddings, vector_store, filter, fetch_k: int, ef_search: Optional[int] = None) -> List[Document]:
+    # Built by hand rather than through langchain so ef_search can be set per query
+    vector = embed_model.embed_query(text)
+    body = {"size": fetch_k, "query": knn_query(vector, fetch_k, filter, ef_search)}
+    hits = vector_store.client.search(index=index_name, body=body)['hits']['hits']
+    selected = mmr_select(vector, [hit['_source']['vector_field'] for hit in hits], SEARCH_K)
+    return [NeuralVectorStore.to_document(hits[i]) for i in selected]
+
+def hybrid_search(text: str, vector_db_option: str, index_name: str, embed_model: Embeddings, vector_store, filter, mmr: bool = False, fetch_k: int = None, ef_search: Optional[int] = None) -> List[Document]:
+    fetch_k = fetch_k or SEARCH_FETCH_K
+    if is_opensearch(vector_db_option):
+        # BM25 and k-NN run as sub-queries of one request; the search pipeline fuses their rankings
+        ensure_search_pipeline(vector_store.client)
+        if isinstance(vector_store, NeuralVectorStore):
+            vector_query = vector_store.neural_query(text, fetch_k, filter, ef_search)
+        else:
+            vector_query = knn_query(embed_model.embed_query(text), fetch_k, filter, ef_search)
+        body = {
+            "size": fetch_k if mmr else SEARCH_K,
+            "_source": {"excludes": [] if mmr else ["vector_field"]},
+            "query": {"hybrid": {"queries": [
+                {"bool": {"must": [{"match": {"text": text}}], "filter": [filter]}},
+                vector_query,
+            ]}},
+        }
+        response = vector_store.client.search(index=index_name, body=body, params={"search_pipeline": HYBRID_SEARCH_PIPELINE})
+        hits = response['hits']['hits']
+        docs = [NeuralVectorStore.to_document(hit) for hit in hits]
+        vectors = [hit['_source'].get('vector_field') for hit in hits] if mmr else None
+    elif vector_db_option == "Chroma":
+        # Chroma has no inverted index, so BM25 can only re-score the k-NN candidate pool
+        result = vector_store._collection.query(
+            query_embeddings=[embed_model.embed_query(text)], n_results=fetch_k, where=filter,
+            include=['documents', 'metadatas', 'embeddings'] if mmr else ['documents', 'metadatas'],
+        )
+        candidates = [
+            Document(page_content=document, metadata=metadata, id=doc_id)
+            for doc_id, document, metadata in zip(result['ids'][0], result['documents'][0], result['metadatas'][0])
+        ]
+        order = reciprocal_rank_fusion([range(len(candidates)), bm25_rank(text, [doc.page_content for doc in candidates])])
+        docs = [candidates[i] for i in order]
+        vectors = [result['embeddings'][0][i] for i in order] if mmr else None
+    else:
+        raise ValueError(f"Unsupported vector_db_option: {vector_db_option}")
+
+    if mmr and docs:
+        # Diversify the fused list while keeping its order as the relevance signal
+        relevance = [1 - rank / len(docs) for rank in range(len(docs))]
+        return [docs[i] for i in mmr_select(None, vectors, SEARCH_K, relevance=relevance)]
+    return docs[:SEARCH_K]
+
+def get_reranker(reranker_api: str, reranker_name: str = DEFAULT_RERANKER):
+    if reranker_name == "local":
+        return CrossEncoderReranker()
+    if reranker_api:
+        return CohereReranker(reranker_api)
+    return None
+
+def get_similar_documents_by_RAG(text: str, vector_db_option: str, index_name: str, embed_model: Embeddings, reranker_api: str, vector_store=None, filter=None, search_mode: str = DEFAULT_SEARCH_MODE, reranker_name: str = DEFAULT_RERANKER, parent_cache=None, fetch_k: int = None, ef_search: Optional[int] = None) -> List[Dict[str, Any]]:
+    parents = {}
+    for stage, value in iter_similar_documents_by_RAG(text, vector_db_option, index_name, embed_model, reranker_api, vector_store, filter, search_mode, reranker_name, parent_cache, fetch_k, ef_search):
+        if stage == "reranked":
+            parent_ids = parent_ids_in_order(value)
+        elif stage == "parents":
+            parents.update(value)
+    return [parents[parent_id] for parent_id in parent_ids if parent_id in parents]
+
+def iter_similar_documents_by_RAG(text: str, vector_db_option: str, index_name: str, embed_model: Embeddings, reranker_api: str, vector_store=None, filter=None, search_mode: str = DEFAULT_SEARCH_MODE, reranker_name: str = DEFAULT_RERANKER, parent_cache=None, fetch_k: int = None, ef_search: Optional[int] = None) -> Iterator[Tuple[str, Any]]:
+    """Run retrieval stage by stage, yielding ("children", docs), ("reranked", docs) and then
+    one or more ("parents", {parent_id: doc}) batches as each becomes available."""
+    reranker = get_reranker(reranker_api, reranker_name)
+    fetch_k = fetch_k or SEARCH_FETCH_K
     
-    vector_store, filter = get_vector_store(vector_db_option, index_name, embed_model)
-    docs = vector_store.max_marginal_relevance_search(query=text, k=5, fetch_k=20, filter=filter)
+    if vector_store is None:
+        vector_store, filter = get_vector_store(vector_db_option, index_name, embed_model)
+    with span("search", mode=search_mode, vector_store=vector_db_option):
+        if search_mode in ("hybrid", "hybrid_mmr"):
+            docs = hybrid_search(text, vector_db_option, index_name, embed_model, vector_store, filter, mmr=search_mode == "hybrid_mmr", fetch_k=fetch_k, ef_search=ef_search)
+        elif vector_db_option == "OpenSearch":
+            docs = knn_mmr_search(text, index_name, embed_model, vector_store, filter, fetch_k, ef_search)
+        elif isinstance(vector_store, NeuralVectorStore):
+            docs = vector_store.max_marginal_relevance_search(query=text, k=SEARCH_K, fetch_k=fetch_k, filter=filter, ef_search=ef_search)
+        else:
+            # Chroma's HNSW search_ef is fixed per collection, so only fetch_k varies per query
+            docs = vector_store.max_marginal_relevance_search(query=text, k=SEARCH_K, fetch_k=fetch_k, filter=filter)
+    yield "children", docs
     
     if reranker:
-        ordered_docs = reranker.compress_documents(query=text, documents=docs)
+        with span("rerank", reranker=reranker.name, documents=len(docs)):
+            ordered_docs = reranker.rerank(text, docs)
     else:
         ordered_docs = docs
+    yield "reranked", ordered_docs
 
-    parent_ids = set(doc.metadata['parent_doc_id'] for doc in ordered_docs)
-    
-    parent_docs = []
-    for doc_id in parent_ids:
-        if vector_db_option == "OpenSearch":   
-            os_client = OpenSearchClient(index_name) 
-            parent_doc = os_client.conn.get(index=index_name, id=doc_id, _source=['text', 'metadata.page', 'metadata.source'])
-        elif vector_db_option == "Chroma":
-            parent_doc = vector_store.get(ids=doc_id)
-        parent_docs.append(parent_doc)
-    
-    return parent_docs
+    yield from (("parents", batch) for batch in iter_parent_documents(parent_ids_in_order(ordered_docs), vector_db_option, index_name, vector_store, parent_cache))
 
-# Main function
-def main():
-    text, chat_mode, search_settings, reranker_api = sys.argv[1:]
+def get_ranked_child_documents(text: str, vector_db_option: str, index_name: str, embed_model: Embeddings, reranker_api: str, vector_store=None, filter=None, search_mode: str = DEFAULT_SEARCH_MODE, reranker_name: str = DEFAULT_RERANKER, fetch_k: int = None, ef_search: Optional[int] = None) -> List[Document]:
+    """Search and rerank only; the caller fetches the parents, e.g. once for a whole batch."""
+    for stage, value in iter_similar_documents_by_RAG(text, vector_db_option, index_name, embed_model, reranker_api, vector_store, filter, search_mode, reranker_name, fetch_k=fetch_k, ef_search=ef_search):
+        if stage == "reranked":
+            return value
+    return []
+
+def parent_ids_in_order(docs: List[Document]) -> List[str]:
+    # Keep the reranked child order, dropping repeats of the same parent
+    return list(dict.fromkeys(doc.metadata['parent_doc_id'] for doc in docs))
+
+def fetch_parent_documents(parent_ids: List[str], vector_db_option: str, index_name: str, vector_store, parent_cache=None) -> List[Dict[str, Any]]:
+    found = {}
+    for batch in iter_parent_documents(parent_ids, vector_db_option, index_name, vector_store, parent_cache):
+        found.update(batch)
+    return [found[parent_id] for parent_id in parent_ids if parent_id in found]
+
+def iter_parent_documents(parent_ids: List[str], vector_db_option: str, index_name: str, vector_store, parent_cache=None) -> Iterator[Dict[str, Dict[str, Any]]]:
+    """Yield cached parents first, then whatever had to be fetched from the store."""
+    if not parent_ids:
+        return
+
+    found = parent_cache.get_many(vector_db_option, index_name, parent_ids) if parent_cache else {}
+    if found:
+        yield found
+    missing = [parent_id for parent_id in parent_ids if parent_id not in found]
+    if missing:
+        with span("parent_fetch", parents=len(missing)):
+            fetched = fetch_parent_documents_from_store(missing, vector_db_option, index_name, vector_store)
+        if parent_cache:
+            parent_cache.set_many(vector_db_option, index_name, fetched)
+        yield fetched
+
+def fetch_parent_documents_from_store(parent_ids: List[str], vector_db_option: str, index_name: str, vector_store) -> Dict[str, Dict[str, Any]]:
+    if is_opensearch(vector_db_option):
+        # Single round trip on the vector store's own connection
+        response = vector_store.client.mget(index=index_name, body={"ids": parent_ids}, _source=['text', 'metadata.page', 'metadata.source'])
+        return {doc['_id']: doc for doc in response['docs'] if doc.get('found')}
+    elif vector_db_option == "Chroma":
+        result = vector_store.get(ids=parent_ids)
+        # Re-split the bulk response into the per-document shape format_chroma_document expects
+        found = {
+            doc_id: {"ids": [doc_id], "documents": [document], "metadatas": [metadata]}
+            for doc_id, document, metadata in zip(result['ids'], result['documents'], result['metadatas'])
+        }
+        # Compact indexes keep parents in a separate lookup-only collection
+        missing = [parent_id for parent_id in parent_ids if parent_id not in found]
+        if missing:
+            found.update(get_parent_documents(vector_store, missing))
+        return found
+    raise ValueError(f"Unsupported vector_db_option: {vector_db_option}")
+
+# Settings helpers
+def parse_search_settings(search_settings: str) -> Tuple[str, str, str]:
     search_settings_dict = json.loads(search_settings)
-    
     region = search_settings_dict.get('embRegion', '')
     model = search_settings_dict.get('embeddingModel', '')
     vector_db_option = search_settings_dict.get('vectorStore', '')
+    return region, model, vector_db_option
+
+def parse_search_options(search_settings: str) -> Tuple[str, str]:
+    search_settings_dict = json.loads(search_settings)
+    search_mode = search_settings_dict.get('searchMode') or DEFAULT_SEARCH_MODE
+    reranker_name = search_settings_dict.get('reranker') or DEFAULT_RERANKER
+    if search_mode not in SEARCH_MODES:
+        raise ValueError(f"Unsupported searchMode: {search_mode}")
+    if reranker_name not in RERANKERS:
+        raise ValueError(f"Unsupported reranker: {reranker_name}")
+    return search_mode, reranker_name
+
+def parse_search_params(search_settings: str) -> Tuple[int, Optional[int]]:
+    """Per-query candidate pool size ("fetchK") and HNSW search width ("efSearch", OpenSearch only)."""
+    search_settings_dict = json.loads(search_settings)
+    fetch_k = int(search_settings_dict.get('fetchK') or SEARCH_FETCH_K)
+    ef_search = search_settings_dict.get('efSearch')
+    ef_search = int(ef_search) if ef_search else None
+    if not SEARCH_K <= fetch_k <= MAX_FETCH_K:
+        raise ValueError(f"fetchK must be between {SEARCH_K} and {MAX_FETCH_K}")
+    # OpenSearch rejects an ef_search smaller than the number of neighbors asked for
+    if ef_search is not None and not fetch_k <= ef_search <= MAX_EF_SEARCH:
+        raise ValueError(f"efSearch must be between fetchK ({fetch_k}) and {MAX_EF_SEARCH}")
+    return fetch_k, ef_search
+
+# Main function
+def main():
+    text, chat_mode, search_settings, reranker_api = sys.argv[1:]
+    region, model, vector_db_option = parse_search_settings(search_settings)
+    search_mode, reranker_name = parse_search_options(search_settings)
+    fetch_k, ef_search = parse_search_params(search_settings)
+    index_name = get_index_name(model, vector_db_option)
     
-    suffix = re.sub(r'[^a-z0-9]', '', model.lower())
-    index_name = f'docs-{suffix}'
-    
-    embed_model = BedrockEmbeddings(model_id=model, region_name=region)
+    embed_model = create_embeddings(model, region)
     
     if chat_mode == "RAG":
-        docs = get_similar_documents_by_RAG(text, vector_db_option, index_name, embed_model, reranker_api)
+        vector_store, filter = get_vector_store(vector_db_option, index_name, embed_model, embedding_dimension(model, embed_model))
+        docs = get_similar_documents_by_RAG(text, vector_db_option, index_name, embed_model, reranker_api, vector_store=vector_store, filter=filter, search_mode=search_mode, reranker_name=reranker_name, fetch_k=fetch_k, ef_search=ef_search)
         formatted_docs = process_documents(docs, vector_db_option)
         print(formatted_docs)
     else:
@@ -0,0 +1,61 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Dict
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from libs.manifest import CHECKSUM_SUFFIX, write_checksum
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = os.environ.get('UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'chatbot-uploads'))
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', 200 * 1024 * 1024))
+
+async def save_upload(file: UploadFile) -> Dict[str, Any]:
+    """Stream one upload to a private directory, hashing it on the way through.
+
+    Every upload gets its own `upload-*` directory so two users sending the
+    same file name never collide. The SHA-256 is written next to the file
+    as `<name>.sha256` so ingestion can deduplicate without re-reading it.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    upload_dir = await run_in_threadpool(tempfile.mkdtemp, prefix='upload-', dir=UPLOAD_DIR)
+    filename = os.path.basename(file.filename or '') or 'upload'
+    file_location = os.path.join(upload_dir, filename)
+
+    checksum = hashlib.sha256()
+    size = 0
+    try:
+        buffer = await run_in_threadpool(open, file_location, 'wb')
+        try:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > UPLOAD_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"{filename} exceeds the {UPLOAD_MAX_BYTES} byte upload limit")
+                checksum.update(chunk)
+                await run_in_threadpool(buffer.write, chunk)
+        finally:
+            await run_in_threadpool(buffer.close)
+
+        digest = checksum.hexdigest()
+        await run_in_threadpool(write_checksum, file_location, digest)
+    except BaseException:
+        await run_in_threadpool(shutil.rmtree, upload_dir, True)
+        raise
+
+    logger.info(f"Uploaded file: {file_location} ({size} bytes, sha256 {digest})")
+    return {"path": file_location, "filename": filename, "size": size, "sha256": digest}
+
+def remove_upload(file_path: str) -> None:
+    for path in (file_path, f"{file_path}{CHECKSUM_SUFFIX}"):
+        if os.path.exists(path):
+            os.remove(path)
+    # Drop the per-upload directory once it is empty, but never touch anything outside UPLOAD_DIR
+    upload_dir = os.path.dirname(os.path.abspath(file_path))
+    if os.path.dirname(upload_dir) == os.path.abspath(UPLOAD_DIR) and not os.listdir(upload_dir):
+        os.rmdir(upload_dir)
@@ -1,18 +1,141 @@
-from langchain_community.tools.tavily_search import TavilySearchResults
+import asyncio
+import hashlib
 import json
+import logging
 import os
 import sys
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from libs.cache import TTLCache
+from libs.embeddings import normalize_query
+from libs.metrics import span
+
+logger = logging.getLogger(__name__)
+
+TAVILY_API_URL = os.environ.get('TAVILY_API_URL', 'https://api.tavily.com')
+WEBSEARCH_MAX_RESULTS = int(os.environ.get('WEBSEARCH_MAX_RESULTS', 5))
+WEBSEARCH_SEARCH_DEPTH = os.environ.get('WEBSEARCH_SEARCH_DEPTH', 'advanced')
+WEBSEARCH_TIMEOUT = float(os.environ.get('WEBSEARCH_TIMEOUT_SECONDS', 30))
+WEBSEARCH_MAX_CONNECTIONS = int(os.environ.get('WEBSEARCH_MAX_CONNECTIONS', 16))
+WEBSEARCH_CACHE_SIZE = int(os.environ.get('WEBSEARCH_CACHE_SIZE', 1024))
+WEBSEARCH_CACHE_TTL = float(os.environ.get('WEBSEARCH_CACHE_TTL_SECONDS', 600))
+
+class WebSearchClient:
+    """In-process Tavily client on one pooled async HTTP connection pool.
+
+    Results are cached per (API key, normalized query) for a TTL, and
+    identical queries that arrive while one is already in flight wait on
+    that request instead of sending their own. The result shape matches
+    langchain's TavilySearchResults: title, url, content and score.
+    """
+
+    def __init__(self, base_url: str = TAVILY_API_URL, max_results: int = WEBSEARCH_MAX_RESULTS, search_depth: str = WEBSEARCH_SEARCH_DEPTH, cache: TTLCache = None) -> None:
+        self.base_url = base_url.rstrip('/')
+        self.max_results = max_results
+        self.search_depth = search_depth
+        self.cache = cache if cache is not None else TTLCache(WEBSEARCH_CACHE_SIZE, WEBSEARCH_CACHE_TTL)
+        self._client = None
+        self._in_flight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool belongs to the event loop that serves requests
+        if self._client is None:
+            limits = httpx.Limits(max_connections=WEBSEARCH_MAX_CONNECTIONS, max_keepalive_connections=WEBSEARCH_MAX_CONNECTIONS)
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=WEBSEARCH_TIMEOUT, limits=limits)
+        return self._client
+
+    async def search(self, text: str, api_key: str) -> List[Dict[str, Any]]:
+        # Keys are hashed so they never sit in the cache in the clear, and different keys never share results
+        key = (hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16], normalize_query(text))
+        results = self.cache.get(key)
+        if results is not None:
+            return results
+
+        # The request runs as its own task, so a caller that disconnects doesn't cancel it for the others
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(text, api_key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Tuple[str, str], task: asyncio.Future) -> None:
+        self._in_flight.pop(key, None)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            self.errors += 1
+            return
+        self.cache.set(key, task.result())
+
+    async def _fetch(self, text: str, api_key: str) -> List[Dict[str, Any]]:
+        self.requests += 1
+        params = {
+            "api_key": api_key,
+            "query": text,
+            "max_results": self.max_results,
+            "search_depth": self.search_depth,
+            "include_answer": False,
+            "include_raw_content": False,
+            "include_images": False,
+        }
+        with span("websearch"):
+            response = await self.client.post('/search', json=params)
+        response.raise_for_status()
+        results = []
+        for result in response.json().get("results", []):
+            item = {"title": result["title"], "url": result["url"], "content": result["content"], "score": result["score"]}
+            if result.get("raw_content"):
+                item["raw_content"] = result["raw_content"]
+            results.append(item)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {"requests": self.requests, "coalesced": self.coalesced, "errors": self.errors, "in_flight": len(self._in_flight)}
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+def merge_results(rag_output: str, web_results: List[Dict[str, Any]]) -> str:
+    """One context list for the chat prompt: document chunks first, then web pages in ranked order.
+
+    A page whose URL or content already appeared is dropped, so the same text
+    never takes up prompt space twice.
+    """
+    rag_docs = json.loads(rag_output) if rag_output and rag_output.startswith('[') else []
+    seen = {doc.get("content") for doc in rag_docs}
+    web_docs = []
+    for result in web_results:
+        if result["url"] in seen or result["content"] in seen:
+            continue
+        seen.update((result["url"], result["content"]))
+        web_docs.append({"content": result["content"], "source": result["url"]})
+    return json.dumps(rag_docs + web_docs, ensure_ascii=False, indent=2)
+
+def web_search(text, tavily_search_key):
+    async def run():
+        client = WebSearchClient()
+        try:
+            return await client.search(text, tavily_search_key)
+        finally:
+            await client.aclose()
+    return json.dumps(asyncio.run(run()))
 
 def main():
     text = sys.argv[1]
     tavily_search_key = sys.argv[3]
-    
-    os.environ["TAVILY_API_KEY"] = tavily_search_key
-    tool = TavilySearchResults()
 
-    result = tool.invoke({"query": text})
-    json_result = json.dumps(result)
-    print(json_result)
+    print(web_search(text, tavily_search_key))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,109 @@
+"""Multi-query retrieval: one /search call per query versus one /search/batch call.
+
+Seeds the local OpenSearch stub with parent and child chunks, then runs the
+same query set through RetrievalEngine three ways: one search() after
+another, search() for every query at once on a thread pool (the frontend
+firing N requests), and a single search_batch(). Each run uses a fresh
+engine, so nothing is cached between them. Embeddings cost `--embed-latency`
+per request regardless of how many texts it carries, like Cohere on Bedrock
+or a local model; with `--per-text` every text is its own request, like
+Titan.
+
+Reports wall time, embedding requests and stub round trips per search
+request type as JSON. The stub does no scoring: every query gets the same
+top children, so all of them share their parents.
+
+    python py-backend/benchmarks/batch_search_bench.py --queries 16 --latency 0.005 --embed-latency 0.05
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stub_opensearch import StubOpenSearch
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=16)
+    parser.add_argument('--parents', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.005, help='Simulated OpenSearch latency per request')
+    parser.add_argument('--embed-latency', type=float, default=0.05, help='Simulated latency per embedding request')
+    parser.add_argument('--per-text', action='store_true', help='Embed one text per request, with no batch call')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    stub = StubOpenSearch(latency=args.latency).start()
+    os.environ['OPENSEARCH_CONFIG_PATH'] = stub.write_config()
+
+    from common import FakeEmbeddings, synthetic_text
+    from libs.embedding_providers import DeterministicFakeEmbeddings, register_provider
+    import retriever
+
+    class BatchingFakeEmbeddings(FakeEmbeddings):
+        # One simulated request per call, however many texts it carries
+        batches_queries = True
+
+        def embed_documents(self, texts):
+            with self._lock:
+                self.calls += 1
+            time.sleep(self.call_latency)
+            return [DeterministicFakeEmbeddings._embed(self, text) for text in texts]
+
+        def embed_query(self, text):
+            return self.embed_documents([text])[0]
+
+    models = []
+    def create_bench_embeddings(model_id, region):
+        embeddings_class = FakeEmbeddings if args.per_text else BatchingFakeEmbeddings
+        models.append(embeddings_class(int(model_id), call_latency=args.embed_latency))
+        return models[-1]
+    register_provider("bench", create_bench_embeddings)
+
+    rng = random.Random(args.seed)
+    for i in range(args.parents):
+        stub.documents[f"parent-{i}"] = {"text": synthetic_text(rng, 300), "metadata": {"page": i, "source": "synthetic.pdf", "doc_level": "parent"}}
+        for j in range(3):
+            stub.documents[f"child-{i}-{j}"] = {"text": synthetic_text(rng, 60), "metadata": {"page": i, "source": "synthetic.pdf", "doc_level": "child", "parent_doc_id": f"parent-{i}"}}
+    queries = [synthetic_text(rng, 8) for _ in range(args.queries)]
+    settings = json.dumps({"embRegion": "us-east-1", "embeddingModel": "bench:256", "vectorStore": "OpenSearch", "searchMode": "hybrid"})
+
+    def run(label, func):
+        engine = retriever.RetrievalEngine()
+        engine.get_vector_store("bench:256", "us-east-1", "OpenSearch")
+        stub.requests.clear()
+        calls = models[-1].calls
+        start = time.perf_counter()
+        outputs = func(engine)
+        elapsed = time.perf_counter() - start
+        return outputs, {
+            "mode": label,
+            "ms": round(elapsed * 1000, 1),
+            "embedding_requests": models[-1].calls - calls,
+            "search_round_trips": stub.requests.get("POST _search", 0),
+            "mget_round_trips": stub.requests.get("POST _mget", 0),
+        }
+
+    def sequential(engine):
+        return [engine.search(query, "RAG", settings, "") for query in queries]
+
+    def concurrent(engine):
+        with ThreadPoolExecutor(max_workers=retriever.BATCH_SEARCH_CONCURRENCY) as executor:
+            return list(executor.map(lambda query: engine.search(query, "RAG", settings, ""), queries))
+
+    def batch(engine):
+        return engine.search_batch(queries, "RAG", settings, "")
+
+    expected, first = run("sequential", sequential)
+    results = [first]
+    for label, func in (("concurrent", concurrent), ("batch", batch)):
+        outputs, result = run(label, func)
+        result["identical_to_sequential"] = outputs == expected
+        results.append(result)
+    stub.stop()
+    os.remove(os.environ['OPENSEARCH_CONFIG_PATH'])
+    print(json.dumps({"queries": args.queries, "latency": args.latency, "embed_latency": args.embed_latency, "per_text": args.per_text, "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
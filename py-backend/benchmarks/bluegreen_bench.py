@@ -0,0 +1,129 @@
+"""Search availability while an index is rebuilt: in place versus blue/green.
+
+Against the OpenSearch stub (tracking indexes and aliases), a background
+thread keeps running RetrievalEngine searches while the index is rebuilt
+two ways:
+
+- in place: what /initialize followed by re-ingesting does. The index is
+  deleted and comes back empty on the next search, then is refilled after
+  `--reindex-seconds` (the ingest).
+- blue/green: a new generation is created and filled over the same time,
+  then the alias is swapped over to it and the old generation deleted,
+  through the same functions the /indexes endpoints run.
+
+Reports searches, failed and empty searches, the longest stretch without a
+search that returned documents, and latency percentiles for each strategy
+as JSON. Every query is distinct, so none is served from the result cache.
+
+    python py-backend/benchmarks/bluegreen_bench.py --reindex-seconds 1 --latency 0.005
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from stub_opensearch import StubOpenSearch
+
+MODEL, REGION, STORE = "fake:64", "us-east-1", "OpenSearch"
+
+def percentile(samples, q):
+    return round(sorted(samples)[min(len(samples) - 1, int(q * len(samples)))], 1) if samples else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reindex-seconds', type=float, default=1.0, help='How long filling the new index takes')
+    parser.add_argument('--settle-seconds', type=float, default=0.5, help='Searching before and after each rebuild')
+    parser.add_argument('--latency', type=float, default=0.005, help='Simulated OpenSearch latency per request')
+    parser.add_argument('--parents', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    stub = StubOpenSearch(latency=args.latency, track_indexes=True).start()
+    os.environ['OPENSEARCH_CONFIG_PATH'] = stub.write_config()
+    workdir = tempfile.TemporaryDirectory(prefix='bluegreen-bench-')
+    # Manifests and caches go to ./vectordb
+    os.chdir(workdir.name)
+
+    from common import synthetic_text
+    from libs.opensearch import OpenSearchClient
+    import initialize
+    import retriever
+
+    rng = random.Random(args.seed)
+    corpus = {}
+    for i in range(args.parents):
+        corpus[f"parent-{i}"] = {"text": synthetic_text(rng, 300), "metadata": {"page": i, "source": "synthetic.pdf", "doc_level": "parent"}}
+        corpus[f"child-{i}"] = {"text": synthetic_text(rng, 60), "metadata": {"page": i, "source": "synthetic.pdf", "doc_level": "child", "parent_doc_id": f"parent-{i}"}}
+    settings = json.dumps({"embRegion": REGION, "embeddingModel": MODEL, "vectorStore": STORE, "searchMode": "hybrid"})
+    index_name = initialize.get_index_name(MODEL, STORE)
+
+    def in_place(engine):
+        initialize.delete_index(MODEL, REGION, STORE)
+        engine.evict(MODEL, REGION, STORE)
+        time.sleep(args.reindex_seconds)
+        OpenSearchClient(index_name, initialize.index_dimension(MODEL, REGION)).create_index()
+        stub.documents_of(index_name).update(corpus)
+        engine.invalidate_index(STORE, index_name)
+
+    def blue_green(engine):
+        generation = initialize.create_index(MODEL, REGION, STORE)["created"]
+        time.sleep(args.reindex_seconds)
+        stub.documents_of(generation).update(corpus)
+        initialize.swap_index(MODEL, REGION, STORE, generation, delete_previous=True, on_swapped=lambda: engine.evict(MODEL, REGION, STORE))
+
+    results = []
+    for label, rebuild in (("in_place", in_place), ("blue_green", blue_green)):
+        initialize.delete_index(MODEL, REGION, STORE)
+        OpenSearchClient(index_name, initialize.index_dimension(MODEL, REGION)).create_index()
+        stub.documents_of(index_name).update(corpus)
+        engine = retriever.RetrievalEngine()
+        # Deferred imports and the first connection would otherwise land in the measured window
+        engine.search(f"{label} warm-up", "RAG", settings, "")
+        stop = threading.Event()
+        outcomes = []
+
+        def search():
+            count = 0
+            while not stop.is_set():
+                count += 1
+                started = time.perf_counter()
+                try:
+                    outcome = "ok" if json.loads(engine.search(f"{label} query {count}", "RAG", settings, "")) else "empty"
+                except Exception:
+                    outcome = "failed"
+                outcomes.append((started, outcome, (time.perf_counter() - started) * 1000))
+
+        searcher = threading.Thread(target=search)
+        searcher.start()
+        time.sleep(args.settle_seconds)
+        rebuild_started = time.perf_counter()
+        rebuild(engine)
+        rebuild_seconds = time.perf_counter() - rebuild_started
+        time.sleep(args.settle_seconds)
+        stop.set()
+        searcher.join()
+
+        longest_gap, last_ok = 0.0, outcomes[0][0]
+        for started, outcome, _ in outcomes:
+            if outcome == "ok":
+                longest_gap, last_ok = max(longest_gap, started - last_ok), started
+        latencies = [ms for _, outcome, ms in outcomes if outcome == "ok"]
+        results.append({
+            "strategy": label,
+            "searches": len(outcomes),
+            "failed": sum(outcome == "failed" for _, outcome, _ in outcomes),
+            "empty": sum(outcome == "empty" for _, outcome, _ in outcomes),
+            "longest_gap_ms": round(longest_gap * 1000, 1),
+            "rebuild_ms": round(rebuild_seconds * 1000, 1),
+            "p50_ms": percentile(latencies, 0.5),
+            "p95_ms": percentile(latencies, 0.95),
+        })
+    stub.stop()
+    os.remove(os.environ['OPENSEARCH_CONFIG_PATH'])
+    print(json.dumps({"reindex_seconds": args.reindex_seconds, "latency": args.latency, "indexes_left": sorted(stub.indices), "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
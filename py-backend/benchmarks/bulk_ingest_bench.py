@@ -0,0 +1,79 @@
+"""OpenSearch ingest throughput: LangChain add_documents vs. the BulkWriter path.
+
+Runs the real split_pages ingestion over synthetic pages into the local
+OpenSearch stub (or any endpoint given by OPENSEARCH_CONFIG_PATH with
+--external). The baseline indexes through OpenSearchVectorSearch, which
+refreshes after every add call; the bulk runs buffer actions, send them
+with parallel_bulk and refresh once. Reports chunks/sec, bulk and refresh
+round trips per configuration as JSON.
+
+    python py-backend/benchmarks/bulk_ingest_bench.py --pages 100 --latency 0.01 --workers 1 4 8
+"""
+import argparse
+import json
+import os
+import time
+
+from stub_opensearch import StubOpenSearch
+
+def run(label, stub, index_name, ingest):
+    if stub is not None:
+        stub.requests.clear()
+        stub.documents.clear()
+    start = time.perf_counter()
+    num_chunks = ingest()
+    elapsed = time.perf_counter() - start
+    result = {"config": label, "chunks": num_chunks, "seconds": round(elapsed, 3), "chunks_per_sec": round(num_chunks / elapsed, 1)}
+    if stub is not None:
+        result.update({
+            "bulk_requests": stub.requests.get("POST _bulk", 0),
+            "refresh_requests": stub.requests.get("POST _refresh", 0),
+            "indexed_docs": len(stub.documents),
+        })
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.01, help='Simulated stub latency per request')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--chunk-docs', type=int, default=500)
+    parser.add_argument('--external', action='store_true', help='Use the cluster in OPENSEARCH_CONFIG_PATH instead of the stub')
+    args = parser.parse_args()
+
+    stub = None
+    if not args.external:
+        stub = StubOpenSearch(latency=args.latency).start()
+        os.environ['OPENSEARCH_CONFIG_PATH'] = stub.write_config()
+
+    from common import FakeEmbeddings, synthetic_pages
+    from libs.opensearch import OpenSearchClient, get_bulk_config
+    import process
+
+    embed_model = FakeEmbeddings()
+    pages = synthetic_pages(args.pages)
+
+    def baseline():
+        client = OpenSearchClient('docs-bench', embed_model.size)
+        return process.split_pages(iter(pages), client.get_vector_store(embed_model))
+
+    def bulk(workers):
+        def ingest():
+            client = OpenSearchClient('docs-bench', embed_model.size)
+            writer = client.get_bulk_writer(embed_model)
+            writer.bulk_config = {**get_bulk_config(client.config), "workers": workers, "chunk_docs": args.chunk_docs}
+            with client.bulk_ingest():
+                num_chunks = process.split_pages(iter(pages), writer)
+            return num_chunks
+        return ingest
+
+    results = [run("langchain add_documents", stub, 'docs-bench', baseline)]
+    for workers in args.workers:
+        results.append(run(f"bulk workers={workers}", stub, 'docs-bench', bulk(workers)))
+    if stub is not None:
+        stub.stop()
+        os.remove(os.environ['OPENSEARCH_CONFIG_PATH'])
+    print(json.dumps({"pages": args.pages, "latency": args.latency, "chunk_docs": args.chunk_docs, "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Chroma search latency while the collection is being ingested into.
+
+Seeds a throwaway Chroma path with one synthetic PDF, then keeps `--readers`
+threads running RetrievalEngine searches (every query distinct, so none is
+served from the result cache) through three phases:
+
+- idle: nothing is written.
+- engine: a second PDF is ingested as a job. process.py parses and embeds
+  it in its subprocess, and the backend's ChromaEngine applies the writes,
+  which is how the backend ingests now.
+- direct: a third PDF is ingested by process.py run on its own, writing to
+  the same path through its own client, which is what every job did before.
+
+For each phase, reports search latency percentiles, failed searches and the
+first error of each kind. It also reports how many chunks the backend's open
+collection holds once the ingest is done, against a fresh client reading the
+path, which shows whether the writes were visible to the backend.
+
+    python py-backend/benchmarks/chroma_concurrency_bench.py --pages 30 --readers 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import APP_DIR, synthetic_pages, write_synthetic_pdf
+
+MODEL, REGION, STORE = "fake:256", "us-east-1", "Chroma"
+COUNT_SCRIPT = "import chromadb, sys; print(chromadb.PersistentClient(sys.argv[1]).get_collection(sys.argv[2]).count())"
+
+def percentile(samples, q):
+    return round(sorted(samples)[min(len(samples) - 1, int(q * len(samples)))], 1) if samples else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=30, help='Pages per synthetic PDF')
+    parser.add_argument('--readers', type=int, default=2, help='Threads searching concurrently')
+    parser.add_argument('--idle-seconds', type=float, default=3.0)
+    parser.add_argument('--write-batch', type=int, default=None, help='Records per Chroma call (CHROMA_WRITE_BATCH)')
+    args = parser.parse_args()
+    if args.write_batch:
+        os.environ['CHROMA_WRITE_BATCH'] = str(args.write_batch)
+
+    workdir = tempfile.TemporaryDirectory(prefix='chroma-concurrency-bench-')
+    # Manifests and the job queue go to ./vectordb; the engine and process.py both read CHROMA_PATH
+    os.chdir(workdir.name)
+    chroma_path = os.environ['CHROMA_PATH'] = os.path.join(workdir.name, 'vectordb', 'chroma')
+
+    from jobs import JobStore, JobManager
+    from libs.chroma_engine import get_engine
+    from libs.embedding_providers import get_index_name
+    import retriever
+
+    def write_pdf(name, seed):
+        path = os.path.join(workdir.name, name)
+        write_synthetic_pdf(path, [page.page_content for page in synthetic_pages(args.pages, source=name, seed=seed)])
+        return path
+
+    manager = JobManager(JobStore(os.path.join(workdir.name, 'vectordb', 'jobs.sqlite3')), workers=1)
+    manager.start()
+
+    def ingest_job(path):
+        job = manager.submit([path], MODEL, REGION, STORE)
+        while manager.store.get(job['id'])['status'] in ('queued', 'running'):
+            time.sleep(0.05)
+        job = manager.store.get(job['id'])
+        if job['status'] != 'succeeded':
+            raise RuntimeError(f"Ingest job failed: {job['error']}")
+
+    def ingest_direct(path):
+        env = {k: v for k, v in os.environ.items() if k != 'INGEST_CHROMA_PIPE'}
+        subprocess.run([sys.executable, os.path.join(APP_DIR, 'process.py'), MODEL, REGION, STORE, path], check=True, capture_output=True, env=env)
+
+    ingest_job(write_pdf('seed.pdf', 0))
+    index_name = get_index_name(MODEL, STORE)
+    settings = json.dumps({"embRegion": REGION, "embeddingModel": MODEL, "vectorStore": STORE})
+    engine = retriever.RetrievalEngine()
+    # The first search opens the collection and loads its index into memory
+    engine.search("warm-up", "RAG", settings, "")
+
+    phases = [
+        ("idle", lambda: time.sleep(args.idle_seconds)),
+        ("engine", lambda: ingest_job(write_pdf('engine.pdf', 1))),
+        ("direct", lambda: ingest_direct(write_pdf('direct.pdf', 2))),
+    ]
+    results = []
+    for label, phase in phases:
+        stop = threading.Event()
+        outcomes, errors = [], {}
+
+        def search(reader):
+            count = 0
+            while not stop.is_set():
+                count += 1
+                started = time.perf_counter()
+                try:
+                    engine.search(f"{label} reader {reader} query {count}", "RAG", settings, "")
+                    outcomes.append((True, (time.perf_counter() - started) * 1000))
+                except Exception as e:
+                    outcomes.append((False, (time.perf_counter() - started) * 1000))
+                    errors.setdefault(type(e).__name__, str(e)[:200])
+
+        readers = [threading.Thread(target=search, args=(i,)) for i in range(args.readers)]
+        for reader in readers:
+            reader.start()
+        started = time.perf_counter()
+        phase()
+        seconds = time.perf_counter() - started
+        stop.set()
+        for reader in readers:
+            reader.join()
+
+        latencies = [ms for ok, ms in outcomes if ok]
+        collection = get_engine().collection(index_name)
+        on_disk = subprocess.run([sys.executable, "-c", COUNT_SCRIPT, chroma_path, index_name], capture_output=True, text=True)
+        results.append({
+            "phase": label,
+            "seconds": round(seconds, 2),
+            "searches": len(outcomes),
+            "failed": sum(not ok for ok, _ in outcomes),
+            "errors": errors,
+            "p50_ms": percentile(latencies, 0.5),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "max_ms": round(max(latencies), 1) if latencies else None,
+            "chunks_seen_by_backend": collection.count() if collection else None,
+            "chunks_on_disk": int(on_disk.stdout) if on_disk.returncode == 0 else on_disk.stderr.strip().splitlines()[-1:],
+        })
+    manager.stop()
+    print(json.dumps({"pages": args.pages, "readers": args.readers, "write_batch": get_engine().write_batch, "engine": get_engine().stats(), "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
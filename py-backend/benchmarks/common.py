@@ -0,0 +1,131 @@
+"""Shared helpers for the offline benchmarks: fake embeddings and synthetic corpora."""
+import hashlib
+import os
+import random
+import sys
+import threading
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from libs.embedding_providers import DeterministicFakeEmbeddings
+
+WORDS = (
+    "bedrock opensearch chroma vector index embedding retrieval parent child chunk document page "
+    "latency throughput cluster shard replica query rerank model region search settings upload "
+    "ingest pipeline batch stream memory cache token prompt context answer source manual guide"
+).split()
+
+class FakeEmbeddings(DeterministicFakeEmbeddings):
+    """The backend's deterministic fake embeddings with simulated Bedrock call latency.
+
+    Mimics BedrockEmbeddings: one remote call per text, each taking
+    `call_latency` seconds. `throttle_rate` makes a fraction of calls raise
+    a ThrottlingException-style error so retry paths can be exercised.
+    """
+
+    batches_queries = False
+
+    def __init__(self, size: int = 1024, call_latency: float = 0.0, throttle_rate: float = 0.0) -> None:
+        super().__init__(size)
+        self.call_latency = call_latency
+        self.throttle_rate = throttle_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> List[float]:
+        with self._lock:
+            self.calls += 1
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            raise ValueError("Error raised by inference endpoint: ThrottlingException: Too many requests")
+        if self.call_latency:
+            time.sleep(self.call_latency)
+        return super()._embed(text)
+
+class HashingEmbeddings(Embeddings):
+    """Bag-of-words embeddings built from hashed token counts.
+
+    Unlike FakeEmbeddings, texts that share words end up close together, so
+    retrieval quality (recall@k) can be compared offline without Bedrock.
+    """
+
+    def __init__(self, size: int = 1024, noise: float = 0.0) -> None:
+        self.size = size
+        self.noise = noise
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size)
+        for token in text.lower().split():
+            digest = hashlib.sha256(token.strip(".,").encode()).digest()
+            vector[int.from_bytes(digest[:4], 'little') % self.size] += 1.0 if digest[4] & 1 else -1.0
+        if self.noise:
+            seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], 'little')
+            vector += np.random.default_rng(seed).standard_normal(self.size) * self.noise
+        return (vector / max(np.linalg.norm(vector), 1e-12)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+def synthetic_text(rng: random.Random, words: int) -> str:
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 20))
+        sentences.append(" ".join(rng.choice(WORDS) for _ in range(length)).capitalize() + ".")
+        words -= length
+    paragraphs = [" ".join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)]
+    return "\n\n".join(paragraphs)
+
+def synthetic_pages(num_pages: int, words_per_page: int = 450, source: str = "synthetic.pdf", seed: int = 0) -> List[Document]:
+    rng = random.Random(seed)
+    return [
+        Document(page_content=synthetic_text(rng, words_per_page), metadata={"source": source, "page": page})
+        for page in range(num_pages)
+    ]
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_synthetic_pdf(path: str, pages: List[str], line_width: int = 90) -> None:
+    """Write a minimal text-only PDF with one page per string, readable by PyPDFLoader."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for text in pages:
+        lines = []
+        for paragraph in text.split("\n\n"):
+            words, line = paragraph.split(), ""
+            for word in words:
+                if len(line) + len(word) + 1 > line_width:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = f"{line} {word}".strip()
+            lines.extend([line, ""])
+        body = "BT /F1 9 Tf 11 TL 36 800 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(body.encode())} >>\nstream\n{body}\nendstream")
+        content_ref = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {content_ref} 0 R >>")
+        page_refs.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1", "replace")
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(output)
@@ -0,0 +1,155 @@
+"""Footprint, latency and recall of compact indexes, vector quantization and fetch_k.
+
+Three offline measurements on one synthetic corpus:
+
+1. Ingest into Chroma twice, once as-is and once with COMPACT_INDEX (parents
+   stored for lookup only, not embedded). Reports texts embedded, vectors in
+   the searched collection and their float32 size, on-disk size and ingest
+   time, then recall@k, MRR and latency of the labeled queries on each.
+   On small corpora disk size is dominated by Chroma's own write-ahead
+   queue and per-collection files, so it need not shrink.
+2. Encode the child vectors as float32, fp16, int8 (per-dimension scalar
+   quantization, as Lucene's sq encoder does) and PQ (`--pq-m` subspaces of
+   256 centroids, as faiss' pq encoder does). Reports bytes per vector and
+   how much of the exact top-k / top-fetch_k neighbor lists each encoding
+   keeps for the labeled queries. This stands in for OpenSearch's encoders,
+   which cannot run here; HNSW graph memory comes on top of every encoding.
+3. Sweep fetch_k over the as-is store, reporting recall@k, MRR and latency.
+
+    python py-backend/benchmarks/compact_index_bench.py --files 2 --pages-per-file 50 --fetch-k 10 20 40 80
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from common import HashingEmbeddings
+from suite import write_corpus, run_queries
+
+from langchain_community.vectorstores import Chroma
+from libs.embeddings import ConcurrentEmbeddings
+import process
+import search
+
+def directory_mb(path):
+    total = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return round(total / 1024 / 1024, 2)
+
+def ingest(paths, workdir, embed_model, compact):
+    process.COMPACT_INDEX = compact
+    persist_directory = os.path.join(workdir, 'compact' if compact else 'full')
+    ingest_model = ConcurrentEmbeddings(embed_model, batch_size=process.EMBED_BATCH_SIZE, max_concurrency=process.EMBED_CONCURRENCY)
+    vector_store = Chroma(collection_name='bench', embedding_function=ingest_model, persist_directory=persist_directory)
+    start = time.perf_counter()
+    # Keep stdout for the report; ingestion prints PROGRESS lines for the job runner
+    with contextlib.redirect_stdout(sys.stderr):
+        num_chunks = process.process_documents(paths, vector_store)
+    elapsed = time.perf_counter() - start
+    ingest_model.close()
+    searched_vectors = vector_store._collection.count()
+    return vector_store, {
+        "compact": compact,
+        "chunks": num_chunks,
+        "texts_embedded": ingest_model.embedded,
+        "searched_vectors": searched_vectors,
+        "vector_mb": round(searched_vectors * len(embed_model.embed_query("probe")) * 4 / 1024 / 1024, 2),
+        "seconds": round(elapsed, 3),
+        "disk_mb": directory_mb(persist_directory),
+    }
+
+def kmeans(points, clusters, iterations, rng):
+    centroids = points[rng.choice(len(points), clusters, replace=len(points) < clusters)]
+    for _ in range(iterations):
+        distances = (points ** 2).sum(1)[:, None] - 2 * points @ centroids.T + (centroids ** 2).sum(1)[None, :]
+        assignment = distances.argmin(1)
+        for cluster in range(clusters):
+            members = points[assignment == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(0)
+    return centroids
+
+def encode(vectors, encoding, pq_m, rng):
+    """Returns the vectors as the index would score them, and the bytes stored per vector."""
+    dimension = vectors.shape[1]
+    if encoding == "float32":
+        return vectors, dimension * 4
+    if encoding == "fp16":
+        return vectors.astype(np.float16).astype(np.float32), dimension * 2
+    if encoding == "int8":
+        low, high = vectors.min(0), vectors.max(0)
+        scale = np.maximum(high - low, 1e-12) / 255
+        codes = np.round((vectors - low) / scale)
+        return codes * scale + low, dimension
+    # PQ: one byte per subspace, each naming one of 256 centroids
+    decoded = np.empty_like(vectors)
+    for columns in np.array_split(np.arange(dimension), pq_m):
+        sub = vectors[:, columns]
+        centroids = kmeans(sub.copy(), 256, 8, rng)
+        distances = (sub ** 2).sum(1)[:, None] - 2 * sub @ centroids.T + (centroids ** 2).sum(1)[None, :]
+        decoded[:, columns] = centroids[distances.argmin(1)]
+    return decoded, pq_m
+
+def quantization_tradeoffs(vector_store, labeled, embed_model, fetch_k, pq_m, seed):
+    children = vector_store._collection.get(where={"doc_level": "child"}, include=['embeddings'])
+    vectors = np.asarray(children['embeddings'], dtype=np.float32)
+    queries = np.asarray([embed_model.embed_query(item["query"]) for item in labeled], dtype=np.float32)
+
+    def top(candidates, n):
+        # Same l2 ranking the index uses
+        distances = (candidates ** 2).sum(1)[None, :] - 2 * queries @ candidates.T
+        return np.argsort(distances, axis=1)[:, :n]
+
+    exact_k, exact_fetch = top(vectors, search.SEARCH_K), top(vectors, fetch_k)
+    rng = np.random.default_rng(seed)
+    results = []
+    for encoding in ("float32", "fp16", "int8", "pq"):
+        decoded, bytes_per_vector = encode(vectors, encoding, pq_m, rng)
+        found_k, found_fetch = top(decoded, search.SEARCH_K), top(decoded, fetch_k)
+        results.append({
+            "encoding": encoding,
+            "bytes_per_vector": bytes_per_vector,
+            "vector_mb": round(bytes_per_vector * len(vectors) / 1024 / 1024, 3),
+            "neighbor_recall_at_k": round(float(np.mean([len(set(a) & set(b)) / search.SEARCH_K for a, b in zip(found_k, exact_k)])), 3),
+            "neighbor_recall_at_fetch_k": round(float(np.mean([len(set(a) & set(b)) / fetch_k for a, b in zip(found_fetch, exact_fetch)])), 3),
+        })
+    return {"vectors": len(vectors), "dimension": vectors.shape[1], "fetch_k": fetch_k, "results": results}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=2)
+    parser.add_argument('--pages-per-file', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=40)
+    parser.add_argument('--passes', type=int, default=2, help='Times the query set is run per fetch_k')
+    parser.add_argument('--noise', type=float, default=0.02, help='Gaussian noise added to hashing embeddings')
+    parser.add_argument('--mode', default='mmr', choices=search.SEARCH_MODES)
+    parser.add_argument('--fetch-k', type=int, nargs='+', default=[10, 20, 40, 80])
+    parser.add_argument('--pq-m', type=int, default=64, help='PQ subspaces, i.e. bytes per vector')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    embed_model = HashingEmbeddings(noise=args.noise)
+    with tempfile.TemporaryDirectory(prefix='compact-bench-') as workdir:
+        paths, labeled = write_corpus(workdir, args.files, args.pages_per_file, args.queries, args.seed)
+        full_store, full = ingest(paths, workdir, embed_model, compact=False)
+        compact_store, compact = ingest(paths, workdir, embed_model, compact=True)
+        for store, report in ((full_store, full), (compact_store, compact)):
+            result = run_queries(args.mode, labeled, store, embed_model, "cohere", args.passes)
+            report.update({key: result[key] for key in ("recall_at_k", "mrr", "p50_ms", "p95_ms")})
+
+        quantization = quantization_tradeoffs(full_store, labeled, embed_model, search.SEARCH_FETCH_K, args.pq_m, args.seed)
+
+        sweep = []
+        for fetch_k in args.fetch_k:
+            search.SEARCH_FETCH_K = fetch_k
+            result = run_queries(args.mode, labeled, full_store, embed_model, "cohere", args.passes)
+            sweep.append({"fetch_k": fetch_k, **{key: result[key] for key in ("recall_at_k", "mrr", "p50_ms", "p95_ms")}})
+
+    print(json.dumps({"pages": args.files * args.pages_per_file, "queries": len(labeled), "ingest": [full, compact], "quantization": quantization, "fetch_k": sweep}, indent=2))
+
+if __name__ == '__main__':
+    main()
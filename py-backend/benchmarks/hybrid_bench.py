@@ -0,0 +1,72 @@
+"""Latency and recall@k benchmark: pure MMR vs. hybrid (BM25 + k-NN) retrieval.
+
+Builds a synthetic corpus where a few pages carry a rare marker term plus
+a short description, indexes it into a throwaway Chroma store through the
+real split_pages code, then runs one labeled query per marked page through
+get_similar_documents_by_RAG in every search mode. A query counts as a hit
+when its labeled page is among the returned parent documents.
+
+Chroma has no inverted index, so "hybrid" here is BM25 re-scoring of the
+k-NN candidate pool fused with RRF; against OpenSearch the fusion happens
+server-side and recall can only improve further.
+
+    python py-backend/benchmarks/hybrid_bench.py --pages 200 --queries 40
+"""
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+
+from common import HashingEmbeddings, synthetic_pages, WORDS
+
+from langchain_community.vectorstores import Chroma
+import process
+import search
+
+def build_corpus(num_pages, num_queries, seed):
+    rng = random.Random(seed)
+    pages = synthetic_pages(num_pages, seed=seed)
+    labeled = []
+    for page_no in rng.sample(range(num_pages), num_queries):
+        marker = f"marker{page_no:05d}"
+        topic = " ".join(rng.sample(WORDS, 3))
+        page = pages[page_no]
+        page.page_content = f"{page.page_content[:600]} The {marker} covers {topic}. {page.page_content[600:]}"
+        labeled.append({"query": f"what does {marker} say about {topic}", "page": page_no})
+    return pages, labeled
+
+def run_mode(mode, labeled, vector_store, embed_model, index_name):
+    latencies, hits = [], 0
+    for item in labeled:
+        start = time.perf_counter()
+        docs = search.get_similar_documents_by_RAG(item["query"], "Chroma", index_name, embed_model, "", vector_store=vector_store, filter={"doc_level": "child"}, search_mode=mode)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(doc["metadatas"][0]["page"] == item["page"] for doc in docs)
+    latencies.sort()
+    return {
+        "mode": mode,
+        "recall_at_k": round(hits / len(labeled), 3),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=40)
+    parser.add_argument('--noise', type=float, default=0.02, help='Gaussian noise added to embeddings, to make k-NN imperfect')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    pages, labeled = build_corpus(args.pages, args.queries, args.seed)
+    embed_model = HashingEmbeddings(noise=args.noise)
+    with tempfile.TemporaryDirectory() as persist_dir:
+        vector_store = Chroma(collection_name='bench', embedding_function=embed_model, persist_directory=persist_dir)
+        num_chunks = process.split_pages(pages, vector_store)
+        results = [run_mode(mode, labeled, vector_store, embed_model, 'bench') for mode in search.SEARCH_MODES]
+    print(json.dumps({"pages": args.pages, "chunks": num_chunks, "queries": len(labeled), "k": search.SEARCH_K, "fetch_k": search.SEARCH_FETCH_K, "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Ingestion throughput benchmark for the process.py embedding pipeline.
+
+Writes a synthetic PDF, streams it through the real process_documents code
+and indexes it into a throwaway local Chroma store using a fake embedding
+model with simulated per-call latency. Reports chunks/sec and peak RSS for
+the sequential baseline and for each (batch size, concurrency) combination
+as JSON.
+
+    python py-backend/benchmarks/ingest_bench.py --pages 50 --call-latency 0.02
+"""
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+
+from common import FakeEmbeddings, synthetic_pages, write_synthetic_pdf
+
+from langchain_community.vectorstores import Chroma
+from libs.embeddings import ConcurrentEmbeddings
+import process
+
+def peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def run_once(pdf_path, embed_model, label):
+    with tempfile.TemporaryDirectory() as persist_dir:
+        vector_store = Chroma(collection_name='bench', embedding_function=embed_model, persist_directory=persist_dir)
+        start = time.perf_counter()
+        num_chunks = process.process_documents([pdf_path], vector_store)
+        elapsed = time.perf_counter() - start
+    return {"config": label, "chunks": num_chunks, "seconds": round(elapsed, 3), "chunks_per_sec": round(num_chunks / elapsed, 1), "peak_rss_mb": peak_rss_mb()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=50)
+    parser.add_argument('--call-latency', type=float, default=0.02, help='Simulated seconds per embedding call')
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[8, 32])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='ingest-bench-')
+    pdf_path = os.path.join(workdir, 'synthetic.pdf')
+    write_synthetic_pdf(pdf_path, [page.page_content for page in synthetic_pages(args.pages)])
+
+    results = [run_once(pdf_path, FakeEmbeddings(call_latency=args.call_latency), "sequential")]
+    for batch_size in args.batch_sizes:
+        for concurrency in args.concurrency:
+            fake = FakeEmbeddings(call_latency=args.call_latency, throttle_rate=args.throttle_rate)
+            embed_model = ConcurrentEmbeddings(fake, batch_size=batch_size, max_concurrency=concurrency, base_delay=0.01)
+            result = run_once(pdf_path, embed_model, f"batch={batch_size},concurrency={concurrency}")
+            result["throttled_retries"] = embed_model.throttled
+            embed_model.close()
+            results.append(result)
+    os.remove(pdf_path)
+    os.rmdir(workdir)
+    print(json.dumps({"pages": args.pages, "call_latency": args.call_latency, "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
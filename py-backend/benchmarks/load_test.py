@@ -0,0 +1,167 @@
+"""Concurrent mixed-traffic load test for the FastAPI backend.
+
+Fires /search, /websearch and /upload requests from a pool of client threads
+and reports p50/p99 latency per endpoint as JSON.
+
+Against a running server:
+    python py-backend/benchmarks/load_test.py --url http://localhost:8000 --search-settings '{...}'
+
+Self-contained before/after comparison (no AWS needed): starts the app
+in-process with slow fake search/websearch backends and measures the old
+model (blocking call inside the event loop) against the bounded pool offload.
+    python py-backend/benchmarks/load_test.py --simulate --backend-latency 0.2
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def post_form(url, fields, timeout):
+    data = urllib.parse.urlencode(fields).encode()
+    request = urllib.request.Request(url, data=data, method='POST')
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status, response.read()
+
+def post_upload(url, payload, timeout):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="load-test.pdf"\r\n'
+        f'Content-Type: application/pdf\r\n\r\n'
+    ).encode() + payload + f'\r\n--{boundary}--\r\n'.encode()
+    request = urllib.request.Request(url, data=body, method='POST', headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status, response.read()
+
+def make_request(base_url, endpoint, args):
+    if endpoint == 'search':
+        return post_form(f'{base_url}/search', {
+            'text': random.choice(args.queries),
+            'chat_mode': 'RAG',
+            'search_settings': args.search_settings,
+            'cohere_reranker_api_key': '',
+        }, args.timeout)
+    if endpoint == 'websearch':
+        return post_form(f'{base_url}/websearch', {
+            'text': random.choice(args.queries),
+            'chat_mode': 'Web Search',
+            'tavily_search_key': args.tavily_key,
+        }, args.timeout)
+    return post_upload(f'{base_url}/upload', os.urandom(args.upload_bytes), args.timeout)
+
+def run_load(base_url, args):
+    endpoints = ['search'] * args.search_weight + ['websearch'] * args.websearch_weight + ['upload'] * args.upload_weight
+    latencies = {name: [] for name in set(endpoints)}
+    statuses = {name: {} for name in set(endpoints)}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def client():
+        while time.perf_counter() < deadline:
+            endpoint = random.choice(endpoints)
+            start = time.perf_counter()
+            try:
+                status, _ = make_request(base_url, endpoint, args)
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except Exception:
+                status = 'error'
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies[endpoint].append(elapsed)
+                statuses[endpoint][str(status)] = statuses[endpoint].get(str(status), 0) + 1
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(client)
+
+    report = {}
+    for endpoint, values in latencies.items():
+        report[endpoint] = {
+            'requests': len(values),
+            'p50_ms': round(percentile(values, 50) * 1000, 1) if values else None,
+            'p99_ms': round(percentile(values, 99) * 1000, 1) if values else None,
+            'mean_ms': round(statistics.mean(values) * 1000, 1) if values else None,
+            'statuses': statuses[endpoint],
+        }
+    return report
+
+def start_simulated_server(args, blocking):
+    sys.path.insert(0, APP_DIR)
+    import uvicorn
+    import app as app_module
+
+    def fake_search(text, chat_mode, search_settings, reranker_api):
+        time.sleep(args.backend_latency)
+        return json.dumps([{"content": text, "source": "Page 1 of simulated.pdf"}])
+
+    from stub_tavily import StubTavily
+    tavily = StubTavily(latency=args.backend_latency).start()
+
+    app_module.retrieval_engine.search = fake_search
+    app_module.web_search_client = app_module.WebSearchClient(base_url=tavily.url)
+
+    if blocking:
+        # Reproduce the old execution model: the blocking call runs inside the async handler
+        async def run_inline(func, *func_args, **func_kwargs):
+            return func(*func_args, **func_kwargs)
+        app_module.search_limiter.run = run_inline
+
+    config = uvicorn.Config(app_module.app, host='127.0.0.1', port=args.port, log_level='warning')
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--simulate', action='store_true', help='Run an in-process before/after comparison with fake backends')
+    parser.add_argument('--backend-latency', type=float, default=0.2, help='Seconds each fake search call blocks in --simulate mode')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--search-weight', type=int, default=6)
+    parser.add_argument('--websearch-weight', type=int, default=2)
+    parser.add_argument('--upload-weight', type=int, default=2)
+    parser.add_argument('--upload-bytes', type=int, default=256 * 1024)
+    parser.add_argument('--search-settings', default=json.dumps({"embeddingModel": "amazon.titan-embed-text-v2:0", "embRegion": "us-east-1", "vectorStore": "Chroma"}))
+    parser.add_argument('--tavily-key', default=os.environ.get('TAVILY_API_KEY', 'load-test'))
+    parser.add_argument('--queries', nargs='+', default=["What is Amazon Bedrock?", "How do I configure OpenSearch?", "Summarize the document"])
+    args = parser.parse_args()
+
+    if not args.simulate:
+        print(json.dumps(run_load(args.url.rstrip('/'), args), indent=2))
+        return
+
+    results = {}
+    for label, blocking in (('before_blocking', True), ('after_offload', False)):
+        server, thread = start_simulated_server(args, blocking)
+        results[label] = run_load(f'http://127.0.0.1:{args.port}', args)
+        server.should_exit = True
+        thread.join()
+        sys.modules.pop('app', None)
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
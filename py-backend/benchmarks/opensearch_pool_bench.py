@@ -0,0 +1,69 @@
+"""Connection reuse benchmark for libs/opensearch.py against a local stub server.
+
+Simulates the search path's access pattern (build an OpenSearchClient, then
+issue an mget) from many threads. Compares the shared registry with a
+baseline that resets it before every client, which is how the code behaved
+before connections were pooled. Reports TCP connections opened, index-exists
+round trips and requests/sec as JSON.
+
+    python py-backend/benchmarks/opensearch_pool_bench.py --threads 8 --requests 200
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stub_opensearch import StubOpenSearch
+
+def run(stub, opensearch, args, pooled):
+    stub.requests.clear()
+    stub.connections = 0
+    opensearch.reset_registry()
+
+    def worker(_):
+        for _ in range(args.requests):
+            if not pooled:
+                opensearch.reset_registry()
+            client = opensearch.OpenSearchClient('docs-bench')
+            client.conn.mget(index='docs-bench', body={"ids": ["a", "b", "c"]})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(worker, range(args.threads)))
+    elapsed = time.perf_counter() - start
+    total = args.threads * args.requests
+    return {
+        "requests": total,
+        "tcp_connections": stub.connections,
+        "index_exists_calls": stub.requests.get("HEAD index", 0),
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(total / elapsed, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='Requests per thread')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated server latency per request')
+    args = parser.parse_args()
+
+    stub = StubOpenSearch(latency=args.latency).start()
+    os.environ['OPENSEARCH_CONFIG_PATH'] = stub.write_config(pool_maxsize=args.threads)
+
+    import common  # noqa: F401  (puts py-backend/app on sys.path)
+    from libs import opensearch
+
+    results = {
+        "unpooled": run(stub, opensearch, args, pooled=False),
+        "pooled": run(stub, opensearch, args, pooled=True),
+    }
+    # Sanity checks on the registry contract
+    assert results["pooled"]["index_exists_calls"] <= 1
+    assert results["pooled"]["tcp_connections"] <= args.threads
+    stub.stop()
+    os.remove(os.environ['OPENSEARCH_CONFIG_PATH'])
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Parent-document cache benchmark against the local OpenSearch stub.
+
+Seeds the stub with parent documents, then replays a Zipf-skewed stream of
+parent lookups (a few hot parents, a long tail) through the real
+fetch_parent_documents path with no cache, the in-memory tier only, and
+memory plus the SQLite disk tier. Reports _mget round trips, hit rates and
+p50/p95 lookup latency as JSON.
+
+    python py-backend/benchmarks/parent_cache_bench.py --parents 2000 --lookups 2000 --latency 0.005
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from stub_opensearch import StubOpenSearch
+
+def run(label, stub, search, vector_store, lookups, parent_cache):
+    stub.requests.clear()
+    latencies = []
+    for parent_ids in lookups:
+        start = time.perf_counter()
+        search.fetch_parent_documents(parent_ids, "OpenSearch", "docs-bench", vector_store, parent_cache)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    result = {
+        "cache": label,
+        "mget_round_trips": stub.requests.get("POST _mget", 0),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+    }
+    if parent_cache is not None:
+        result["stats"] = parent_cache.stats()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--parents', type=int, default=2000)
+    parser.add_argument('--lookups', type=int, default=2000, help='Queries replayed; each fetches up to 3 parents')
+    parser.add_argument('--cache-size', type=int, default=256)
+    parser.add_argument('--zipf', type=float, default=1.2)
+    parser.add_argument('--latency', type=float, default=0.005, help='Simulated server latency per request')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    stub = StubOpenSearch(latency=args.latency).start()
+    os.environ['OPENSEARCH_CONFIG_PATH'] = stub.write_config()
+
+    from common import synthetic_text
+    import random
+    from libs.cache import ParentDocumentCache
+    from libs.opensearch import OpenSearchClient
+    import search
+
+    rng = random.Random(args.seed)
+    for i in range(args.parents):
+        stub.documents[f"parent-{i}"] = {"text": synthetic_text(rng, 300), "metadata": {"page": i, "source": "synthetic.pdf"}}
+    vector_store = OpenSearchClient('docs-bench').get_vector_store(None)
+
+    ranks = np.random.default_rng(args.seed).zipf(args.zipf, size=(args.lookups, 3)) - 1
+    lookups = [list(dict.fromkeys(f"parent-{rank % args.parents}" for rank in row)) for row in ranks]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        disk_path = os.path.join(workdir, 'parents.sqlite3')
+        results = [
+            run("none", stub, search, vector_store, lookups, None),
+            run("memory", stub, search, vector_store, lookups, ParentDocumentCache(args.cache_size)),
+            run("memory+disk (cold)", stub, search, vector_store, lookups, ParentDocumentCache(args.cache_size, disk_path)),
+            # A fresh process: empty memory tier, disk tier already populated
+            run("memory+disk (restart)", stub, search, vector_store, lookups, ParentDocumentCache(args.cache_size, disk_path)),
+        ]
+    stub.stop()
+    os.remove(os.environ['OPENSEARCH_CONFIG_PATH'])
+    print(json.dumps({"parents": args.parents, "lookups": args.lookups, "cache_size": args.cache_size, "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""PDF parse + split throughput versus the number of parse worker processes.
+
+Writes `--files` synthetic PDFs and runs them through process.py's parse and
+split stage only (no embedding or indexing): serially for 1 worker, and on
+the process pool for more. Each run's chunk ids are checked against the
+serial run, so ordering and parent_doc_id assignment must match exactly.
+Reports pages/sec and speedup per worker count as JSON.
+
+    python py-backend/benchmarks/parse_bench.py --files 16 --pages-per-file 40 --workers 1 2 4 8 16
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from common import synthetic_pages, write_synthetic_pdf
+
+import process
+
+def run_once(paths, workers):
+    start = time.perf_counter()
+    if workers > 1:
+        split = process.iter_split_files(paths, workers)
+    else:
+        split = process.iter_split_pages(process.iter_pages(paths))
+    pages, ids = 0, []
+    for _, parents in split:
+        pages += 1
+        for parent_id, _, children in parents:
+            ids.append(parent_id)
+            ids.extend(f"{child.metadata['parent_doc_id']}/{child_id}" for child_id, child in children)
+    return pages, ids, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--pages-per-file', type=int, default=40)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='parse-bench-') as workdir:
+        paths = []
+        for file_no in range(args.files):
+            path = os.path.join(workdir, f"synthetic-{file_no:03d}.pdf")
+            write_synthetic_pdf(path, [page.page_content for page in synthetic_pages(args.pages_per_file, seed=file_no)])
+            paths.append(path)
+
+        _, expected_ids, _ = run_once(paths, 1)
+        results = []
+        for workers in sorted(set(args.workers)):
+            pages, ids, elapsed = run_once(paths, workers)
+            results.append({
+                "workers": workers,
+                "pages": pages,
+                "chunks": len(ids),
+                "seconds": round(elapsed, 3),
+                "pages_per_sec": round(pages / elapsed, 1),
+                "identical_to_serial": ids == expected_ids,
+            })
+    baseline = results[0]["pages_per_sec"]
+    for result in results:
+        result["speedup"] = round(result["pages_per_sec"] / baseline, 2)
+    print(json.dumps({"files": args.files, "pages_per_file": args.pages_per_file, "cpus": os.cpu_count(), "results": results}, indent=2))
+
+if __name__ == '__main__':
+    main()
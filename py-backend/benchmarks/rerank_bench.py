@@ -0,0 +1,94 @@
+"""Offline latency/quality benchmark for the local cross-encoder reranker.
+
+Reuses the labeled synthetic corpus from hybrid_bench.py: for every query
+the top fetch_k child chunks come from a throwaway Chroma store, and each
+reranker reorders them. Reports hit@top_n (the labeled page is among the
+top_n reranked chunks), MRR and p50/p95 rerank latency. The local reranker
+is measured cold (empty score cache) and warm (same queries again).
+
+Pass --model with a local directory holding an ONNX cross-encoder export and
+tokenizer.json to score with a real model. Without it a lexical-overlap
+stand-in with a simulated per-pair cost is used, which exercises batching
+and caching but says nothing about model quality.
+
+    python py-backend/benchmarks/rerank_bench.py --model ./models/ms-marco-MiniLM-L-6-v2
+"""
+import argparse
+import json
+import statistics
+import tempfile
+import time
+
+from common import HashingEmbeddings
+from hybrid_bench import build_corpus
+
+from langchain_community.vectorstores import Chroma
+from libs.cache import TTLCache
+from libs.ranking import TOKEN_PATTERN
+from libs.local_models import OnnxCrossEncoder
+from libs.rerankers import CrossEncoderReranker, RERANK_TOP_N
+import process
+import search
+
+class LexicalStandIn:
+    def __init__(self, pair_latency: float) -> None:
+        self.pair_latency = pair_latency
+
+    def predict(self, pairs, batch_size=16):
+        time.sleep(self.pair_latency * len(pairs))
+        return [len(set(TOKEN_PATTERN.findall(q.lower())) & set(TOKEN_PATTERN.findall(d.lower()))) for q, d in pairs]
+
+class NoReranker:
+    def rerank(self, query, documents):
+        return documents[:RERANK_TOP_N]
+
+def run(label, reranker, candidates, labeled):
+    latencies, hits, reciprocal_ranks = [], 0, []
+    for item, docs in zip(labeled, candidates):
+        start = time.perf_counter()
+        ranked = reranker.rerank(item["query"], docs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        pages = [doc.metadata["page"] for doc in ranked]
+        hits += item["page"] in pages
+        reciprocal_ranks.append(1 / (pages.index(item["page"]) + 1) if item["page"] in pages else 0.0)
+    latencies.sort()
+    return {
+        "reranker": label,
+        "hit_at_top_n": round(hits / len(labeled), 3),
+        "mrr": round(statistics.mean(reciprocal_ranks), 3),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=100)
+    parser.add_argument('--queries', type=int, default=30)
+    parser.add_argument('--model', help='Local ONNX cross-encoder directory')
+    parser.add_argument('--pair-latency', type=float, default=0.001, help='Simulated seconds per pair for the stand-in scorer')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    pages, labeled = build_corpus(args.pages, args.queries, args.seed)
+    embed_model = HashingEmbeddings(noise=0.02)
+    with tempfile.TemporaryDirectory() as persist_dir:
+        vector_store = Chroma(collection_name='bench', embedding_function=embed_model, persist_directory=persist_dir)
+        process.split_pages(pages, vector_store)
+        candidates = [vector_store.similarity_search(item["query"], k=search.SEARCH_FETCH_K, filter={"doc_level": "child"}) for item in labeled]
+
+    model = OnnxCrossEncoder(args.model) if args.model else LexicalStandIn(args.pair_latency)
+    local = CrossEncoderReranker(model_name=args.model or 'stand-in', batch_size=args.batch_size, model=model, cache=TTLCache(100000))
+    results = [
+        run("none", NoReranker(), candidates, labeled),
+        run("local-cold", local, candidates, labeled),
+        run("local-warm", local, candidates, labeled),
+    ]
+    print(json.dumps({
+        "scorer": "onnx" if args.model else "lexical-stand-in",
+        "queries": len(labeled), "candidates": search.SEARCH_FETCH_K, "top_n": RERANK_TOP_N,
+        "score_cache": local.cache.stats(), "results": results,
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Backend cold start: how long `import app` takes, and what it spends it on.
+
+Each run is a fresh interpreter, so nothing is cached in sys.modules. The
+"lazy" case imports the backend as it ships; the "eager" case first imports
+the libraries the backend now loads on first use (chromadb, opensearch-py,
+langchain's vector stores and langchain_cohere), which is what every start
+paid before. Reports the median and spread of wall time per case, the time
+to the first /stats response, the slowest modules under `-X importtime`, and
+what each deferred import costs the first request that needs it.
+
+    python py-backend/benchmarks/startup_bench.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from common import APP_DIR
+
+EAGER_IMPORTS = "import chromadb, opensearchpy, langchain_cohere; from langchain_community.vectorstores import Chroma, OpenSearchVectorSearch; "
+DEFERRED_IMPORTS = {
+    "chroma": "from langchain_community.vectorstores import Chroma",
+    "opensearch": "import opensearchpy; from langchain_community.vectorstores import OpenSearchVectorSearch",
+    "cohere_rerank": "from langchain_cohere import CohereRerank",
+}
+TIMED = "import time; started = time.perf_counter(); {setup}import app; imported = time.perf_counter(); {after}"
+FIRST_REQUEST = (
+    "from fastapi.testclient import TestClient; "
+    "assert TestClient(app.app).get('/stats').status_code == 200; "
+    "print(round((imported - started) * 1000, 1), round((time.perf_counter() - started) * 1000, 1))"
+)
+DEFERRED = "started = time.perf_counter(); {statement}; print(round((time.perf_counter() - started) * 1000, 1))"
+
+def python(code, workdir, *flags):
+    # Run from a scratch directory so the backend's ./vectordb files land there
+    result = subprocess.run([sys.executable, *flags, "-c", code], cwd=workdir, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": APP_DIR})
+    if result.returncode:
+        raise RuntimeError(result.stderr[-2000:])
+    return result
+
+def summarize(samples):
+    return {"median": round(statistics.median(samples), 1), "min": min(samples), "max": max(samples)}
+
+def import_profile(workdir, top):
+    # -X importtime prints "self | cumulative | module" in microseconds on stderr
+    rows = []
+    for line in python("import app", workdir, "-X", "importtime").stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), module.rstrip()))
+    # Only modules imported directly by app, so nested imports aren't counted twice
+    direct = [(cumulative, module.strip()) for cumulative, module in rows if module.startswith("   ") and not module.startswith("    ")]
+    return [{"module": module, "ms": round(cumulative / 1000, 1)} for cumulative, module in sorted(direct, reverse=True)[:top]]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=6, help='Slowest modules imported by app to list')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='startup-bench-') as workdir:
+        # Warm the OS page cache and bytecode so every run measures imports, not disk
+        python(TIMED.format(setup=EAGER_IMPORTS, after=FIRST_REQUEST), workdir)
+        cases = {}
+        for label, setup in (("lazy", ""), ("eager", EAGER_IMPORTS)):
+            imports, first_requests = [], []
+            for _ in range(args.runs):
+                imported, first_request = map(float, python(TIMED.format(setup=setup, after=FIRST_REQUEST), workdir).stdout.split())
+                imports.append(imported)
+                first_requests.append(first_request)
+            cases[label] = {"import_ms": summarize(imports), "first_response_ms": summarize(first_requests)}
+        deferred = {
+            name: summarize([float(python(TIMED.format(setup="", after=DEFERRED.format(statement=statement)), workdir).stdout) for _ in range(args.runs)])
+            for name, statement in DEFERRED_IMPORTS.items()
+        }
+        profile = import_profile(workdir, args.top)
+
+    saved = cases["eager"]["import_ms"]["median"] - cases["lazy"]["import_ms"]["median"]
+    print(json.dumps({"runs": args.runs, "cases": cases, "saved_ms": round(saved, 1), "deferred_first_use_ms": deferred, "slowest_app_imports": profile}, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+"""Minimal in-process OpenSearch HTTP stub for offline benchmarks.
+
+Answers the handful of REST calls the backend makes (index exists/create/
+delete, aliases, settings, mget, bulk, search) and counts requests and TCP
+connections so connection reuse can be measured without a real cluster.
+
+By default every index exists and they all share `documents`. With
+`track_indexes`, indexes, aliases and each index's documents are tracked
+separately, and requests to a missing index fail with 404 as on a cluster.
+"""
+import fnmatch
+import json
+import tempfile
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubOpenSearch:
+    def __init__(self, latency: float = 0.0, track_indexes: bool = False) -> None:
+        self.latency = latency
+        self.track_indexes = track_indexes
+        # index name -> aliases pointing at it, and its documents when tracking indexes
+        self.indices = {}
+        self.index_documents = {}
+        self.requests = Counter()
+        self.connections = 0
+        self.documents = {}
+        self.settings = {}
+        self.pipelines = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, status, body=None):
+                payload = json.dumps(body if body is not None else {}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(payload)
+
+            def _body(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                return self.rfile.read(length) if length else b''
+
+            def _handle(self):
+                body = self._body()
+                path = self.path.split('?')[0]
+                with stub._lock:
+                    stub.requests[f"{self.command} {path.rsplit('/', 1)[-1] if '/_' in path else 'index'}"] += 1
+                if stub.latency:
+                    threading.Event().wait(stub.latency)
+                if path == '/_aliases':
+                    for action in json.loads(body or b'{}').get('actions', []):
+                        (kind, spec), = action.items()
+                        if kind == 'add':
+                            stub.indices.setdefault(spec['index'], set()).add(spec['alias'])
+                        elif kind == 'remove':
+                            stub.indices.get(spec['index'], set()).discard(spec['alias'])
+                        elif kind == 'remove_index':
+                            stub.indices.pop(spec['index'], None)
+                            stub.index_documents.pop(spec['index'], None)
+                    return self._respond(200, {"acknowledged": True})
+                if '/_alias' in path:
+                    index_pattern, _, name = path.strip('/').partition('_alias')
+                    index_pattern, name = index_pattern.strip('/') or '*', name.strip('/')
+                    found = {
+                        index: {"aliases": {alias: {} for alias in aliases if not name or alias == name}}
+                        for index, aliases in stub.indices.items()
+                        if fnmatch.fnmatch(index, index_pattern) and (not name or name in aliases)
+                    }
+                    return self._respond(200 if found or not name else 404, found)
+                index = path.strip('/').split('/')[0]
+                if stub.track_indexes and index and not index.startswith('_'):
+                    if '/' not in path.strip('/'):
+                        if self.command == 'PUT':
+                            stub.indices[index] = set()
+                            stub.index_documents[index] = {}
+                            return self._respond(200, {"acknowledged": True})
+                        if self.command == 'DELETE':
+                            found = stub.indices.pop(index, None) is not None
+                            stub.index_documents.pop(index, None)
+                            return self._respond(200 if found else 404, {"acknowledged": found})
+                    if not stub.resolve(index):
+                        return self._respond(404, {"error": {"type": "index_not_found_exception", "index": index}, "status": 404})
+                if path.endswith('/_mapping'):
+                    return self._respond(200, {name: {"mappings": {}} for name in stub.resolve(index) or [index]})
+                if path.endswith('/_mget'):
+                    documents = stub.documents_of(index)
+                    ids = json.loads(body or b'{}').get('ids', [])
+                    docs = [{"_id": _id, "found": _id in documents, "_source": documents.get(_id, {})} for _id in ids]
+                    return self._respond(200, {"docs": docs})
+                if path.endswith('/_bulk'):
+                    lines = iter(json.loads(line) for line in body.splitlines() if line.strip())
+                    items = []
+                    for action in lines:
+                        if 'delete' in action:
+                            existed = stub.documents_of(action['delete'].get('_index', index)).pop(action['delete'].get('_id'), None) is not None
+                            items.append({"delete": {"_id": action['delete'].get('_id'), "status": 200 if existed else 404}})
+                            continue
+                        meta = action.get('index') or action.get('create') or {}
+                        stub.documents_of(meta.get('_index', index))[meta.get('_id')] = next(lines)
+                        items.append({"index": {"_id": meta.get('_id'), "status": 201}})
+                    return self._respond(200, {"took": 1, "errors": False, "items": items})
+                if path.startswith('/_ingest/pipeline/'):
+                    name = path.rsplit('/', 1)[-1]
+                    if self.command == 'PUT':
+                        stub.pipelines[name] = json.loads(body or b'{}')
+                        return self._respond(200, {"acknowledged": True})
+                    if name not in stub.pipelines:
+                        return self._respond(404, {})
+                    return self._respond(200, {name: stub.pipelines[name]})
+                if '/_settings' in path:
+                    if self.command == 'PUT':
+                        stub.settings.update(json.loads(body or b'{}').get('index', {}))
+                        return self._respond(200, {"acknowledged": True})
+                    index = path.strip('/').split('/')[0]
+                    current = {key: value for key, value in stub.settings.items() if value is not None}
+                    return self._respond(200, {index: {"settings": {"index": current}}})
+                if path.endswith('/_search'):
+                    # No scoring: return stored child chunks in insertion order, enough to exercise result handling
+                    size = json.loads(body or b'{}').get('size', 10)
+                    hits = [
+                        {"_id": _id, "_score": 1.0, "_source": source}
+                        for _id, source in stub.documents_of(index).items()
+                        if source.get('metadata', {}).get('doc_level') == 'child'
+                    ][:size]
+                    return self._respond(200, {"hits": {"total": {"value": len(hits)}, "hits": hits}})
+                return self._respond(200, {"acknowledged": True})
+
+            do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _handle
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def resolve(self, name: str) -> list:
+        """Indexes a name refers to: itself if it is an index, else those it is an alias for."""
+        if name in self.indices:
+            return [name]
+        return [index for index, aliases in self.indices.items() if name in aliases]
+
+    def documents_of(self, name: str) -> dict:
+        if not self.track_indexes:
+            return self.documents
+        indexes = self.resolve(name)
+        if not indexes:
+            # Bulk writes create a missing index, as with dynamic index creation on a cluster
+            self.indices[name] = set()
+            indexes = [name]
+        return self.index_documents.setdefault(indexes[0], {})
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "StubOpenSearch":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+
+    def write_config(self, pool_maxsize: int = 32) -> str:
+        config = tempfile.NamedTemporaryFile('w', suffix='.yml', delete=False)
+        json.dump({
+            "opensearch-auth": {"domain_endpoint": self.endpoint, "user_id": "bench", "user_password": "bench"},
+            "opensearch-pool": {"pool_maxsize": pool_maxsize},
+            "settings": {"index.knn": True},
+            "mappings-rag": {"properties": {"text": {"type": "text"}}},
+        }, config)
+        config.close()
+        return config.name
@@ -0,0 +1,69 @@
+"""Minimal in-process Tavily search API stub for offline benchmarks.
+
+Answers POST /search with deterministic results after `latency` seconds and
+counts requests and TCP connections, so caching, coalescing and connection
+reuse in the web search client can be measured without network access.
+"""
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubTavily:
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        self.requests = Counter()
+        self.connections = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                params = json.loads(self.rfile.read(length) or b'{}')
+                if self.path != '/search':
+                    return self._respond(404, {"detail": "Not Found"})
+                if not params.get('api_key'):
+                    return self._respond(401, {"detail": "Unauthorized: missing or invalid API key."})
+                with stub._lock:
+                    stub.requests[params.get('query', '')] += 1
+                if stub.latency:
+                    threading.Event().wait(stub.latency)
+                query = params.get('query', '')
+                results = [
+                    {"title": f"Result {rank} for {query}", "url": f"https://example.com/{rank}?q={query}", "content": f"Stub content {rank} about {query}.", "score": round(1 - rank / 10, 2)}
+                    for rank in range(params.get('max_results', 5))
+                ]
+                self._respond(200, {"query": query, "results": results, "response_time": stub.latency})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> 'StubTavily':
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
@@ -0,0 +1,205 @@
+"""End-to-end offline benchmark: ingest a synthetic PDF corpus, then query it.
+
+Writes `--files` synthetic PDFs, ingests them through the real
+process_documents code into a throwaway Chroma store, then runs a labeled
+query set through get_similar_documents_by_RAG in each search mode. Every
+labeled query targets one page carrying a unique marker term; a query is a
+hit when that page is among the returned parents.
+
+Reports ingestion chunks/sec and pages/sec, peak RSS, query p50/p95/p99,
+recall@k and MRR, plus per-stage time from the backend's span histograms,
+as JSON. Chunk sizes, k/fetch_k and the reranker can be overridden so a
+change can be measured before it ships. With `--baseline`, metrics are
+compared against an earlier run and the exit code is 1 when any of them
+got worse by more than `--tolerance`.
+
+    python py-backend/benchmarks/suite.py --files 4 --pages-per-file 50 --output run.json
+    python py-backend/benchmarks/suite.py --child-chunk-size 300 --baseline run.json
+
+The default "hashing" embedding model keeps similar texts close without any
+network access; any backend embedding id (e.g. "local:<path>", "fake:256")
+is accepted too.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from common import HashingEmbeddings, write_synthetic_pdf
+from hybrid_bench import build_corpus
+from ingest_bench import peak_rss_mb
+
+from langchain_community.vectorstores import Chroma
+from libs.embeddings import ConcurrentEmbeddings
+from libs.embedding_providers import create_embeddings
+from libs.metrics import STAGE_SECONDS
+import process
+import search
+
+HIGHER_IS_BETTER = ("chunks_per_sec", "pages_per_sec", "recall_at_k", "mrr")
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+
+def write_corpus(workdir, num_files, pages_per_file, num_queries, seed):
+    # Label one page per query across the whole corpus, then cut it into files
+    pages, labeled = build_corpus(num_files * pages_per_file, num_queries, seed)
+    paths = []
+    for file_no in range(num_files):
+        path = os.path.join(workdir, f"synthetic-{file_no:03d}.pdf")
+        write_synthetic_pdf(path, [page.page_content for page in pages[file_no * pages_per_file:(file_no + 1) * pages_per_file]])
+        paths.append(path)
+    for item in labeled:
+        item["source"] = os.path.basename(paths[item["page"] // pages_per_file])
+        item["page"] = item["page"] % pages_per_file
+    return paths, labeled
+
+def stage_totals():
+    totals = {}
+    for metric in STAGE_SECONDS.collect():
+        for sample in metric.samples:
+            stage = totals.setdefault(sample.labels.get("stage"), {"count": 0, "seconds": 0.0})
+            if sample.name.endswith("_count"):
+                stage["count"] = int(sample.value)
+            elif sample.name.endswith("_sum"):
+                stage["seconds"] = sample.value
+    return totals
+
+def stage_delta(before, after):
+    delta = {}
+    for stage, totals in after.items():
+        count = totals["count"] - before.get(stage, {}).get("count", 0)
+        if count:
+            seconds = totals["seconds"] - before.get(stage, {}).get("seconds", 0.0)
+            delta[stage] = {"count": count, "seconds": round(seconds, 4), "mean_ms": round(seconds / count * 1000, 3)}
+    return delta
+
+def create_embed_model(embedding_model, region, noise):
+    if embedding_model == "hashing":
+        return HashingEmbeddings(noise=noise)
+    return create_embeddings(embedding_model, region)
+
+def run_ingest(paths, vector_store, num_pages):
+    before = stage_totals()
+    start = time.perf_counter()
+    # Keep stdout for the report; ingestion prints PROGRESS lines for the job runner
+    with contextlib.redirect_stdout(sys.stderr):
+        num_chunks = process.process_documents(paths, vector_store)
+    elapsed = time.perf_counter() - start
+    return {
+        "files": len(paths),
+        "pages": num_pages,
+        "chunks": num_chunks,
+        "seconds": round(elapsed, 3),
+        "chunks_per_sec": round(num_chunks / elapsed, 1),
+        "pages_per_sec": round(num_pages / elapsed, 1),
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stage_delta(before, stage_totals()),
+    }
+
+def run_queries(mode, labeled, vector_store, embed_model, reranker_name, passes):
+    before = stage_totals()
+    latencies, ranks = [], []
+    for _ in range(passes):
+        for item in labeled:
+            start = time.perf_counter()
+            docs = search.get_similar_documents_by_RAG(item["query"], "Chroma", "bench", embed_model, "", vector_store=vector_store, filter={"doc_level": "child"}, search_mode=mode, reranker_name=reranker_name)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found = [
+                rank for rank, doc in enumerate(docs, start=1)
+                if doc["metadatas"][0]["page"] == item["page"] and os.path.basename(doc["metadatas"][0]["source"]) == item["source"]
+            ]
+            ranks.append(found[0] if found else None)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "mode": mode,
+        "queries": len(latencies),
+        "recall_at_k": round(sum(rank is not None for rank in ranks) / len(ranks), 3),
+        "mrr": round(sum(1 / rank for rank in ranks if rank) / len(ranks), 3),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stage_delta(before, stage_totals()),
+    }
+
+def compare(baseline, current, tolerance):
+    pairs = [("ingest", baseline.get("ingest", {}), current["ingest"])]
+    previous = {result["mode"]: result for result in baseline.get("search", [])}
+    pairs += [(f"search.{result['mode']}", previous[result["mode"]], result) for result in current["search"] if result["mode"] in previous]
+
+    changes, regressions = [], []
+    for scope, old, new in pairs:
+        for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            if not old.get(metric) or metric not in new:
+                continue
+            change = (new[metric] - old[metric]) / old[metric]
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            entry = {"metric": f"{scope}.{metric}", "baseline": old[metric], "current": new[metric], "change": round(change, 4)}
+            changes.append(entry)
+            if worse > tolerance:
+                regressions.append(entry)
+    return {"tolerance": tolerance, "changes": changes, "regressions": regressions}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=2)
+    parser.add_argument('--pages-per-file', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=40)
+    parser.add_argument('--passes', type=int, default=3, help='Times the query set is run per search mode')
+    parser.add_argument('--embedding-model', default='hashing')
+    parser.add_argument('--region', default='us-east-1')
+    parser.add_argument('--noise', type=float, default=0.02, help='Gaussian noise added to hashing embeddings')
+    parser.add_argument('--search-modes', nargs='+', default=list(search.SEARCH_MODES), choices=search.SEARCH_MODES)
+    parser.add_argument('--reranker', default='none', choices=['none', 'local'])
+    parser.add_argument('--k', type=int, default=search.SEARCH_K)
+    parser.add_argument('--fetch-k', type=int, default=search.SEARCH_FETCH_K)
+    parser.add_argument('--parent-chunk-size', type=int, default=process.PARENT_CHUNK_SIZE)
+    parser.add_argument('--parent-chunk-overlap', type=int, default=process.PARENT_CHUNK_OVERLAP)
+    parser.add_argument('--child-chunk-size', type=int, default=process.CHILD_CHUNK_SIZE)
+    parser.add_argument('--child-chunk-overlap', type=int, default=process.CHILD_CHUNK_OVERLAP)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Relative change counted as a regression')
+    args = parser.parse_args()
+
+    # The same module constants the backend reads, so the real code paths see the overrides
+    search.SEARCH_K, search.SEARCH_FETCH_K = args.k, args.fetch_k
+    process.PARENT_CHUNK_SIZE, process.PARENT_CHUNK_OVERLAP = args.parent_chunk_size, args.parent_chunk_overlap
+    process.CHILD_CHUNK_SIZE, process.CHILD_CHUNK_OVERLAP = args.child_chunk_size, args.child_chunk_overlap
+    reranker_name = "local" if args.reranker == "local" else "cohere"
+
+    embed_model = create_embed_model(args.embedding_model, args.region, args.noise)
+    ingest_model = ConcurrentEmbeddings(embed_model, batch_size=process.EMBED_BATCH_SIZE, max_concurrency=process.EMBED_CONCURRENCY)
+    with tempfile.TemporaryDirectory(prefix='bench-suite-') as workdir:
+        paths, labeled = write_corpus(workdir, args.files, args.pages_per_file, args.queries, args.seed)
+        vector_store = Chroma(collection_name='bench', embedding_function=ingest_model, persist_directory=os.path.join(workdir, 'chroma'))
+        ingest = run_ingest(paths, vector_store, args.files * args.pages_per_file)
+        ingest_model.close()
+        results = [run_queries(mode, labeled, vector_store, embed_model, reranker_name, args.passes) for mode in args.search_modes]
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "tolerance")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "ingest": ingest,
+        "search": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(json.load(f), report, args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    if report.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Web search latency: langchain's blocking Tavily tool vs. the pooled async client.
+
+Starts a local Tavily stub with simulated latency and fires `--requests`
+concurrent searches drawn from `--distinct` queries, twice per client: a
+cold round and a warm round. The baseline is the former path, one blocking
+TavilySearchResults call per request on a 4-thread pool. The async
+WebSearchClient shares one connection pool, coalesces identical in-flight
+queries and caches results. Reports wall time, p50/p95 per request, upstream
+requests and TCP connections as JSON.
+
+    python py-backend/benchmarks/websearch_bench.py --requests 64 --distinct 8 --latency 0.2
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import common  # noqa: F401 - puts the backend's app directory on sys.path
+from stub_tavily import StubTavily
+
+import websearch
+
+def summarize(label, round_name, latencies, elapsed, stub, requests_before, connections_before):
+    p50, p95 = np.percentile(latencies, [50, 95])
+    return {
+        "client": label,
+        "round": round_name,
+        "seconds": round(elapsed, 3),
+        "p50_ms": round(float(p50) * 1000, 1),
+        "p95_ms": round(float(p95) * 1000, 1),
+        "upstream_requests": sum(stub.requests.values()) - requests_before,
+        "connections": stub.connections - connections_before,
+    }
+
+def run_langchain(stub, queries, rounds):
+    from langchain_community.tools.tavily_search import TavilySearchResults
+    from langchain_community.utilities import tavily_search
+    from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
+    tavily_search.TAVILY_API_URL = stub.url
+
+    def call(query):
+        start = time.perf_counter()
+        TavilySearchResults(api_wrapper=TavilySearchAPIWrapper(tavily_api_key="bench")).invoke({"query": query})
+        return time.perf_counter() - start
+
+    results = []
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for round_name in rounds:
+            requests_before, connections_before = sum(stub.requests.values()), stub.connections
+            start = time.perf_counter()
+            latencies = list(pool.map(call, queries))
+            results.append(summarize("langchain_blocking", round_name, latencies, time.perf_counter() - start, stub, requests_before, connections_before))
+    return results
+
+async def run_async_client(stub, queries, rounds):
+    client = websearch.WebSearchClient(base_url=stub.url)
+    client.client  # One-time pool setup (SSL context etc.) happens at backend startup, not per request
+
+    async def call(query):
+        start = time.perf_counter()
+        await client.search(query, "bench")
+        return time.perf_counter() - start
+
+    results = []
+    for round_name in rounds:
+        requests_before, connections_before = sum(stub.requests.values()), stub.connections
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(call(query) for query in queries))
+        results.append(summarize("async_pooled", round_name, latencies, time.perf_counter() - start, stub, requests_before, connections_before))
+    await client.aclose()
+    return results, client.stats()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--distinct', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.2, help='Simulated seconds per Tavily call')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = [f"query {rng.randrange(args.distinct)}" for _ in range(args.requests)]
+    rounds = ("cold", "warm")
+
+    stub = StubTavily(latency=args.latency).start()
+    results = run_langchain(stub, queries, rounds)
+    async_results, stats = asyncio.run(run_async_client(stub, queries, rounds))
+    stub.stop()
+    print(json.dumps({"requests": args.requests, "distinct_queries": args.distinct, "latency": args.latency, "results": results + async_results, "async_client": stats}, indent=2))
+
+if __name__ == '__main__':
+    main()
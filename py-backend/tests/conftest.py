@@ -0,0 +1,22 @@
+import os
+import shutil
+import sys
+import tempfile
+
+# The backend imports its modules as top-level names (libs.x, retriever), and the
+# benchmark stubs double as test servers
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+for path in (os.path.join(BACKEND_DIR, 'app'), os.path.join(BACKEND_DIR, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# State paths are resolved when the backend modules are imported, so they are pointed at a
+# scratch directory before any test module imports them
+STATE_DIR = tempfile.mkdtemp(prefix='backend-tests-')
+os.environ['JOBS_DB_PATH'] = os.path.join(STATE_DIR, 'jobs.sqlite3')
+os.environ['CHROMA_PATH'] = os.path.join(STATE_DIR, 'chroma')
+os.environ['MANIFEST_DIR'] = os.path.join(STATE_DIR, 'manifests')
+os.environ['NEURAL_MODELS_PATH'] = os.path.join(STATE_DIR, 'neural_models.json')
+
+def pytest_unconfigure(config):
+    shutil.rmtree(STATE_DIR, ignore_errors=True)
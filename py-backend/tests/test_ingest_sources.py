@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from common import synthetic_pages, write_synthetic_pdf
+from libs.manifest import IngestManifest
+import process
+
+class RecordingStore:
+    def __init__(self):
+        self.documents = {}
+        self.deleted = []
+
+    def add_documents(self, documents, ids):
+        self.documents.update(zip(ids, documents))
+
+    def delete(self, ids):
+        self.deleted.extend(ids)
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def write_pdf(workdir, upload_dir, seed, edited_page=None):
+    os.makedirs(workdir / upload_dir, exist_ok=True)
+    path = str(workdir / upload_dir / 'report.pdf')
+    pages = [page.page_content for page in synthetic_pages(6, seed=seed)]
+    if edited_page is not None:
+        pages[edited_page] = synthetic_pages(1, seed=seed + 100)[0].page_content
+    write_synthetic_pdf(path, pages)
+    return path
+
+def ingest(path, store, workdir):
+    process.process_documents([path], store, IngestManifest('OpenSearch', 'docs', str(workdir / 'manifests')))
+
+def test_edited_reupload_only_indexes_changed_pages_and_deletes_removed_chunks(workdir):
+    store = RecordingStore()
+    ingest(write_pdf(workdir, 'upload-a', seed=1), store, workdir)
+    first = dict(store.documents)
+    store.documents.clear()
+    ingest(write_pdf(workdir, 'upload-b', seed=1, edited_page=2), store, workdir)
+
+    assert store.documents and {doc.metadata['page'] for doc in store.documents.values()} == {2}
+    assert store.deleted and {first[chunk_id].metadata['page'] for chunk_id in store.deleted} == {2}
+    manifest = IngestManifest('OpenSearch', 'docs', str(workdir / 'manifests'))
+    assert list(manifest.sources) == ['report.pdf']
+    assert manifest.chunk_ids('report.pdf') == (set(first) - set(store.deleted)) | set(store.documents)
+
+def test_chunks_store_the_file_name_but_not_the_upload_path(workdir):
+    store = RecordingStore()
+    ingest(write_pdf(workdir, 'upload-a', seed=1), store, workdir)
+
+    assert {doc.metadata['source'] for doc in store.documents.values()} == {'report.pdf'}
+    assert all('upload-a' not in str(doc.metadata) for doc in store.documents.values())
+
+def test_reuploading_the_same_content_is_skipped(workdir):
+    store = RecordingStore()
+    ingest(write_pdf(workdir, 'upload-a', seed=1), store, workdir)
+    indexed = len(store.documents)
+    store.documents.clear()
+    ingest(write_pdf(workdir, 'upload-b', seed=1), store, workdir)
+
+    assert indexed > 0
+    assert store.documents == {} and store.deleted == []
@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from libs import opensearch
+from stub_opensearch import StubOpenSearch
+
+@pytest.fixture
+def stub(monkeypatch):
+    stub = StubOpenSearch().start()
+    config_path = stub.write_config(pool_maxsize=4)
+    monkeypatch.setattr(opensearch, 'CONFIG_PATH', config_path)
+    opensearch.reset_registry()
+    yield stub
+    opensearch.reset_registry()
+    stub.stop()
+    os.remove(config_path)
+
+def test_config_is_parsed_once(stub, monkeypatch):
+    calls = []
+    safe_load = opensearch.yaml.safe_load
+    monkeypatch.setattr(opensearch.yaml, 'safe_load', lambda stream: calls.append(1) or safe_load(stream))
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda _: opensearch.OpenSearchClient('docs'), range(16)))
+    assert len(calls) == 1
+
+def test_one_connection_pool_per_endpoint(stub):
+    def request(_):
+        client = opensearch.OpenSearchClient('docs')
+        client.conn.mget(index='docs', body={"ids": ["a"]})
+        return client.conn
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        conns = list(pool.map(request, range(40)))
+    assert all(conn is conns[0] for conn in conns)
+    assert stub.connections <= 4
+
+    other = StubOpenSearch().start()
+    try:
+        assert opensearch.get_connection(other.endpoint, ('bench', 'bench')) is not conns[0]
+        assert opensearch.get_connection(stub.endpoint, ('bench', 'bench')) is conns[0]
+    finally:
+        other.stop()
+
+def test_index_exists_is_memoized(stub):
+    for _ in range(10):
+        opensearch.OpenSearchClient('docs')
+    opensearch.OpenSearchClient('other-docs')
+    assert stub.requests["HEAD index"] == 2
+
+    opensearch.reset_registry()
+    opensearch.OpenSearchClient('docs')
+    assert stub.requests["HEAD index"] == 3
+
+def test_vector_stores_share_the_registry_client(stub):
+    from langchain_core.embeddings import FakeEmbeddings
+
+    first = opensearch.OpenSearchClient('docs').get_vector_store(FakeEmbeddings(size=8))
+    second = opensearch.OpenSearchClient('other-docs').get_vector_store(FakeEmbeddings(size=8))
+    assert first.client is second.client
+    assert first.client is opensearch.get_connection(stub.endpoint, ('bench', 'bench'))
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from libs.cache import TTLCache
+from stub_tavily import StubTavily
+from websearch import WebSearchClient, merge_results
+
+@pytest.fixture
+def stub():
+    stub = StubTavily(latency=0.05).start()
+    yield stub
+    stub.stop()
+
+def search(client, *queries, api_key="test-key"):
+    async def run():
+        try:
+            return await asyncio.gather(*(client.search(query, api_key) for query in queries))
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+def test_identical_in_flight_queries_are_coalesced(stub):
+    client = WebSearchClient(base_url=stub.url)
+    results = search(client, *(["bedrock pricing"] * 8), "  Bedrock   PRICING ", "opensearch")
+    assert stub.requests == {"bedrock pricing": 1, "opensearch": 1}
+    assert client.stats()["coalesced"] == 8
+    assert all(result == results[0] for result in results[:9])
+    assert results[0][0]["url"] == "https://example.com/0?q=bedrock pricing"
+
+def test_results_are_cached_until_the_ttl_expires(stub):
+    client = WebSearchClient(base_url=stub.url, cache=TTLCache(16, ttl=0.2))
+    first = search(client, "chroma")
+    assert search(client, "Chroma") == first
+    assert stub.requests["chroma"] == 1
+    assert client.cache.hits == 1
+
+    time.sleep(0.25)
+    assert search(client, "chroma") == first
+    assert stub.requests["chroma"] == 2
+    assert client.cache.expirations == 1
+
+def test_api_keys_do_not_share_results(stub):
+    client = WebSearchClient(base_url=stub.url)
+    search(client, "chroma", api_key="first-key")
+    search(client, "chroma", api_key="second-key")
+    assert stub.requests["chroma"] == 2
+
+def test_errors_are_not_cached(stub):
+    client = WebSearchClient(base_url=stub.url)
+    # The stub answers 401 to an empty API key
+    with pytest.raises(httpx.HTTPStatusError):
+        search(client, "chroma", "chroma", api_key="")
+    assert client.stats() == {"requests": 1, "coalesced": 1, "errors": 1, "in_flight": 0}
+    assert len(client.cache) == 0
+
+    with pytest.raises(httpx.HTTPStatusError):
+        search(client, "chroma", api_key="")
+    assert client.stats()["requests"] == 2
+
+def test_merge_results_puts_documents_before_web_pages():
+    rag_output = json.dumps([{"content": "chunk one", "source": "guide.pdf"}, {"content": "chunk two", "source": "guide.pdf"}])
+    web_results = [
+        {"title": "A", "url": "https://example.com/a", "content": "page a", "score": 0.9},
+        {"title": "B", "url": "https://example.com/b", "content": "page b", "score": 0.8},
+    ]
+    merged = json.loads(merge_results(rag_output, web_results))
+    assert merged == [
+        {"content": "chunk one", "source": "guide.pdf"},
+        {"content": "chunk two", "source": "guide.pdf"},
+        {"content": "page a", "source": "https://example.com/a"},
+        {"content": "page b", "source": "https://example.com/b"},
+    ]
+
+def test_merge_results_ignores_a_non_list_rag_output():
+    web_results = [{"title": "A", "url": "https://example.com/a", "content": "page a", "score": 0.9}]
+    assert json.loads(merge_results("No relevant documents.", web_results)) == [{"content": "page a", "source": "https://example.com/a"}]
+
+def test_merge_results_drops_repeated_pages():
+    rag_output = json.dumps([{"content": "shared text", "source": "guide.pdf"}])
+    web_results = [
+        {"title": "A", "url": "https://example.com/a", "content": "page a", "score": 0.9},
+        {"title": "A again", "url": "https://example.com/a", "content": "page a, other snippet", "score": 0.7},
+        {"title": "Mirror", "url": "https://mirror.example.com/a", "content": "page a", "score": 0.6},
+        {"title": "Quote", "url": "https://example.com/q", "content": "shared text", "score": 0.5},
+        {"title": "B", "url": "https://example.com/b", "content": "page b", "score": 0.4},
+    ]
+    merged = json.loads(merge_results(rag_output, web_results))
+    assert [doc["source"] for doc in merged] == ["guide.pdf", "https://example.com/a", "https://example.com/b"]
+
+@pytest.fixture(scope='module')
+def app_client():
+    from fastapi.testclient import TestClient
+    import app
+
+    # Shutdown stops the module-level limiters, so the app is started once for all tests
+    with TestClient(app.app) as client:
+        yield app, client
+
+@pytest.fixture
+def backend(app_client, stub, monkeypatch):
+    app, client = app_client
+    monkeypatch.setattr(app, 'web_search_client', WebSearchClient(base_url=stub.url))
+    return app, client
+
+def combined_search(client):
+    response = client.post('/websearch', data={"text": "chroma", "chat_mode": "Web Search", "tavily_search_key": "test-key", "search_settings": "{}"})
+    assert response.status_code == 200
+    return response.json()
+
+def test_combined_search_returns_web_results_when_document_search_fails(backend, monkeypatch):
+    app, client = backend
+    def failing_search(*args):
+        raise RuntimeError("index missing")
+    monkeypatch.setattr(app.retrieval_engine, 'search', failing_search)
+
+    body = combined_search(client)
+    assert body["error"] == ""
+    assert body["partial_error"] == "Document search failed: index missing"
+    assert [doc["source"] for doc in json.loads(body["output"])][:1] == ["https://example.com/0?q=chroma"]
+
+def test_combined_search_returns_documents_when_web_search_fails(backend, monkeypatch):
+    app, client = backend
+    monkeypatch.setattr(app.retrieval_engine, 'search', lambda *args: json.dumps([{"content": "chunk", "source": "guide.pdf"}]))
+    monkeypatch.setattr(app, 'web_search_client', WebSearchClient(base_url=f"{app.web_search_client.base_url}/missing"))
+
+    body = combined_search(client)
+    assert body["error"] == ""
+    assert body["partial_error"].startswith("Web search failed: Client error '404 Not Found'")
+    assert json.loads(body["output"]) == [{"content": "chunk", "source": "guide.pdf"}]
+
+def test_combined_search_reports_an_error_when_both_sides_fail(backend, monkeypatch):
+    app, client = backend
+    def failing_search(*args):
+        raise RuntimeError("index missing")
+    monkeypatch.setattr(app.retrieval_engine, 'search', failing_search)
+    monkeypatch.setattr(app, 'web_search_client', WebSearchClient(base_url=f"{app.web_search_client.base_url}/missing"))
+
+    body = combined_search(client)
+    assert body == {"output": "", "error": "index missing"}
@@ -105,6 +105,107 @@ export async function searchApi(text: string, chatMode: string, searchSettings:
   }
 }
 
+export async function searchBatchApi(texts: string[], chatMode: string, searchSettings: any, cohereRerankerApiKey?: string) {
+  try {
+    const formData = new FormData();
+    formData.append('texts', JSON.stringify(texts));
+    formData.append('chat_mode', chatMode);
+    formData.append('search_settings', JSON.stringify(searchSettings));
+    formData.append('cohere_reranker_api_key', cohereRerankerApiKey || '');
+
+    const response = await axios.post('/api/search/batch', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data'
+      }
+    });
+    if (response.data.error) {
+      throw new Error(response.data.error);
+    }
+    // One result list per query, in the order the queries were sent
+    return response.data.outputs.map((output: string) => JSON.parse(output));
+  } catch (error) {
+    console.error('Error calling batch search API:', error);
+    throw error;
+  }
+}
+
+export async function searchStreamApi(text: string, chatMode: string, searchSettings: any, cohereRerankerApiKey: string | undefined, onEvent: (event: string, data: any) => void) {
+  const formData = new FormData();
+  formData.append('text', text);
+  formData.append('chat_mode', chatMode);
+  formData.append('search_settings', JSON.stringify(searchSettings));
+  formData.append('cohere_reranker_api_key', cohereRerankerApiKey || '');
+
+  const response = await fetch('/api/search/stream', { method: 'POST', body: formData });
+  if (!response.ok || !response.body) {
+    throw new Error(`Search stream failed: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  // The context is assembled from the "parents" events, placed by rank, so it is ready as soon as the
+  // last reranked parent arrives rather than when the backend sends "done"
+  let expected = -1;
+  const context: any[] = [];
+  let received = 0;
+
+  const readEvents = async function* () {
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) return;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line; keep any partial event for the next chunk
+      const events = buffer.split('\n\n');
+      buffer = events.pop() || '';
+      for (const raw of events) {
+        let event = 'message';
+        let data = '';
+        for (const line of raw.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (data) yield { event, data: JSON.parse(data) };
+      }
+    }
+  };
+
+  const events = readEvents();
+  while (true) {
+    // Stepped by hand: leaving a for-await loop early would close the generator the drain below still needs
+    const next = await events.next();
+    if (next.done) break;
+    const { event, data } = next.value;
+    if (event === 'error') {
+      throw new Error(data.error);
+    }
+    onEvent(event, data);
+    if (event === 'reranked') {
+      expected = data.parent_ids.length;
+    } else if (event === 'parents') {
+      for (const { rank, ...doc } of data.documents) {
+        if (context[rank] === undefined) received += 1;
+        context[rank] = doc;
+      }
+    } else if (event === 'done') {
+      return JSON.parse(data.output);
+    }
+    if (expected >= 0 && received === expected) {
+      // Let the backend finish (it caches the result) without holding up the chat request
+      (async () => {
+        try {
+          while (!(await events.next()).done) {}
+        } catch (error) {
+          console.error('Error draining search stream:', error);
+        }
+      })();
+      return context;
+    }
+  }
+  throw new Error('Search stream ended before results were complete');
+}
+
 export async function websearchApi(text: string, chatMode: string, tavilySearchApiKey: string) {
   try {
     const formData = new FormData();